@@ -0,0 +1,353 @@
+import asyncio
+import threading
+import time
+from typing import Any, Awaitable, Dict, List, Optional
+import os
+
+import httpx
+
+from cache import CachedPayload, ResponseCache
+from token_store import TokenStore
+from ratelimit import TokenBucket
+from circuit import CircuitBreaker
+from media_index import MediaIndex
+from metrics import observe_upstream
+from OpenverseAPIClient import OpenverseClient, _env_float, _env_int
+
+
+class AsyncOpenverseClient:
+    """asyncio counterpart of ``OpenverseClient`` built on ``httpx.AsyncClient``.
+
+    The HTTP pool is bound to the event loop of the first call, so an instance
+    should be used from a single loop (see ``BackgroundLoop`` for WSGI use).
+    """
+
+    BASE_URL = OpenverseClient.BASE_URL
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        cache: Optional[ResponseCache] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        index: Optional[MediaIndex] = None
+    ):
+        self.base_url = (base_url or os.getenv("OPENVERSE_BASE_URL") or self.BASE_URL).rstrip("/")
+        self.max_connections = max_connections or _env_int("OPENVERSE_ASYNC_MAX_CONNECTIONS", 200)
+        self.max_keepalive_connections = max_keepalive_connections or _env_int("OPENVERSE_POOL_MAXSIZE", 20)
+        self.timeout = httpx.Timeout(
+            read_timeout or _env_float("OPENVERSE_READ_TIMEOUT", 10.0),
+            connect=connect_timeout or _env_float("OPENVERSE_CONNECT_TIMEOUT", 3.05)
+        )
+        self.max_retries = max_retries if max_retries is not None else _env_int("OPENVERSE_MAX_RETRIES", 2)
+        self.cache = cache if cache is not None else ResponseCache.from_env()
+        self.breaker = breaker if breaker is not None else CircuitBreaker.from_env()
+        # Fetched results are copied into the local full-text index when one is given
+        self.index = index
+
+        self._http: Optional[httpx.AsyncClient] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._auth_lock: Optional[asyncio.Lock] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._revalidating: Dict[str, asyncio.Task] = {}
+
+        self.access_token = None
+        self.token_expiry = 0
+        self.token_refresh_at = 0
+        self.token_refresh_ratio = _env_float("OPENVERSE_TOKEN_REFRESH_RATIO", 0.9)
+        self.client_id = os.getenv("OPENVERSE_CLIENT_ID")
+        self.client_secret = os.getenv("OPENVERSE_CLIENT_SECRET")
+        self.token_store = TokenStore.for_client(self.base_url, self.client_id)
+        self.rate_limiter = rate_limiter if rate_limiter is not None else TokenBucket.for_client(
+            self.base_url, self.client_id
+        )
+        self.rate_limit_wait = _env_float("OPENVERSE_RATE_LIMIT_WAIT", 2.0)
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections
+                ),
+                transport=httpx.AsyncHTTPTransport(retries=self.max_retries)
+            )
+            self._auth_lock = asyncio.Lock()
+        return self._http
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _get_auth_token(self) -> Optional[str]:
+        current_time = time.time()
+        if self.access_token and current_time < self.token_refresh_at:
+            return self.access_token
+
+        http = self.http
+        if self.access_token and current_time < self.token_expiry:
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = asyncio.create_task(self._background_refresh_token())
+            return self.access_token
+
+        async with self._auth_lock:
+            # Another task may have refreshed while we waited for the lock
+            if self.access_token and time.time() < self.token_expiry:
+                return self.access_token
+            if self._adopt_stored_token():
+                return self.access_token
+            return await self._refresh_token(http)
+
+    _adopt_stored_token = OpenverseClient._adopt_stored_token
+
+    async def _background_refresh_token(self) -> None:
+        async with self._auth_lock:
+            if time.time() < self.token_refresh_at:
+                return
+            if self._adopt_stored_token() and time.time() < self.token_refresh_at:
+                return
+            await self._refresh_token(self.http)
+
+    async def _refresh_token(self, http: httpx.AsyncClient) -> Optional[str]:
+        current_time = time.time()
+        try:
+            response = await http.post(
+                f"{self.base_url}/auth_tokens/token/",
+                data={
+                    "client_id": self.client_id,
+                    "client_secret": self.client_secret,
+                    "grant_type": "client_credentials"
+                }
+            )
+            response.raise_for_status()
+
+            token_data = response.json()
+            expires_in = token_data.get("expires_in", 3600)
+            self.access_token = token_data.get("access_token")
+            self.token_expiry = current_time + expires_in
+            self.token_refresh_at = current_time + expires_in * self.token_refresh_ratio
+            self.token_store.save(self.access_token, self.token_expiry, self.token_refresh_at)
+            return self.access_token
+
+        except httpx.HTTPError as e:
+            print(f"Error getting auth token: {e}")
+            if self.access_token and time.time() < self.token_expiry:
+                return self.access_token
+            return None
+
+    async def check_rate_limit(self) -> Dict[str, Any]:
+        try:
+            response = await self.http.get(
+                f"{self.base_url}/rate_limit/",
+                headers={"Authorization": f"Bearer {await self._get_auth_token()}"}
+            )
+            response.raise_for_status()
+            data = response.json()
+            await asyncio.to_thread(
+                self.rate_limiter.update,
+                data.get('rate_limit_remaining', 60),
+                data.get('rate_limit_total', 60),
+                data.get('rate_limit_reset', time.time() + 3600)
+            )
+        except Exception as e:
+            print(f"Error checking rate limit: {e}")
+        return await asyncio.to_thread(self.rate_limiter.snapshot)
+
+    rate_limit = OpenverseClient.rate_limit
+    _update_rate_limit = OpenverseClient._update_rate_limit
+    _rate_limit_error = staticmethod(OpenverseClient._rate_limit_error)
+    _throttled = OpenverseClient._throttled
+
+    @staticmethod
+    def _is_upstream_failure(e: Exception) -> bool:
+        if isinstance(e, httpx.HTTPStatusError):
+            return e.response.status_code >= 500
+        return isinstance(e, httpx.TransportError)
+
+    _mark_stale = staticmethod(OpenverseClient._mark_stale)
+
+    async def _make_request(
+        self,
+        endpoint: str,
+        params: Dict[str, Any],
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        self.breaker.before_call()
+        try:
+            return await self._send(endpoint, params, timeout)
+        except BaseException:
+            self.breaker.release()
+            raise
+
+    async def _send(self, endpoint: str, params: Dict[str, Any], timeout: Optional[float]) -> Dict[str, Any]:
+        # Bucket stores may block on SQLite, so keep them off the event loop
+        if await asyncio.to_thread(self.rate_limiter.needs_poll):
+            await self.check_rate_limit()
+
+        retry_after = await self.rate_limiter.acquire_async(self.rate_limit_wait)
+        if retry_after:
+            raise self._rate_limit_error(retry_after)
+
+        token = await self._get_auth_token()
+        if not token:
+            self.breaker.record_failure()
+            raise Exception("Failed to authenticate with Openverse API")
+
+        started = time.perf_counter()
+        try:
+            response = await self.http.get(
+                f"{self.base_url}/{endpoint}/",
+                headers={"Authorization": f"Bearer {token}"},
+                params=params,
+                timeout=self.timeout if timeout is None else httpx.Timeout(
+                    timeout, connect=min(self.timeout.connect, timeout)
+                )
+            )
+        except httpx.HTTPError as e:
+            observe_upstream(endpoint, started, "timeout" if isinstance(e, httpx.TimeoutException) else "error")
+            if self._is_upstream_failure(e):
+                self.breaker.record_failure()
+            raise
+
+        observe_upstream(endpoint, started, response.status_code)
+        await asyncio.to_thread(self._update_rate_limit, response.headers)
+        if response.status_code == 429:
+            # Not a sign of an outage, and the budget is already spent
+            raise await asyncio.to_thread(self._throttled, response.headers)
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        response.raise_for_status()
+        return response.json()
+
+    async def _search(
+        self,
+        endpoint: str,
+        params: Dict[str, Any],
+        use_cache: bool = True,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        if self.cache is not None:
+            if use_cache:
+                cached = self.cache.get(endpoint, params)
+                if cached is not None:
+                    return cached
+                stale = self.cache.get_stale(endpoint, params, self.cache.swr_window)
+                if stale is not None:
+                    self._revalidate(endpoint, params)
+                    return self._mark_stale(*stale)
+            else:
+                self.cache.record_bypass()
+
+        try:
+            return await self._fetch(endpoint, params, timeout)
+        except Exception:
+            stale = self.cache.get_stale(endpoint, params) if self.cache is not None else None
+            if stale is None:
+                raise
+            return self._mark_stale(*stale)
+
+    async def _fetch(self, endpoint: str, params: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        key = ResponseCache.make_key(endpoint, params)
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            results = CachedPayload(await self._make_request(endpoint, params, timeout))
+            if self.cache is not None:
+                results.etag = self.cache.set(endpoint, params, results)
+            if self.index is not None:
+                self.index.submit(endpoint, results)
+            future.set_result(results)
+            return results
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            del self._inflight[key]
+
+    def _revalidate(self, endpoint: str, params: Dict[str, Any]) -> None:
+        key = ResponseCache.make_key(endpoint, params)
+        if key in self._revalidating:
+            return
+
+        async def refresh():
+            try:
+                await self._fetch(endpoint, params)
+            except Exception as e:
+                print(f"Error revalidating {endpoint} results: {e}")
+            finally:
+                del self._revalidating[key]
+
+        self._revalidating[key] = asyncio.create_task(refresh())
+
+    async def search_images(
+        self,
+        query: str,
+        page: int = 1,
+        page_size: int = 20,
+        license_type: Optional[str] = None,
+        source: Optional[str] = None,
+        filetype: Optional[str] = None,
+        use_cache: bool = True,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        params = OpenverseClient._build_params(query, page, page_size, license_type, source, filetype)
+        return await self._search("images", params, use_cache, timeout)
+
+    async def search_audio(
+        self,
+        query: str,
+        page: int = 1,
+        page_size: int = 20,
+        license_type: Optional[str] = None,
+        source: Optional[str] = None,
+        filetype: Optional[str] = None,
+        category: Optional[List[str]] = None,
+        use_cache: bool = True,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        params = OpenverseClient._build_params(query, page, page_size, license_type, source, filetype, category)
+        return await self._search("audio", params, use_cache, timeout)
+
+
+class BackgroundLoop:
+    """A long-lived event loop on a daemon thread.
+
+    Flask runs each async view in a short-lived loop of its own; submitting
+    coroutines here instead lets every request share one loop, one HTTP pool
+    and one in-flight table.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="openverse-loop", daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    async def run(self, coro: Awaitable[Any]) -> Any:
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+    def run_sync(self, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
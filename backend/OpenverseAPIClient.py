@@ -1,31 +1,235 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import deque
+import math
+import threading
 import time
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple, Iterator, Deque, Union
 import os
+from cache import CachedPayload, ResponseCache
+from singleflight import SingleFlight
+from token_store import TokenStore
+from ratelimit import TokenBucket
+from projection import parse_fields, project_results
+from circuit import CircuitBreaker
+from media_index import MediaIndex
+from metrics import observe_upstream
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
 
 class OpenverseClient:
     
     BASE_URL = "https://api.openverse.org/v1"
     
-    def __init__(self):
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        pool_connections: Optional[int] = None,
+        pool_maxsize: Optional[int] = None,
+        pool_block: Optional[bool] = None,
+        keep_alive: Optional[bool] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        backoff_factor: Optional[float] = None,
+        cache: Optional[ResponseCache] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        index: Optional[MediaIndex] = None
+    ):
+        self.base_url = (base_url or os.getenv("OPENVERSE_BASE_URL") or self.BASE_URL).rstrip("/")
+        self.pool_connections = pool_connections or _env_int("OPENVERSE_POOL_CONNECTIONS", 4)
+        self.pool_maxsize = pool_maxsize or _env_int("OPENVERSE_POOL_MAXSIZE", 20)
+        self.pool_block = pool_block if pool_block is not None else os.getenv("OPENVERSE_POOL_BLOCK", "0") == "1"
+        self.keep_alive = keep_alive if keep_alive is not None else os.getenv("OPENVERSE_KEEP_ALIVE", "1") == "1"
+        self.timeout: Tuple[float, float] = (
+            connect_timeout or _env_float("OPENVERSE_CONNECT_TIMEOUT", 3.05),
+            read_timeout or _env_float("OPENVERSE_READ_TIMEOUT", 10.0)
+        )
+        self.max_retries = max_retries if max_retries is not None else _env_int("OPENVERSE_MAX_RETRIES", 2)
+        self.backoff_factor = backoff_factor if backoff_factor is not None else _env_float("OPENVERSE_BACKOFF_FACTOR", 0.3)
+
+        # One adapter (and therefore one urllib3 pool per host) is shared by
+        # every thread; each thread gets its own lightweight Session on top of
+        # it because Session cookie/header state is not thread-safe.
+        # Searches only retry a failed connect, once and without backoff: the
+        # request never reached upstream, and both attempts fit in the call's
+        # timeout (see _call_timeout). Read and status failures go straight to
+        # the breaker, and the stale cache covers them.
+        connect_retries = min(self.max_retries, 1)
+        self._adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+            max_retries=Retry(
+                total=connect_retries,
+                connect=connect_retries,
+                read=0,
+                status=0,
+                other=0,
+                raise_on_status=False,
+                respect_retry_after_header=False
+            )
+        )
+        # Token and /rate_limit/ calls are rare and have no fallback, so they
+        # retry, but never sleep for an upstream Retry-After.
+        self._control_adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=Retry(
+                total=self.max_retries,
+                connect=self.max_retries,
+                read=self.max_retries,
+                status=self.max_retries,
+                backoff_factor=self.backoff_factor,
+                status_forcelist=(500, 502, 503, 504),
+                allowed_methods=frozenset({"GET", "HEAD"}),
+                raise_on_status=False,
+                respect_retry_after_header=False
+            )
+        )
+        self._local = threading.local()
+        self.cache = cache if cache is not None else ResponseCache.from_env()
+        self.inflight = SingleFlight()
+        self.breaker = breaker if breaker is not None else CircuitBreaker.from_env()
+        # Fetched results are copied into the local full-text index when one is given
+        self.index = index
+        self._revalidating: set = set()
+        self._revalidate_lock = threading.Lock()
+        self._revalidate_pool = ThreadPoolExecutor(
+            max_workers=_env_int("OPENVERSE_REVALIDATE_WORKERS", 2),
+            thread_name_prefix="openverse-revalidate"
+        )
+
         self.access_token = None
         self.token_expiry = 0
+        self.token_refresh_at = 0
+        self.token_refresh_ratio = _env_float("OPENVERSE_TOKEN_REFRESH_RATIO", 0.9)
         self.client_id = os.getenv("OPENVERSE_CLIENT_ID")
         self.client_secret = os.getenv("OPENVERSE_CLIENT_SECRET")
-        self.rate_limit = {
-            'remaining': 60,  # Default values
-            'limit': 60,
-            'reset': time.time() + 3600,
-            'last_checked': 0
+        self.token_store = TokenStore.for_client(self.base_url, self.client_id)
+        self._token_lock = threading.Lock()
+        self._spawn_lock = threading.Lock()
+        self._background_refresh: Optional[threading.Thread] = None
+        self.rate_limiter = rate_limiter if rate_limiter is not None else TokenBucket.for_client(
+            self.base_url, self.client_id
+        )
+        self.rate_limit_wait = _env_float("OPENVERSE_RATE_LIMIT_WAIT", 2.0)
+
+    @property
+    def rate_limit(self) -> Dict[str, Any]:
+        return self.rate_limiter.snapshot()
+
+    @rate_limit.setter
+    def rate_limit(self, value: Dict[str, Any]) -> None:
+        self.rate_limiter.update(value['remaining'], value['limit'], value['reset'])
+
+    @property
+    def session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", self._adapter)
+            session.mount("http://", self._adapter)
+            for path in ("auth_tokens/", "rate_limit/"):
+                session.mount(f"{self.base_url}/{path}", self._control_adapter)
+            if not self.keep_alive:
+                session.headers["Connection"] = "close"
+            self._local.session = session
+        return session
+
+    def pool_stats(self) -> Dict[str, Any]:
+        pools = self._adapter.poolmanager.pools
+        hosts = {}
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            hosts[f"{key.key_scheme}://{key.key_host}:{key.key_port}"] = {
+                'connections_opened': pool.num_connections,
+                'requests': pool.num_requests,
+                'idle': pool.pool.qsize() if pool.pool is not None else 0
+            }
+
+        opened = sum(h['connections_opened'] for h in hosts.values())
+        total = sum(h['requests'] for h in hosts.values())
+        return {
+            'pool_connections': self.pool_connections,
+            'pool_maxsize': self.pool_maxsize,
+            'keep_alive': self.keep_alive,
+            'connections_opened': opened,
+            'requests': total,
+            'reuse_rate': (1 - opened / total) if total else 0.0,
+            'hosts': hosts
         }
+
+    def close(self) -> None:
+        self._adapter.close()
+        self._control_adapter.close()
     
-    def _get_auth_token(self) -> str:
+    def _get_auth_token(self) -> Optional[str]:
         current_time = time.time()
-        
+
+        if self.access_token and current_time < self.token_refresh_at:
+            return self.access_token
+
+        # Inside the refresh window the current token is still valid: hand it
+        # out and refresh off the request path.
         if self.access_token and current_time < self.token_expiry:
+            self._start_background_refresh()
             return self.access_token
 
-        auth_url = f"{self.BASE_URL}/auth_tokens/token/"
+        with self._token_lock:
+            if self.access_token and time.time() < self.token_expiry:
+                return self.access_token
+            if self._adopt_stored_token():
+                return self.access_token
+            return self._refresh_token()
+
+    def _adopt_stored_token(self) -> bool:
+        stored = self.token_store.load()
+        if stored is None or stored['expires_at'] <= self.token_expiry:
+            return False
+        self.access_token = stored['access_token']
+        self.token_expiry = stored['expires_at']
+        self.token_refresh_at = stored.get('refresh_at', stored['expires_at'])
+        return True
+
+    def _start_background_refresh(self) -> None:
+        if self._background_refresh is not None and self._background_refresh.is_alive():
+            return
+        with self._spawn_lock:
+            if self._background_refresh is not None and self._background_refresh.is_alive():
+                return
+            self._background_refresh = threading.Thread(
+                target=self._background_refresh_token, name="openverse-token-refresh", daemon=True
+            )
+            self._background_refresh.start()
+
+    def _background_refresh_token(self) -> None:
+        with self._token_lock:
+            if time.time() < self.token_refresh_at:
+                return
+            # Another worker process may already have refreshed it
+            if self._adopt_stored_token() and time.time() < self.token_refresh_at:
+                return
+            self._refresh_token()
+
+    def _refresh_token(self) -> Optional[str]:
+        current_time = time.time()
+
+        auth_url = f"{self.base_url}/auth_tokens/token/"
         headers = {
             "Content-Type": "application/x-www-form-urlencoded",
         }
@@ -34,81 +238,213 @@ class OpenverseClient:
             "client_secret": self.client_secret,
             "grant_type": "client_credentials"
         }
+        response = None
         try:
-            response = requests.post(auth_url, headers=headers, data=data)
+            response = self.session.post(auth_url, headers=headers, data=data, timeout=self.timeout)
             response.raise_for_status()
             
             token_data = response.json()
             self.access_token = token_data.get("access_token")
             expires_in = token_data.get("expires_in", 3600)
             self.token_expiry = current_time + expires_in
+            self.token_refresh_at = current_time + expires_in * self.token_refresh_ratio
+            self.token_store.save(self.access_token, self.token_expiry, self.token_refresh_at)
             
             return self.access_token
 
         except requests.exceptions.RequestException as e:
-            print(f"Error getting auth token: {e} {response.text}")
+            print(f"Error getting auth token: {e} {response.text if response is not None else ''}")
+            if self.access_token and time.time() < self.token_expiry:
+                return self.access_token
             return None
         
     def check_rate_limit(self) -> Dict[str, Any]:
         try:
-            response = requests.get(
-                f"{self.BASE_URL}/rate_limit/",
-                headers={"Authorization": f"Bearer {self._get_auth_token()}"}
+            response = self.session.get(
+                f"{self.base_url}/rate_limit/",
+                headers={"Authorization": f"Bearer {self._get_auth_token()}"},
+                timeout=self.timeout
             )
             response.raise_for_status()
             self.rate_limit = {
                 'remaining': response.json().get('rate_limit_remaining', 60),
                 'limit': response.json().get('rate_limit_total', 60),
-                'reset': response.json().get('rate_limit_reset', time.time() + 3600),
-                'last_checked': time.time()
+                'reset': response.json().get('rate_limit_reset', time.time() + 3600)
             }
             return self.rate_limit
         except Exception as e:
             print(f"Error checking rate limit: {e}")
             return self.rate_limit
         
-    def _make_request(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
-        if time.time() - self.rate_limit['last_checked'] > 60:
+    def _update_rate_limit(self, headers) -> None:
+        if 'X-RateLimit-Remaining' in headers:
+            self.rate_limiter.update(
+                int(headers['X-RateLimit-Remaining']),
+                int(headers['X-RateLimit-Limit']),
+                int(headers['X-RateLimit-Reset'])
+            )
+
+    @staticmethod
+    def _rate_limit_error(retry_after: float) -> Exception:
+        return Exception(f"Rate limit exceeded. Try again in {retry_after:.0f} seconds")
+
+    def _throttled(self, headers) -> Exception:
+        """Empty the bucket after an upstream 429 and return the error to raise."""
+        try:
+            retry_after = float(headers['Retry-After'])
+        except (KeyError, ValueError):
+            retry_after = max(1.0, self.rate_limit['reset'] - time.time())
+        if 'X-RateLimit-Remaining' not in headers:
+            self.rate_limiter.update(0, self.rate_limit['limit'], time.time() + retry_after)
+        return self._rate_limit_error(retry_after)
+
+    @staticmethod
+    def _is_upstream_failure(e: Exception) -> bool:
+        if isinstance(e, requests.exceptions.HTTPError):
+            return e.response is not None and e.response.status_code >= 500
+        return isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+    def _call_timeout(self, timeout: Optional[Timeout]) -> Tuple[float, float]:
+        if timeout is None:
+            return self.timeout
+        if isinstance(timeout, tuple):
+            return timeout
+        attempts = 1 + self._adapter.max_retries.connect
+        return (min(self.timeout[0], timeout / attempts), timeout)
+
+    def _make_request(
+        self,
+        endpoint: str,
+        params: Dict[str, Any],
+        timeout: Optional[Timeout] = None
+    ) -> Dict[str, Any]:
+        # Fail fast while Openverse is known to be down
+        self.breaker.before_call()
+        try:
+            return self._send(endpoint, params, timeout)
+        except BaseException:
+            # Whatever failed, a half-open probe slot must not stay taken
+            self.breaker.release()
+            raise
+
+    def _send(self, endpoint: str, params: Dict[str, Any], timeout: Optional[Timeout]) -> Dict[str, Any]:
+        # The bucket is normally seeded from response headers; only ask the
+        # /rate_limit/ endpoint when no response has carried them yet.
+        if self.rate_limiter.needs_poll():
             self.check_rate_limit()
 
-        if self.rate_limit['remaining'] <= 0:
-            reset_in = max(0, self.rate_limit['reset'] - time.time())
-            raise Exception(
-                f"Rate limit exceeded. Try again in {reset_in:.0f} seconds"
-            )
+        retry_after = self.rate_limiter.acquire(self.rate_limit_wait)
+        if retry_after:
+            raise self._rate_limit_error(retry_after)
 
         token = self._get_auth_token()
         if not token:
+            self.breaker.record_failure()
             raise Exception("Failed to authenticate with Openverse API")
 
-        response = requests.get(
-            f"{self.BASE_URL}/{endpoint}/",
-            headers={"Authorization": f"Bearer {token}"},
-            params=params
-        )
+        started = time.perf_counter()
+        try:
+            response = self.session.get(
+                f"{self.base_url}/{endpoint}/",
+                headers={"Authorization": f"Bearer {token}"},
+                params=params,
+                timeout=self._call_timeout(timeout)
+            )
+        except requests.exceptions.RequestException as e:
+            observe_upstream(endpoint, started, "timeout" if isinstance(e, requests.exceptions.Timeout) else "error")
+            if self._is_upstream_failure(e):
+                self.breaker.record_failure()
+            raise
 
-        if 'X-RateLimit-Remaining' in response.headers:
-            self.rate_limit = {
-                'remaining': int(response.headers['X-RateLimit-Remaining']),
-                'limit': int(response.headers['X-RateLimit-Limit']),
-                'reset': int(response.headers['X-RateLimit-Reset']),
-                'last_checked': time.time()
-            }
-        
+        observe_upstream(endpoint, started, response.status_code)
+        self._update_rate_limit(response.headers)
+        if response.status_code == 429:
+            # Not a sign of an outage, and the budget is already spent
+            raise self._throttled(response.headers)
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
         response.raise_for_status()
         return response.json()
-    
 
-    def search_images(
+    @staticmethod
+    def _mark_stale(results: Dict[str, Any], age: float) -> Dict[str, Any]:
+        return {**results, 'stale': True, 'age': int(age)}
+
+    def _search(
         self,
+        endpoint: str,
+        params: Dict[str, Any],
+        use_cache: bool = True,
+        timeout: Optional[Timeout] = None
+    ) -> Dict[str, Any]:
+        if self.cache is not None:
+            if use_cache:
+                cached = self.cache.get(endpoint, params)
+                if cached is not None:
+                    return cached
+                # Recently expired: answer now and refresh off the request path
+                stale = self.cache.get_stale(endpoint, params, self.cache.swr_window)
+                if stale is not None:
+                    self._revalidate(endpoint, params)
+                    return self._mark_stale(*stale)
+            else:
+                self.cache.record_bypass()
+
+        # Concurrent misses for the same normalized query share one upstream
+        # call (and one unit of rate budget).
+        key = ResponseCache.make_key(endpoint, params)
+        try:
+            return self.inflight.do(key, lambda: self._fetch(endpoint, params, timeout))
+        except Exception:
+            stale = self.cache.get_stale(endpoint, params) if self.cache is not None else None
+            if stale is None:
+                raise
+            return self._mark_stale(*stale)
+
+    def _fetch(self, endpoint: str, params: Dict[str, Any], timeout: Optional[Timeout] = None) -> Dict[str, Any]:
+        results = CachedPayload(self._make_request(endpoint, params, timeout))
+        if self.cache is not None:
+            results.etag = self.cache.set(endpoint, params, results)
+        if self.index is not None:
+            self.index.submit(endpoint, results)
+        return results
+
+    def refresh(self, endpoint: str, params: Dict[str, Any], timeout: Optional[Timeout] = None) -> Dict[str, Any]:
+        """Fetch ``params`` from upstream and store the result, never serving stale data."""
+        key = ResponseCache.make_key(endpoint, params)
+        return self.inflight.do(key, lambda: self._fetch(endpoint, params, timeout))
+
+    def _revalidate(self, endpoint: str, params: Dict[str, Any]) -> None:
+        key = ResponseCache.make_key(endpoint, params)
+        with self._revalidate_lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+
+        def refresh():
+            try:
+                self.refresh(endpoint, params)
+            except Exception as e:
+                print(f"Error revalidating {endpoint} results: {e}")
+            finally:
+                with self._revalidate_lock:
+                    self._revalidating.discard(key)
+
+        self._revalidate_pool.submit(refresh)
+
+
+    @staticmethod
+    def _build_params(
         query: str,
         page: int = 1,
         page_size: int = 20,
         license_type: Optional[str] = None,
         source: Optional[str] = None,
-        filetype: Optional[str] = None
+        filetype: Optional[str] = None,
+        category: Optional[List[str]] = None
     ) -> Dict[str, Any]:
-    
         params = {
             "q": query,
             "page": page,
@@ -121,9 +457,24 @@ class OpenverseClient:
             params["source"] = source
         if filetype:
             params["filetype"] = filetype
+        if category:
+            params["category"] = category
 
-        return self._make_request("images", params)
+        return params
 
+    def search_images(
+        self,
+        query: str,
+        page: int = 1,
+        page_size: int = 20,
+        license_type: Optional[str] = None,
+        source: Optional[str] = None,
+        filetype: Optional[str] = None,
+        use_cache: bool = True,
+        timeout: Optional[Timeout] = None
+    ) -> Dict[str, Any]:
+        params = self._build_params(query, page, page_size, license_type, source, filetype)
+        return self._search("images", params, use_cache, timeout)
 
     def search_audio(
         self,
@@ -133,24 +484,91 @@ class OpenverseClient:
         license_type: Optional[str] = None,
         source: Optional[str] = None,
         filetype: Optional[str] = None,
-        category: Optional[List[str]] = None
+        category: Optional[List[str]] = None,
+        use_cache: bool = True,
+        timeout: Optional[Timeout] = None
     ) -> Dict[str, Any]:
-    
-    
-        params = {
-            "q": query,
-            "page": page,
-            "page_size": page_size,
-        }
+        params = self._build_params(query, page, page_size, license_type, source, filetype, category)
+        return self._search("audio", params, use_cache, timeout)
 
-        if license_type:
-            params["license"] = license_type
-        if source:
-            params["source"] = source
-        if filetype:
-            params["filetype"] = filetype
-        if category:
-            params["category"] = category
+    def cached_etag(self, media_type: str, query: str, **options: Any) -> Optional[str]:
+        """Content hash of the fresh cached results for a search, without decoding them.
 
-        
-        return self._make_request("audio", params)
\ No newline at end of file
+        ``options`` are the keyword arguments of ``search_images`` or ``search_audio``.
+        """
+        if self.cache is None:
+            return None
+        return self.cache.etag(media_type, self._build_params(query, **options))
+
+    def project(self, payload: Dict[str, Any], media_type: str, fields: Optional[str] = None) -> Dict[str, Any]:
+        """Slim a search payload down to ``fields`` (comma separated, or "all")."""
+        return project_results(payload, parse_fields(fields, media_type))
+
+    def iter_pages(
+        self,
+        query: str,
+        media_type: str = "images",
+        max_items: int = 100,
+        page_size: int = 20,
+        prefetch: int = 1,
+        **filters: Any
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield result pages in order while the next ``prefetch`` pages load in the background."""
+        if media_type == "images":
+            search = self.search_images
+        elif media_type == "audio":
+            search = self.search_audio
+        else:
+            raise ValueError(f"Unsupported media type: {media_type}")
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1")
+
+        last_page = max(1, math.ceil(max_items / page_size))
+        executor = ThreadPoolExecutor(max_workers=max(1, prefetch), thread_name_prefix="openverse-prefetch")
+        # Pages requested beyond the one being consumed; never more than ``prefetch``
+        pending: Deque[Tuple[int, Future]] = deque()
+        next_page = 1
+
+        def submit() -> Tuple[int, Future]:
+            nonlocal next_page
+            page = next_page
+            next_page += 1
+            return page, executor.submit(search, query=query, page=page, page_size=page_size, **filters)
+
+        current: Optional[Tuple[int, Future]] = submit()
+        try:
+            while current is not None:
+                page, future = current
+                while next_page <= last_page and len(pending) < prefetch:
+                    pending.append(submit())
+                data = future.result()
+                results = data.get("results", [])
+                yield {**data, "page": page}
+
+                page_count = data.get("page_count") or last_page
+                if not results or page >= page_count:
+                    break
+                last_page = min(last_page, page_count)
+                current = pending.popleft() if pending else (submit() if next_page <= last_page else None)
+        finally:
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def iter_results(
+        self,
+        query: str,
+        media_type: str = "images",
+        max_items: int = 100,
+        page_size: int = 20,
+        prefetch: int = 1,
+        **filters: Any
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield up to ``max_items`` individual results across pages, prefetching ahead."""
+        remaining = max_items
+        for page in self.iter_pages(query, media_type, max_items, page_size, prefetch, **filters):
+            for result in page.get("results", [])[:remaining]:
+                yield result
+            remaining -= len(page.get("results", []))
+            if remaining <= 0:
+                return
@@ -0,0 +1,64 @@
+"""Compare sync and async Openverse client throughput against a fake server.
+
+The sync client runs on a thread pool of ``workers`` threads; the async
+client keeps ``workers`` requests outstanding from a single thread.
+
+    python -m benchmarks.bench_async --requests 400 --workers 8 32 128 --latency 0.05
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from AsyncOpenverseAPIClient import AsyncOpenverseClient
+from OpenverseAPIClient import OpenverseClient
+from benchmarks.fake_openverse import FakeOpenverse
+
+
+def bench_sync(url, total, workers):
+    client = OpenverseClient(base_url=url, pool_maxsize=workers)
+    client.cache = None
+    client.rate_limiter.update(10 ** 9, 10 ** 9, time.time() + 3600)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda i: client.search_images(f"q{i}"), range(total)))
+    elapsed = time.perf_counter() - start
+    client.close()
+    return total / elapsed
+
+
+async def _bench_async(url, total, workers):
+    client = AsyncOpenverseClient(base_url=url, max_connections=workers, max_keepalive_connections=workers)
+    client.cache = None
+    client.rate_limiter.update(10 ** 9, 10 ** 9, time.time() + 3600)
+    semaphore = asyncio.Semaphore(workers)
+
+    async def one(i):
+        async with semaphore:
+            await client.search_images(f"q{i}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(total)])
+    elapsed = time.perf_counter() - start
+    await client.aclose()
+    return total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--workers", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    with FakeOpenverse(latency=args.latency) as server:
+        print(f"{'workers':>8} {'sync req/s':>12} {'async req/s':>12}")
+        for workers in args.workers:
+            sync_rps = bench_sync(server.url, args.requests, workers)
+            async_rps = asyncio.run(_bench_async(server.url, args.requests, workers))
+            print(f"{workers:>8} {sync_rps:>12.1f} {async_rps:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
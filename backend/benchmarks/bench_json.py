@@ -0,0 +1,55 @@
+"""Micro-benchmark of the JSON encode path on realistic response payloads.
+
+    python -m benchmarks.bench_json --repeat 200
+"""
+import argparse
+import datetime
+import timeit
+
+from flask import Flask
+
+from benchmarks.fake_openverse import make_result
+from json_provider import init_json_provider, orjson
+
+
+def payloads():
+    now = datetime.datetime.now()
+    recent = [{
+        'id': i,
+        'media_type': "image",
+        'search_query': f"query {i}",
+        'timestamp': now - datetime.timedelta(minutes=i),
+        'total_results': i * 10,
+        'filters': {"license": "by", "source": "flickr"}
+    } for i in range(1000)]
+    return {
+        "search (20 results)": {"result_count": 10000, "results": [make_result("images", "cats", i) for i in range(20)]},
+        "search (500 results)": {"result_count": 10000, "results": [make_result("images", "cats", i) for i in range(500)]},
+        "recent_searches (1000 rows)": recent,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    providers = ["stdlib"] + (["orjson"] if orjson is not None else [])
+    apps = {}
+    for name in providers:
+        apps[name] = Flask(name)
+        init_json_provider(apps[name], name)
+
+    print(f"{'payload':<28}" + "".join(f"{name + ' ms':>12}" for name in providers))
+    for label, payload in payloads().items():
+        row = f"{label:<28}"
+        for name in providers:
+            app = apps[name]
+            with app.app_context():
+                seconds = timeit.timeit(lambda: app.json.response(payload), number=args.repeat)
+            row += f"{seconds / args.repeat * 1000:>12.3f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
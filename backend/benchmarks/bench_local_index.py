@@ -0,0 +1,64 @@
+"""Search latency of the local media index against a round trip to Openverse.
+
+Fills an index with ``--records`` fake results spread over ``--queries``
+distinct queries, then times searches against it and against a fake
+Openverse server with ``--latency`` seconds of upstream delay.
+
+    python -m benchmarks.bench_local_index --records 50000 --searches 500
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from media_index import MediaIndex
+from OpenverseAPIClient import OpenverseClient
+from benchmarks.fake_openverse import FakeOpenverse, make_result
+
+WORDS = ["cat", "dog", "sunset", "mountain", "ocean", "forest", "city", "jazz", "rain", "bird",
+         "flower", "river", "snow", "bridge", "night", "beach", "car", "train", "music", "piano"]
+
+
+def _timed(fn, repeat):
+    samples = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--searches", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    queries = [f"{WORDS[i % len(WORDS)]} {WORDS[(i * 7 + 3) % len(WORDS)]} {i}" for i in range(args.queries)]
+    index = MediaIndex(os.path.join(tempfile.mkdtemp(prefix="bench_index"), "media.db"), max_rows=args.records)
+    per_query = max(1, args.records // args.queries)
+    start = time.perf_counter()
+    for query in queries:
+        index.add("images", [make_result("images", query, i) for i in range(per_query)])
+    print(f"indexed {index.stats()['rows']} records in {time.perf_counter() - start:.1f}s")
+
+    print(f"{'backend':<22}{'p50 ms':>9}{'p95 ms':>9}")
+    local = _timed(lambda i: index.search("images", WORDS[i % len(WORDS)]), args.searches)
+    print(f"{'local index (1 word)':<22}{local[0]:>9.2f}{local[1]:>9.2f}")
+    local = _timed(lambda i: index.search("images", queries[i % len(queries)]), args.searches)
+    print(f"{'local index (phrase)':<22}{local[0]:>9.2f}{local[1]:>9.2f}")
+
+    with FakeOpenverse(latency=args.latency) as server:
+        client = OpenverseClient(base_url=server.url, cache=None)
+        client.rate_limiter.update(10 ** 9, 10 ** 9, time.time() + 3600)
+        upstream = _timed(lambda i: client.search_images(queries[i % len(queries)]), min(args.searches, 100))
+        client.close()
+    print(f"{'openverse (fake)':<22}{upstream[0]:>9.2f}{upstream[1]:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Bytes on the wire and serialization cost of /search_images responses.
+
+Compares the full Openverse payload with the default slim projection, each
+uncompressed, gzip'd and (when installed) brotli'd.
+
+    python -m benchmarks.bench_payload --page-size 20 100 500
+"""
+import argparse
+import time
+
+from benchmarks.fake_openverse import make_result
+
+
+def _time(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--page-size", type=int, nargs="+", default=[20, 100, 500])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    from main import create_app, ov_client
+    app = create_app()
+    client = app.test_client()
+
+    encodings = ["identity", "gzip"]
+    try:
+        import brotli  # noqa: F401
+        encodings.append("br")
+    except ImportError:
+        pass
+
+    print(f"{'page_size':>9} {'fields':>6} {'encoding':>8} {'bytes':>9} {'ms/request':>11}")
+    for page_size in args.page_size:
+        payload = {
+            "result_count": 10000,
+            "page_count": 500,
+            "page_size": page_size,
+            "page": 1,
+            "results": [make_result("images", "cats", i) for i in range(page_size)],
+        }
+        ov_client.search_images = lambda **kwargs: payload
+
+        for fields in ("all", "slim"):
+            query = "/search_images?q=cats" + ("&fields=all" if fields == "all" else "")
+            for encoding in encodings:
+                elapsed, response = _time(
+                    lambda: client.get(query, headers={"Accept-Encoding": encoding}), args.repeat
+                )
+                print(f"{page_size:>9} {fields:>6} {encoding:>8} {len(response.data):>9} {elapsed * 1000:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
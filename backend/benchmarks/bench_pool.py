@@ -0,0 +1,73 @@
+"""Compare bare requests.get against the pooled OpenverseClient session.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_pool --requests 200 --threads 8 --handshake-delay 0.02
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from OpenverseAPIClient import OpenverseClient
+from benchmarks.fake_openverse import FakeOpenverse
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _run(label, call, total, threads):
+    latencies = []
+
+    def timed(_):
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(timed, range(total)))
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{label:<10} {total / elapsed:8.1f} req/s  "
+        f"p50={statistics.median(latencies) * 1000:6.1f}ms  "
+        f"p95={_percentile(latencies, 95) * 1000:6.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--handshake-delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    with FakeOpenverse(args.latency, args.handshake_delay) as server:
+        params = {"q": "cats", "page": 1, "page_size": 20}
+
+        _run(
+            "bare",
+            lambda: requests.get(f"{server.url}/images/", params=params).json(),
+            args.requests,
+            args.threads,
+        )
+        bare_connections = server.connections
+
+        client = OpenverseClient(base_url=server.url, pool_maxsize=args.threads)
+        client.rate_limiter.update(10 ** 9, 10 ** 9, time.time() + 3600)
+        _run("pooled", lambda: client.search_images("cats"), args.requests, args.threads)
+
+        stats = client.pool_stats()
+        print(f"bare connections opened:   {bare_connections}")
+        print(f"pooled connections opened: {stats['connections_opened']} "
+              f"(reuse rate {stats['reuse_rate']:.1%})")
+
+
+if __name__ == "__main__":
+    main()
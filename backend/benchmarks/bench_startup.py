@@ -0,0 +1,56 @@
+"""Cold-start time of the API: interpreter start, ``import main``, ``create_app()``
+and the first request, each in a fresh process.
+
+    python -m benchmarks.bench_startup --runs 5 --budget 3.0
+
+Exits 1 when the median exceeds ``--budget`` seconds, so it can guard the
+container start period in docker-compose.yml.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+app = main.create_app()
+created = time.perf_counter()
+assert app.test_client().get("/healthz").status_code == 200
+served = time.perf_counter()
+print(json.dumps({"import": imported - started, "create_app": created - imported, "first_request": served - created}))
+"""
+
+
+def measure() -> dict:
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True, check=True).stdout
+    phases = json.loads(output.strip().splitlines()[-1])
+    phases["total"] = time.perf_counter() - started
+    return phases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, help="fail when the median total exceeds this many seconds")
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.runs)]
+    print(f"{'phase':<14}{'median ms':>10}{'max ms':>10}")
+    for phase in ("import", "create_app", "first_request", "total"):
+        values = [run[phase] * 1000 for run in runs]
+        print(f"{phase:<14}{statistics.median(values):>10.1f}{max(values):>10.1f}")
+
+    median = statistics.median(run["total"] for run in runs)
+    if args.budget is not None and median > args.budget:
+        print(f"startup {median:.2f}s exceeds the {args.budget:.2f}s budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlencode, urlparse
+
+
+def payload_key(media_type: str, params: Dict[str, Any]) -> str:
+    """Recording key for a search: the endpoint plus its sorted query string."""
+    return f"{media_type}?{urlencode(sorted((k, str(v)) for k, v in params.items()))}"
+
+
+def load_recording(path: str) -> Dict[str, Dict[str, Any]]:
+    with open(path) as f:
+        return json.load(f)["payloads"]
+
+
+def save_recording(path: str, payloads: Dict[str, Dict[str, Any]]) -> None:
+    with open(path, "w") as f:
+        json.dump({"version": 1, "recorded_at": time.time(), "payloads": payloads}, f)
+
+
+def make_result(media_type: str, query: str, index: int) -> Dict[str, Any]:
+    """A result shaped like a real Openverse record, with all its fields."""
+    result = {
+        "id": f"{media_type}-{query}-{index}",
+        "title": f"{query} {media_type} {index}",
+        "indexed_on": "2023-06-14T10:22:31Z",
+        "foreign_landing_url": f"https://www.flickr.com/photos/fake/{index}",
+        "url": f"https://example.org/{media_type}/{index}.jpg",
+        "creator": "fake creator",
+        "creator_url": "https://www.flickr.com/photos/fake",
+        "license": "by",
+        "license_version": "4.0",
+        "license_url": "https://creativecommons.org/licenses/by/4.0/",
+        "provider": "flickr",
+        "source": "flickr",
+        "category": None,
+        "filesize": 482113 + index,
+        "filetype": "jpg",
+        "tags": [
+            {"accuracy": None, "name": query, "unstable__provider": "flickr"},
+            {"accuracy": 0.97, "name": media_type, "unstable__provider": "clarifai"},
+            {"accuracy": 0.91, "name": "outdoor", "unstable__provider": "clarifai"},
+            {"accuracy": 0.88, "name": "nature", "unstable__provider": "clarifai"},
+        ],
+        "attribution": f'"{query} {media_type} {index}" by fake creator is licensed under CC BY 4.0. '
+                       "To view a copy of this license, visit https://creativecommons.org/licenses/by/4.0/.",
+        "fields_matched": ["title", "tags.name"],
+        "mature": False,
+        "thumbnail": f"https://api.openverse.org/v1/{media_type}/{index}/thumb/",
+        "detail_url": f"https://api.openverse.org/v1/{media_type}/{index}/",
+        "related_url": f"https://api.openverse.org/v1/{media_type}/{index}/related/",
+        "unstable__sensitivity": [],
+    }
+    if media_type == "images":
+        result.update({"height": 1024, "width": 768})
+    else:
+        result.update({
+            "filetype": "mp3",
+            "category": "music",
+            "genres": ["jazz"],
+            "duration": 183000 + index,
+            "bit_rate": 128000,
+            "sample_rate": 44100,
+            "alt_files": None,
+            "audio_set": None,
+            "waveform": f"https://api.openverse.org/v1/audio/{index}/waveform/",
+        })
+    return result
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "_Server"
+
+    def setup(self):
+        # Stand-in for the TCP+TLS handshake cost of a fresh connection.
+        self.server.connections += 1
+        if self.server.handshake_delay:
+            time.sleep(self.server.handshake_delay)
+        super().setup()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload).encode()
+        remaining, limit, reset = self.server.rate_limit_state()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-RateLimit-Limit", str(limit))
+        self.send_header("X-RateLimit-Remaining", str(remaining))
+        self.send_header("X-RateLimit-Reset", str(int(reset)))
+        if status >= 429 and self.server.retry_after:
+            self.send_header("Retry-After", str(self.server.retry_after))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _search(self, media_type: str, params: Dict[str, str]) -> None:
+        server = self.server
+        if server.fail_status:
+            return self._send_json(server.fail_status, {"detail": "Simulated failure"})
+        if server.error_rate and server.roll() < server.error_rate:
+            server.injected_errors += 1
+            return self._send_json(server.error_status, {"detail": "Simulated failure"})
+        if not server.take_rate_limit_token():
+            return self._send_json(429, {"detail": "Request was throttled."})
+
+        if server.replay is not None:
+            recorded = server.replay.get(payload_key(media_type, params))
+            if recorded is not None:
+                return self._send_json(200, recorded)
+            server.replay_misses += 1
+
+        query = params.get("q", "")
+        page_size = int(params.get("page_size", "20"))
+        return self._send_json(200, {
+            "result_count": 10000,
+            "page_count": 500,
+            "page_size": page_size,
+            "page": int(params.get("page", "1")),
+            "results": [make_result(media_type, query, i) for i in range(page_size)],
+        })
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        if urlparse(self.path).path.endswith("/auth_tokens/token/"):
+            self.server.auth_requests += 1
+            if self.server.latency:
+                time.sleep(self.server.latency)
+            return self._send_json(200, {
+                "access_token": f"fake-token-{self.server.auth_requests}" if self.server.auth_requests > 1 else "fake-token",
+                "expires_in": self.server.token_expires_in,
+            })
+        self._send_json(404, {"detail": "Not found"})
+
+    def do_GET(self):
+        self.server.requests += 1
+        parsed = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        latency = self.server.latency
+        if self.server.jitter:
+            latency += self.server.roll() * self.server.jitter
+        if latency:
+            time.sleep(latency)
+
+        if parsed.path.endswith("/rate_limit/"):
+            remaining, limit, reset = self.server.rate_limit_state()
+            return self._send_json(200, {
+                "rate_limit_remaining": remaining,
+                "rate_limit_total": limit,
+                "rate_limit_reset": reset,
+            })
+
+        for media_type in ("images", "audio"):
+            if parsed.path.endswith(f"/{media_type}/"):
+                return self._search(media_type, params)
+
+        self._send_json(404, {"detail": "Not found"})
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    latency = 0.0
+    jitter = 0.0
+    handshake_delay = 0.0
+    token_expires_in = 3600
+    fail_status = 0
+    error_rate = 0.0
+    error_status = 503
+    retry_after = 0
+    rate_limit = 10000
+    rate_window = 3600.0
+    replay: Optional[Dict[str, Dict[str, Any]]] = None
+    connections = 0
+    requests = 0
+    auth_requests = 0
+    injected_errors = 0
+    replay_misses = 0
+
+    def __init__(self, *args, seed: Optional[int] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._used = 0
+        self._reset = time.time() + self.rate_window
+
+    def roll(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+    def _roll_window(self, now: float) -> None:
+        if now >= self._reset:
+            self._used = 0
+            self._reset = now + self.rate_window
+
+    def take_rate_limit_token(self) -> bool:
+        with self._lock:
+            self._roll_window(time.time())
+            if self._used >= self.rate_limit:
+                return False
+            self._used += 1
+            return True
+
+    def rate_limit_state(self):
+        with self._lock:
+            self._roll_window(time.time())
+            return max(0, self.rate_limit - self._used), self.rate_limit, self._reset
+
+
+class FakeOpenverse:
+    """Local stand-in for api.openverse.org used by the benchmarks."""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        handshake_delay: float = 0.0,
+        port: int = 0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        rate_limit: int = 10000,
+        rate_window: float = 3600.0,
+        replay: Optional[str] = None,
+        seed: Optional[int] = None
+    ):
+        self._server = _Server(("127.0.0.1", port), _Handler, seed=seed)
+        self._server.latency = latency
+        self._server.handshake_delay = handshake_delay
+        self._server.jitter = jitter
+        self._server.error_rate = error_rate
+        self._server.error_status = error_status
+        self._server.rate_limit = rate_limit
+        self._server.rate_window = rate_window
+        self._server.replay = load_recording(replay) if replay else None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def latency(self) -> float:
+        return self._server.latency
+
+    @latency.setter
+    def latency(self, value: float) -> None:
+        self._server.latency = value
+
+    @property
+    def fail_status(self) -> int:
+        """HTTP status returned for searches instead of results (0 = succeed)."""
+        return self._server.fail_status
+
+    @fail_status.setter
+    def fail_status(self, value: int) -> None:
+        self._server.fail_status = value
+
+    @property
+    def retry_after(self) -> int:
+        """Retry-After seconds sent with 429 and 5xx responses (0 = none)."""
+        return self._server.retry_after
+
+    @retry_after.setter
+    def retry_after(self, value: int) -> None:
+        self._server.retry_after = value
+
+    @property
+    def error_rate(self) -> float:
+        """Fraction of searches answered with ``error_status`` at random."""
+        return self._server.error_rate
+
+    @error_rate.setter
+    def error_rate(self, value: float) -> None:
+        self._server.error_rate = value
+
+    @property
+    def injected_errors(self) -> int:
+        return self._server.injected_errors
+
+    @property
+    def replay_misses(self) -> int:
+        """Searches with no recorded payload, answered with generated results instead."""
+        return self._server.replay_misses
+
+    @property
+    def connections(self) -> int:
+        return self._server.connections
+
+    @property
+    def requests(self) -> int:
+        return self._server.requests
+
+    @property
+    def auth_requests(self) -> int:
+        return self._server.auth_requests
+
+    def start(self) -> "FakeOpenverse":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeOpenverse":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a fake Openverse API server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--handshake-delay", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--rate-limit", type=int, default=10000, help="searches allowed per --rate-window")
+    parser.add_argument("--rate-window", type=float, default=3600.0)
+    parser.add_argument("--replay", help="serve payloads captured by benchmarks.record_payloads")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    server = FakeOpenverse(
+        args.latency, args.handshake_delay, args.port,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        rate_limit=args.rate_limit,
+        rate_window=args.rate_window,
+        replay=args.replay,
+        seed=args.seed
+    )
+    print(f"Fake Openverse listening on {server.url}")
+    server._server.serve_forever()
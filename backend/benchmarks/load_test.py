@@ -0,0 +1,284 @@
+"""Load-test ``main.app`` over HTTP against a fake Openverse server.
+
+The app is served by a threaded werkzeug server; ``--concurrency`` client
+threads (each with its own keep-alive session and user) run a weighted mix
+of requests for ``--duration`` seconds. Per route it reports req/s and
+p50/p95/p99 latency, and can store the numbers as a baseline or compare a
+run against one:
+
+    python -m benchmarks.load_test --scenario mixed --concurrency 16 --duration 10
+    python -m benchmarks.load_test --scenario mixed --save-baseline
+    python -m benchmarks.load_test --scenario mixed --compare --tolerance 0.25
+
+Scenarios:
+
+  search_cached    repeated searches over a small query set (cache hits)
+  search_cold      unique queries, so every search goes upstream
+  search_degraded  like search_cold with upstream errors and jitter
+  recent_searches  authenticated saves and paged recent-search listings
+  mixed            a bit of everything, roughly like the frontend
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from benchmarks.fake_openverse import FakeOpenverse
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+QUERIES = ["cats", "dogs", "mountains", "ocean", "city", "forest", "jazz", "rain"]
+
+
+@dataclass
+class Step:
+    """One kind of request in a scenario: ``make(rng, n)`` returns ``(method, path, json)``."""
+
+    route: str
+    weight: int
+    make: Callable[[random.Random, int], Tuple[str, str, Optional[Dict[str, Any]]]]
+    auth: bool = False
+
+
+def _get(path: str) -> Callable[[random.Random, int], Tuple[str, str, None]]:
+    return lambda rng, n: ("GET", path, None)
+
+
+def _cached_search(endpoint: str) -> Callable[[random.Random, int], Tuple[str, str, None]]:
+    return lambda rng, n: ("GET", f"{endpoint}?q={rng.choice(QUERIES)}", None)
+
+
+def _cold_search(endpoint: str) -> Callable[[random.Random, int], Tuple[str, str, None]]:
+    return lambda rng, n: ("GET", f"{endpoint}?q=cold-{threading.get_ident()}-{n}", None)
+
+
+def _save_search(rng: random.Random, n: int) -> Tuple[str, str, Dict[str, Any]]:
+    name = f"{rng.choice(QUERIES)}-{threading.get_ident()}-{n}"
+    return "POST", "/save_search", {"name": name, "query": name, "media_type": "images", "total_results": n}
+
+
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    "search_cached": {
+        "steps": [
+            Step("/search_images", 3, _cached_search("/search_images")),
+            Step("/search_audio", 1, _cached_search("/search_audio")),
+        ],
+    },
+    "search_cold": {
+        "steps": [
+            Step("/search_images", 3, _cold_search("/search_images")),
+            Step("/search_audio", 1, _cold_search("/search_audio")),
+        ],
+    },
+    "search_degraded": {
+        "steps": [Step("/search_images", 1, _cold_search("/search_images"))],
+        "fake": {"error_rate": 0.2, "jitter": 0.05},
+    },
+    "recent_searches": {
+        "steps": [
+            Step("/save_search", 1, _save_search, auth=True),
+            Step("/recent_searches", 4, _get("/recent_searches?limit=20"), auth=True),
+        ],
+    },
+    "mixed": {
+        "steps": [
+            Step("/search_images", 6, _cached_search("/search_images")),
+            Step("/search_audio", 2, _cached_search("/search_audio")),
+            Step("/search", 1, _cached_search("/search")),
+            Step("/save_search", 1, _save_search, auth=True),
+            Step("/recent_searches", 3, _get("/recent_searches?limit=20"), auth=True),
+            Step("/rate_limit", 1, _get("/rate_limit")),
+        ],
+    },
+}
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of ``samples`` (which need not be sorted)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(samples: Dict[str, List[Tuple[float, int]]], elapsed: float) -> Dict[str, Dict[str, float]]:
+    """Per-route (and ``total``) counts, req/s, latency percentiles in ms and error counts."""
+    def stats(rows):
+        latencies = [latency * 1000 for latency, _ in rows]
+        return {
+            "count": len(rows),
+            "rps": round(len(rows) / elapsed, 1),
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "errors": sum(1 for _, status in rows if status == 0 or status >= 400),
+        }
+
+    report = {route: stats(rows) for route, rows in sorted(samples.items())}
+    report["total"] = stats([row for rows in samples.values() for row in rows])
+    return report
+
+
+def compare(report: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """Routes whose p95 rose or whose throughput fell by more than ``tolerance``."""
+    regressions = []
+    for route, now in report.items():
+        before = baseline.get(route)
+        if before is None:
+            continue
+        if before["p95"] and now["p95"] > before["p95"] * (1 + tolerance):
+            regressions.append(f"{route}: p95 {before['p95']:.1f}ms -> {now['p95']:.1f}ms")
+        if before["rps"] and now["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(f"{route}: {before['rps']:.1f} -> {now['rps']:.1f} req/s")
+    return regressions
+
+
+def _print_report(report, baseline=None):
+    print(f"{'route':<18}{'count':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for route, row in report.items():
+        line = (f"{route:<18}{row['count']:>8}{row['rps']:>9.1f}{row['p50']:>9.2f}"
+                f"{row['p95']:>9.2f}{row['p99']:>9.2f}{row['errors']:>8}")
+        if baseline and route in baseline and baseline[route]["p95"]:
+            line += f"   p95 {(row['p95'] / baseline[route]['p95'] - 1) * 100:+.0f}%"
+        print(line)
+
+
+def _prepare_env(fake_url: str) -> None:
+    workdir = tempfile.mkdtemp(prefix="load_test")
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'load.db')}",
+        "OPENVERSE_BASE_URL": fake_url,
+        "RATE_LIMIT_STORE": "memory",
+        "CACHE_BACKEND": "memory",
+        "PASSWORD_HASH_WORKERS": "0",
+        "LOGIN_THROTTLE_ACCOUNT_LIMIT": "1000000",
+        "LOGIN_THROTTLE_IP_LIMIT": "1000000",
+    })
+
+
+def _login(base: str, session: requests.Session, index: int) -> str:
+    credentials = {"email": f"load{index}@example.com", "password": "load-test-password"}
+    session.post(f"{base}/register", json=credentials)
+    response = session.post(f"{base}/login", json=credentials)
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def run(scenario: str, concurrency: int, duration: float, seed: int, fake: FakeOpenverse) -> Dict[str, Dict[str, float]]:
+    _prepare_env(fake.url)
+    from werkzeug.serving import make_server
+    from main import create_app
+    app = create_app()
+    from config import db
+
+    with app.app_context():
+        db.create_all()
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    steps = SCENARIOS[scenario]["steps"]
+    weights = [step.weight for step in steps]
+    samples: Dict[str, List[Tuple[float, int]]] = defaultdict(list)
+    lock = threading.Lock()
+    start_at = time.perf_counter() + 0.5
+
+    def worker(index: int) -> None:
+        rng = random.Random(seed + index)
+        session = requests.Session()
+        token = _login(base, session, index) if any(step.auth for step in steps) else None
+        local = defaultdict(list)
+        # Start together so logins do not count against the measured window
+        time.sleep(max(0.0, start_at - time.perf_counter()))
+        n = 0
+        while time.perf_counter() - start_at < duration:
+            step = rng.choices(steps, weights)[0]
+            method, path, body = step.make(rng, n)
+            headers = {"Authorization": f"Bearer {token}"} if step.auth else {}
+            started = time.perf_counter()
+            try:
+                status = session.request(method, base + path, json=body, headers=headers, timeout=30).status_code
+            except requests.RequestException:
+                status = 0
+            local[step.route].append((time.perf_counter() - started, status))
+            n += 1
+        session.close()
+        with lock:
+            for route, rows in local.items():
+                samples[route].extend(rows)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    server.shutdown()
+    return summarize(samples, duration)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake Openverse latency per request (s)")
+    parser.add_argument("--replay", help="serve payloads captured by benchmarks.record_payloads")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline", help=f"baseline file (default: {BASELINE_DIR}/<scenario>.json)")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="exit 1 when a route regresses past --tolerance")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f"{args.scenario}.json")
+    fake_options = {"latency": args.latency, "replay": args.replay, "seed": args.seed,
+                    **SCENARIOS[args.scenario].get("fake", {})}
+    with FakeOpenverse(**fake_options) as fake:
+        report = run(args.scenario, args.concurrency, args.duration, args.seed, fake)
+        upstream = {"requests": fake.requests, "injected_errors": fake.injected_errors}
+
+    baseline = None
+    if args.compare:
+        with open(baseline_path) as f:
+            baseline = json.load(f)["routes"]
+    print(f"scenario={args.scenario} concurrency={args.concurrency} duration={args.duration}s "
+          f"upstream_requests={upstream['requests']} injected_errors={upstream['injected_errors']}")
+    _print_report(report, baseline)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, "w") as f:
+            json.dump({
+                "scenario": args.scenario,
+                "concurrency": args.concurrency,
+                "duration": args.duration,
+                "latency": args.latency,
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "routes": report,
+            }, f, indent=2)
+            f.write("\n")
+        print(f"saved baseline to {baseline_path}")
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Capture real Openverse search payloads for ``FakeOpenverse --replay``.
+
+Uses the normal client (and so ``OPENVERSE_CLIENT_ID``/``SECRET`` and the
+request budget) against the real API, or ``--base-url``:
+
+    python -m benchmarks.record_payloads --queries cats dogs --pages 2 --out benchmarks/recordings/sample.json
+"""
+import argparse
+import time
+
+from OpenverseAPIClient import OpenverseClient
+from benchmarks.fake_openverse import payload_key, save_recording
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", nargs="+", required=True)
+    parser.add_argument("--media", nargs="+", default=["images", "audio"], choices=["images", "audio"])
+    parser.add_argument("--pages", type=int, default=1)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--base-url")
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    client = OpenverseClient(base_url=args.base_url)
+    client.cache = None
+    payloads = {}
+    for media_type in args.media:
+        for query in args.queries:
+            for page in range(1, args.pages + 1):
+                params = OpenverseClient._build_params(query, page, args.page_size)
+                started = time.perf_counter()
+                try:
+                    payloads[payload_key(media_type, params)] = client._make_request(media_type, params)
+                except Exception as e:
+                    print(f"skipped {media_type} {query!r} page {page}: {e}")
+                    continue
+                print(f"recorded {media_type} {query!r} page {page} in {time.perf_counter() - started:.2f}s")
+    client.close()
+
+    save_recording(args.out, payloads)
+    print(f"wrote {len(payloads)} payloads to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
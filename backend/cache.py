@@ -0,0 +1,362 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from local_store import ThreadLocalConnection
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+
+class MemoryBackend:
+    """In-process LRU bounded by entry count and total payload bytes."""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + ttl, value)
+            self._bytes += len(value)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key: str) -> None:
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'evictions': self.evictions
+        }
+
+
+class SQLiteBackend:
+    """File-backed cache shared by every worker process on the host.
+
+    Eviction is by insertion age once ``max_entries`` is exceeded; recency is
+    tracked by the in-process tier in front of it.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._conn = ThreadLocalConnection(path, synchronous="NORMAL")
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " stored_at REAL NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        self._conn().execute(
+            "CREATE INDEX IF NOT EXISTS ix_response_cache_stored_at ON response_cache (stored_at)"
+        )
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._conn().execute(
+            "SELECT value FROM response_cache WHERE key = ? AND expires_at > ?",
+            (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO response_cache (key, value, stored_at, expires_at) VALUES (?, ?, ?, ?)",
+            (key, value, now, now + ttl)
+        )
+        count = conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+        if count > self.max_entries:
+            conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+            overflow = conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM response_cache WHERE key IN ("
+                    " SELECT key FROM response_cache ORDER BY stored_at LIMIT ?)",
+                    (overflow,)
+                )
+                self.evictions += overflow
+
+    def delete(self, key: str) -> None:
+        self._conn().execute("DELETE FROM response_cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM response_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        count = self._conn().execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+        return {'entries': count, 'evictions': self.evictions}
+
+
+class RedisBackend:
+    """Shared cache on any server speaking the Redis protocol (needs ``redis``)."""
+
+    def __init__(self, url: str, prefix: str = "ovcache:"):
+        import redis
+
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._redis.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._redis.set(self.prefix + key, value, px=int(ttl * 1000))
+
+    def delete(self, key: str) -> None:
+        self._redis.delete(self.prefix + key)
+
+    def clear(self) -> None:
+        for key in self._redis.scan_iter(f"{self.prefix}*"):
+            self._redis.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class CachedPayload(dict):
+    """A search payload that remembers the content hash it was cached under."""
+
+    etag: Optional[str] = None
+
+
+class ResponseCache:
+    """Two-tier cache of Openverse search responses.
+
+    Lookups go to the in-process LRU first and then to the optional shared
+    backend; shared hits are copied into the local tier.
+
+    Entries outlive their TTL by ``stale_ttl`` seconds so that the last good
+    response for a query can still be served, marked stale, when a refresh
+    is pending or upstream is failing.
+    """
+
+    DEFAULT_TTLS = {'images': 300, 'audio': 300}
+
+    def __init__(
+        self,
+        local: Optional[MemoryBackend] = None,
+        shared: Optional[Any] = None,
+        ttls: Optional[Dict[str, float]] = None,
+        stale_ttl: float = 86400,
+        swr_window: float = 60
+    ):
+        self.local = local if local is not None else MemoryBackend()
+        self.shared = shared
+        self.ttls = {**self.DEFAULT_TTLS, **(ttls or {})}
+        self.stale_ttl = stale_ttl
+        self.swr_window = min(swr_window, stale_ttl)
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'shared_hits': 0, 'bypasses': 0, 'sets': 0, 'stale_hits': 0}
+
+    @classmethod
+    def from_env(cls) -> Optional["ResponseCache"]:
+        if os.getenv("CACHE_ENABLED", "1") != "1":
+            return None
+
+        local = MemoryBackend(
+            max_entries=_env_int("CACHE_MAX_ENTRIES", 1024),
+            max_bytes=_env_int("CACHE_MAX_BYTES", 32 * 1024 * 1024)
+        )
+        backend = os.getenv("CACHE_BACKEND", "memory")
+        shared = None
+        if backend == "sqlite":
+            shared = SQLiteBackend(
+                os.getenv("CACHE_SQLITE_PATH", "response_cache.db"),
+                max_entries=_env_int("CACHE_SHARED_MAX_ENTRIES", 10000)
+            )
+        elif backend == "redis":
+            shared = RedisBackend(os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0"))
+
+        ttls = {
+            'images': _env_int("CACHE_TTL_IMAGES", cls.DEFAULT_TTLS['images']),
+            'audio': _env_int("CACHE_TTL_AUDIO", cls.DEFAULT_TTLS['audio'])
+        }
+        return cls(
+            local=local,
+            shared=shared,
+            ttls=ttls,
+            stale_ttl=_env_int("CACHE_STALE_TTL", 86400),
+            swr_window=_env_int("CACHE_SWR_WINDOW", 60)
+        )
+
+    @staticmethod
+    def make_key(media_type: str, params: Dict[str, Any]) -> str:
+        normalized = {}
+        for name, value in params.items():
+            if value is None or value == "" or value == []:
+                continue
+            if name == "q":
+                value = " ".join(str(value).lower().split())
+            elif isinstance(value, (list, tuple)):
+                value = ",".join(sorted(str(v) for v in value))
+            else:
+                value = str(value)
+            normalized[name] = value
+        return f"{media_type}:" + json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    @staticmethod
+    def _pack(results: Dict[str, Any]) -> Tuple[bytes, str]:
+        body = json.dumps(results, separators=(",", ":")).encode()
+        etag = hashlib.sha1(body).hexdigest()
+        # A one-line header first, so freshness and etag are readable without decoding the body
+        header = json.dumps({'stored_at': time.time(), 'etag': etag}).encode()
+        return header + b"\n" + body, etag
+
+    @staticmethod
+    def _header(value: bytes) -> Dict[str, Any]:
+        return json.loads(value[:value.index(b"\n")])
+
+    @staticmethod
+    def _payload(value: bytes, header: Dict[str, Any]) -> CachedPayload:
+        payload = CachedPayload(json.loads(value[value.index(b"\n") + 1:]))
+        payload.etag = header['etag']
+        return payload
+
+    def _lookup(self, media_type: str, params: Dict[str, Any]) -> Optional[Tuple[bytes, Dict[str, Any], float]]:
+        """Return ``(value, header, age)`` of the newest copy, fresh or stale."""
+        key = self.make_key(media_type, params)
+        ttl = self.ttls.get(media_type, 300)
+        value = self.local.get(key)
+        header = self._header(value) if value is not None else None
+        if (header is None or time.time() - header['stored_at'] >= ttl) and self.shared is not None:
+            # Another worker may already have refreshed what we hold stale
+            try:
+                shared_value = self.shared.get(key)
+            except Exception as e:
+                print(f"Error reading shared cache: {e}")
+                shared_value = None
+            if shared_value is not None:
+                shared_header = self._header(shared_value)
+                if header is None or shared_header['stored_at'] > header['stored_at']:
+                    value, header = shared_value, shared_header
+                    remaining = header['stored_at'] + ttl + self.stale_ttl - time.time()
+                    if remaining > 0:
+                        self.local.set(key, value, remaining)
+                    if time.time() - header['stored_at'] < ttl:
+                        self._count('shared_hits')
+        if header is None:
+            return None
+        return value, header, time.time() - header['stored_at']
+
+    def get(self, media_type: str, params: Dict[str, Any]) -> Optional[CachedPayload]:
+        found = self._lookup(media_type, params)
+        if found is None or found[2] >= self.ttls.get(media_type, 300):
+            self._count('misses')
+            return None
+        self._count('hits')
+        return self._payload(found[0], found[1])
+
+    def entry_age(self, media_type: str, params: Dict[str, Any]) -> Optional[float]:
+        """Seconds since the cached copy was stored, or None when there is none."""
+        found = self._lookup(media_type, params)
+        return found[2] if found is not None else None
+
+    def etag(self, media_type: str, params: Dict[str, Any]) -> Optional[str]:
+        """Content hash of the fresh cached copy, read without decoding it."""
+        found = self._lookup(media_type, params)
+        if found is None or found[2] >= self.ttls.get(media_type, 300):
+            return None
+        return found[1]['etag']
+
+    def get_stale(
+        self,
+        media_type: str,
+        params: Dict[str, Any],
+        max_stale: Optional[float] = None
+    ) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Return ``(results, age)`` for an expired entry at most ``max_stale`` seconds past its TTL."""
+        found = self._lookup(media_type, params)
+        if found is None:
+            return None
+        value, header, age = found
+        overdue = age - self.ttls.get(media_type, 300)
+        if max_stale is not None and overdue > max_stale:
+            return None
+        self._count('stale_hits')
+        return self._payload(value, header), age
+
+    def set(self, media_type: str, params: Dict[str, Any], results: Dict[str, Any]) -> str:
+        """Store ``results`` and return their content hash."""
+        key = self.make_key(media_type, params)
+        value, etag = self._pack(results)
+        ttl = self.ttls.get(media_type, 300) + self.stale_ttl
+        self.local.set(key, value, ttl)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value, ttl)
+            except Exception as e:
+                print(f"Error writing shared cache: {e}")
+        self._count('sets')
+        return etag
+
+    def record_bypass(self) -> None:
+        self._count('bypasses')
+
+    def clear(self) -> None:
+        self.local.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters['hits'] + counters['misses']
+        local = self.local.stats()
+        return {
+            **counters,
+            'hit_ratio': counters['hits'] / lookups if lookups else 0.0,
+            'evictions': local['evictions'],
+            'local': local,
+            'shared': self.shared.stats() if self.shared is not None else None,
+            'ttls': self.ttls,
+            'stale_ttl': self.stale_ttl,
+            'swr_window': self.swr_window
+        }
@@ -0,0 +1,61 @@
+import gzip
+import os
+
+from flask import Flask, Response, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/plain", "text/html"}
+
+
+def choose_encoding() -> str:
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return ""
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=min(level, 11))
+    return gzip.compress(data, compresslevel=level)
+
+
+def init_compression(app: Flask) -> None:
+    min_size = int(os.getenv("COMPRESS_MIN_SIZE", 1024))
+    gzip_level = int(os.getenv("COMPRESS_GZIP_LEVEL", 6))
+    brotli_quality = int(os.getenv("COMPRESS_BROTLI_QUALITY", 4))
+
+    @app.after_request
+    def compress_response(response: Response) -> Response:
+        if (
+            response.direct_passthrough
+            or response.is_streamed
+            or response.status_code < 200
+            or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        ):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+
+        encoding = choose_encoding()
+        if not encoding:
+            return response
+
+        response.set_data(compress(data, encoding, brotli_quality if encoding == "br" else gzip_level))
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # A strong validator must differ between representations
+            response.set_etag(f"{etag}-{encoding}")
+        return response
@@ -0,0 +1,44 @@
+import hashlib
+from typing import Iterable, Optional
+
+from flask import Response, current_app, request
+
+# Suffixes compression appends to a strong ETag, one per content coding
+ENCODING_SUFFIXES = ("-gzip", "-br")
+
+
+def derive_etag(*parts: object) -> str:
+    """Hash ``parts`` into an opaque strong validator."""
+    digest = hashlib.sha1("|".join("" if part is None else str(part) for part in parts).encode())
+    return digest.hexdigest()[:32]
+
+
+def if_none_match(etag: Optional[str]) -> bool:
+    """True when the request's ``If-None-Match`` names ``etag`` in any content coding."""
+    if not etag or not request.if_none_match:
+        return False
+    if request.if_none_match.star_tag:
+        return True
+    candidates = {etag} | {etag + suffix for suffix in ENCODING_SUFFIXES}
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    return any(tag in candidates for tag in request.if_none_match.as_set(include_weak=True))
+
+
+def set_validators(
+    response: Response,
+    etag: Optional[str],
+    cache_control: str,
+    vary: Iterable[str] = ()
+) -> Response:
+    if etag:
+        response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    for header in vary:
+        response.vary.add(header)
+    return response
+
+
+def not_modified(etag: str, cache_control: str, vary: Iterable[str] = ()) -> Response:
+    """A bodyless 304 carrying the same validators the 200 would have."""
+    response = current_app.response_class(status=304)
+    return set_validators(response, etag, cache_control, vary)
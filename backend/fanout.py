@@ -0,0 +1,39 @@
+import time
+from concurrent.futures import Executor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Tuple
+
+
+def fan_out(
+    executor: Executor,
+    tasks: Dict[str, Callable[[], Any]],
+    deadline: float
+) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+    """Run ``tasks`` concurrently and collect what finishes within ``deadline``.
+
+    Returns ``(results, errors)`` keyed like ``tasks``. A task that raises only
+    lands in ``errors``; one still running at the deadline gets a
+    ``TimeoutError`` and is left to finish in the background.
+    """
+    end = time.monotonic() + deadline
+    futures = {executor.submit(fn): name for name, fn in tasks.items()}
+    results: Dict[str, Any] = {}
+    errors: Dict[str, Exception] = {}
+
+    pending = set(futures)
+    while pending:
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                errors[name] = e
+
+    for future in pending:
+        future.cancel()
+        errors[futures[future]] = TimeoutError(f"Timed out after {deadline:.1f} seconds")
+
+    return results, errors
@@ -0,0 +1,33 @@
+"""Gunicorn settings, all overridable from the environment.
+
+Threaded workers suit this app: a request mostly waits on Openverse or the
+database, and the response cache, single-flight table and rate-limit bucket
+are shared by the threads of a worker.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', 5000)}")
+workers = int(os.getenv("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2 + 1, 8)))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 20))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+# Recycle workers now and then so slow leaks cannot build up; jitter avoids restarting them all at once
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 200))
+# Each worker builds its own app; the Openverse client opens sockets and
+# threads that must not be shared across a fork
+preload_app = False
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+
+
+def on_starting(server):
+    # Workers keep their totals in a shared store; start the new server's counters from zero
+    from metrics import SQLiteMetricsStore
+
+    store = SQLiteMetricsStore.from_env()
+    if store is not None:
+        store.clear()
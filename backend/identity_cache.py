@@ -0,0 +1,195 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from flask import g, has_app_context
+
+from local_store import ThreadLocalConnection, database_key, host_path
+from models import User
+
+
+class TTLCache:
+    """Small thread-safe LRU whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete_where(self, predicate: Callable[[Hashable], bool]) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0
+        }
+
+
+# Generation name bumped when every user's searches change at once
+ALL_USERS = "*"
+
+
+class MemoryGenerations:
+    """Recent-search generations private to this process."""
+
+    def __init__(self):
+        self._values: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> Tuple[int, int]:
+        with self._lock:
+            return self._values.get(ALL_USERS, 0), self._values.get(user_id, 0)
+
+    def bump(self, name: str) -> None:
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + 1
+
+
+class SQLiteGenerations:
+    """Recent-search generations in a SQLite file so a write in one worker invalidates every worker's copy."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = ThreadLocalConnection(path)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS search_generation (name TEXT PRIMARY KEY, generation INTEGER NOT NULL)"
+        )
+
+    def get(self, user_id: str) -> Tuple[int, int]:
+        rows = dict(self._conn().execute(
+            "SELECT name, generation FROM search_generation WHERE name IN (?, ?)", (ALL_USERS, user_id)
+        ))
+        return rows.get(ALL_USERS, 0), rows.get(user_id, 0)
+
+    def bump(self, name: str) -> None:
+        self._conn().execute(
+            "INSERT INTO search_generation (name, generation) VALUES (?, 1)"
+            " ON CONFLICT (name) DO UPDATE SET generation = generation + 1",
+            (name,)
+        )
+
+
+class IdentityCache:
+    """Process-wide cache of user credentials and each user's recent-search panel.
+
+    User records are looked up per request in ``flask.g`` first, then in the
+    process cache, then in the database; only users that exist are cached.
+    Recent-search pages are keyed by the user's generation, which every save
+    or delete bumps in a store shared by the workers on the host, so no
+    worker serves (or revalidates) a list older than the latest write.
+    """
+
+    def __init__(self, user_ttl: float = 300, searches_ttl: float = 30, max_entries: int = 4096,
+                 generations: Optional[Any] = None):
+        self.users = TTLCache(max_entries, user_ttl)
+        self.searches = TTLCache(max_entries, searches_ttl)
+        self.generations = generations if generations is not None else MemoryGenerations()
+
+    @classmethod
+    def from_env(cls) -> "IdentityCache":
+        location = os.getenv("IDENTITY_CACHE_STORE")
+        if location == "memory":
+            generations = MemoryGenerations()
+        else:
+            if not location:
+                location = host_path("identity_generations", database_key())
+            generations = SQLiteGenerations(location)
+        return cls(
+            user_ttl=float(os.getenv("USER_CACHE_TTL", 300)),
+            searches_ttl=float(os.getenv("RECENT_SEARCH_CACHE_TTL", 30)),
+            max_entries=int(os.getenv("IDENTITY_CACHE_MAX_ENTRIES", 4096)),
+            generations=generations
+        )
+
+    def get_user(self, email: str) -> Optional[User]:
+        """Return the user with this email, detached from the session, or None."""
+        memo = g.setdefault("_users_by_email", {}) if has_app_context() else {}
+        if email in memo:
+            return memo[email]
+
+        record = self.users.get(email)
+        if record is None:
+            user = User.query.filter_by(email=email).first()
+            if user is not None:
+                record = (user.id, user.email, user._password_hash)
+                self.users.set(email, record)
+        if record is None:
+            memo[email] = None
+            return None
+        # A transient copy: callers must re-load it before changing anything
+        user = User(id=record[0], email=record[1], _password_hash=record[2])
+        memo[email] = user
+        return user
+
+    def forget_user(self, email: str) -> None:
+        self.users.delete_where(lambda key: key == email)
+        if has_app_context():
+            g.setdefault("_users_by_email", {}).pop(email, None)
+
+    def recent_searches(self, user_id: Any, key: Hashable, load: Callable[[], Any]) -> Any:
+        """Return the cached result of ``load()`` for this user and ``key``."""
+        user_id = str(user_id)
+        generation = self.generations.get(user_id)
+        cached = self.searches.get((user_id, generation, key))
+        if cached is not None:
+            return cached
+        value = load()
+        # Skip the store if the user's searches changed while we were loading
+        if self.generations.get(user_id) == generation:
+            self.searches.set((user_id, generation, key), value)
+        return value
+
+    def invalidate_searches(self, user_id: Any) -> None:
+        user_id = str(user_id)
+        self.generations.bump(user_id)
+        self.searches.delete_where(lambda key: key[0] == user_id)
+
+    def clear_searches(self) -> None:
+        self.generations.bump(ALL_USERS)
+        self.searches.clear()
+
+    def clear(self) -> None:
+        self.users.clear()
+        self.clear_searches()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'users': self.users.stats(), 'recent_searches': self.searches.stats()}
+
+
+identity_cache = IdentityCache.from_env()
@@ -0,0 +1,44 @@
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+from typing import Any, Callable, Optional
+
+
+class ThreadLocalConnection:
+    """Autocommit WAL connections to one SQLite file, one per thread, opened on first use.
+
+    Call the instance to get the current thread's connection. ``on_connect``
+    runs once for every new connection (schema setup, for instance).
+    """
+
+    def __init__(self, path: str, synchronous: Optional[str] = None,
+                 on_connect: Optional[Callable[[sqlite3.Connection], None]] = None):
+        self.path = path
+        self.synchronous = synchronous
+        self.on_connect = on_connect
+        self._local = threading.local()
+
+    def __call__(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            if self.synchronous:
+                conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            if self.on_connect is not None:
+                self.on_connect(conn)
+            self._local.conn = conn
+        return conn
+
+
+def host_path(prefix: str, *key: Any, suffix: str = ".db") -> str:
+    """A file in the temp directory shared by every worker on the host, named after ``key``."""
+    digest = hashlib.sha1("|".join(str(part) for part in key).encode()).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f"{prefix}_{digest}{suffix}")
+
+
+def database_key() -> str:
+    """What per-database stores are keyed on, so unrelated apps on the host never share a file."""
+    return os.getenv("DATABASE_URL", "sqlite:///app.db")
@@ -1,34 +1,145 @@
-from flask import Flask, request, jsonify, make_response
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, make_response, stream_with_context
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, get_jwt
 from config import Config, db
-from werkzeug.security import check_password_hash
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
 from models import User, RecentSearch
 from OpenverseAPIClient import OpenverseClient
+from AsyncOpenverseAPIClient import AsyncOpenverseClient, BackgroundLoop
+from fanout import fan_out
+from circuit import CircuitOpenError
+from metrics import init_metrics, registry
+from compression import init_compression
+from json_provider import init_json_provider
+from retention import init_retention
+from prewarm import init_prewarm, last_run as prewarm_last_run
+from result_counts import init_result_refresh, last_run as result_refresh_last_run
+from passwords import HashingBusy
+from throttle import LoginThrottle
+from revocation import init_revocation, revocations
+from identity_cache import identity_cache
+from media_index import media_index
+from conditional import derive_etag, if_none_match, not_modified, set_validators
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from flask.cli import with_appcontext
+from werkzeug.local import LocalProxy
+import click
 import os
+import threading
+import io
+import csv
+import base64
+import hashlib
+import binascii
+import json
 import datetime
 
-app = Flask(__name__)
-app.config.from_object(Config)
-CORS(app, resources={r"/*": {"origins": "http://localhost:5173"}}, supports_credentials=True)
-
-db.init_app(app)
-
-jwt = JWTManager(app)
-jwt.init_app(app)
-
-ov_client = OpenverseClient()
-
-@app.route('/')
+api = Blueprint("api", __name__)
+jwt = JWTManager()
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_ov_client() -> OpenverseClient:
+    """The process-wide Openverse client, built on first use instead of at import.
+
+    Construction opens the token store, rate-limit bucket and response cache,
+    which CLI commands, tests and worker boot do not need.
+    """
+    client = _clients.get("sync")
+    if client is None:
+        with _clients_lock:
+            if "sync" not in _clients:
+                client = OpenverseClient(index=media_index)
+                _clients["async"] = AsyncOpenverseClient(
+                    cache=client.cache,
+                    rate_limiter=client.rate_limiter,
+                    breaker=client.breaker,
+                    index=media_index
+                )
+                _clients["sync"] = client
+            client = _clients["sync"]
+    return client
+
+def get_ov_async_client() -> AsyncOpenverseClient:
+    get_ov_client()
+    return _clients["async"]
+
+ov_client = LocalProxy(get_ov_client)
+ov_async_client = LocalProxy(get_ov_async_client)
+async_loop = BackgroundLoop()
+search_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SEARCH_FANOUT_WORKERS", 16)),
+    thread_name_prefix="search-fanout"
+)
+login_throttle = LoginThrottle()
+
+def _cache_lookups():
+    if ov_client.cache is None:
+        return None
+    stats = ov_client.cache.stats()
+    return {(outcome,): stats[key] for outcome, key in (
+        ("hit", "hits"), ("miss", "misses"), ("stale", "stale_hits"), ("bypass", "bypasses")
+    )}
+
+def _identity_lookups():
+    stats = identity_cache.stats()
+    return {
+        (cache, outcome): stats[cache][outcome]
+        for cache in ("users", "recent_searches") for outcome in ("hits", "misses")
+    }
+
+registry.callback("openverse_rate_limit_remaining", "Openverse requests left in the current window.",
+                  lambda: ov_client.rate_limit['remaining'])
+registry.callback("openverse_rate_limit_limit", "Openverse requests allowed per window.",
+                  lambda: ov_client.rate_limit['limit'])
+registry.callback("openverse_circuit_open", "1 while calls to Openverse are short-circuited.",
+                  lambda: int(ov_client.breaker.state != ov_client.breaker.CLOSED))
+registry.callback("openverse_coalesced_requests", "Searches that shared an in-flight upstream call.",
+                  lambda: ov_client.inflight.coalesced, type="counter")
+registry.callback("response_cache_lookups", "Openverse response cache lookups by outcome.",
+                  _cache_lookups, ("outcome",), "counter")
+registry.callback("response_cache_hit_ratio", "Fraction of response cache lookups that were fresh hits.",
+                  lambda: ov_client.cache.stats()['hit_ratio'] if ov_client.cache is not None else None)
+registry.callback("identity_cache_lookups", "User and recent-search cache lookups by outcome.",
+                  _identity_lookups, ("cache", "outcome"), "counter")
+
+SEARCH_MEDIA_TYPES = ("images", "audio")
+SEARCH_MAX_PAGES = 5
+SEARCH_DEADLINE = float(os.getenv("SEARCH_DEADLINE", 8))
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", 5))
+SEARCH_STREAM_MAX_ITEMS = 500
+# Openverse's own page_size cap for authenticated clients
+SEARCH_MAX_PAGE_SIZE = 500
+# Browsers and shared caches may reuse search results for this long without revalidating
+SEARCH_MAX_AGE = int(os.getenv("SEARCH_MAX_AGE", 60))
+SEARCH_CACHE_CONTROL = f"public, max-age={SEARCH_MAX_AGE}"
+SEARCH_VARY = ("Accept-Encoding",)
+# Recent searches are per user and change on every save, so clients always revalidate
+RECENT_SEARCHES_CACHE_CONTROL = "private, no-cache"
+RECENT_SEARCHES_VARY = ("Authorization",)
+# Answer searches from the local index when it fills the requested page (?local_first=1 per request)
+LOCAL_FIRST = os.getenv("LOCAL_FIRST", "0") == "1"
+
+@api.route('/')
 def index():
     return "Welcome to the Backend!"
 
-@app.route('/api/test')
+@api.route('/api/test')
 def test_api():
     return {"message": "Backend is working!"}
 
 
-@app.route("/register", methods=["POST"])
+def _retry_later(message, status, retry_after):
+    response = jsonify({"message": message})
+    response.status_code = status
+    response.headers["Retry-After"] = str(max(1, int(retry_after + 0.999)))
+    return response
+
+
+@api.route("/register", methods=["POST"])
 def register():
     email = request.json.get("email")
     password = request.json.get("password")
@@ -36,27 +147,47 @@ def register():
     if not email or not password:
         return jsonify({"message": "Email and password are required"}), 400
 
-    if User.query.filter_by(email=email).first():
+    if identity_cache.get_user(email):
         return jsonify({"message": "User already exists"}), 409
 
     new_user = User(email=email)
-    new_user.set_password(password)
+    try:
+        new_user.set_password(password)
+    except HashingBusy:
+        return _retry_later("Server busy, try again shortly", 503, 1)
 
     db.session.add(new_user)
     db.session.commit()
 
     return jsonify({"message": "User registered successfully"}), 201
 
-@app.route("/login", methods=["POST"])
+@api.route("/login", methods=["POST"])
 def login():
     data = request.get_json()
-    user = User.query.filter_by(email=data['email']).first()
+    # Reject throttled callers before touching the database or the hasher
+    retry_after = login_throttle.check(data['email'], request.remote_addr)
+    if retry_after:
+        return _retry_later("Too many failed login attempts. Try again later.", 429, retry_after)
+
+    user = identity_cache.get_user(data['email'])
 
     if not user:
+        login_throttle.record_failure(data['email'], request.remote_addr)
         return jsonify({"message": "User does not exist."}), 404
 
-    if not check_password_hash(user._password_hash, data['password']):
-        return jsonify({"message": "Password does not match."}), 401
+    try:
+        if not user.check_password(data['password']):
+            login_throttle.record_failure(data['email'], request.remote_addr)
+            return jsonify({"message": "Password does not match."}), 401
+
+        login_throttle.record_success(data['email'])
+        if user.password_needs_rehash():
+            stored = db.session.get(User, user.id)
+            stored.set_password(data['password'])
+            db.session.commit()
+            identity_cache.forget_user(user.email)
+    except HashingBusy:
+        return _retry_later("Server busy, try again shortly", 503, 1)
 
     access_token = create_access_token(identity=str(user.id))
     return jsonify({
@@ -65,14 +196,15 @@ def login():
     })
 
 
-@app.route("/logout", methods=["POST"])
+@api.route("/logout", methods=["POST"])
 @jwt_required()
 def logout():
-    jti = get_jwt()["jti"]
+    claims = get_jwt()
+    revocations.revoke(claims["jti"], claims["exp"])
     return jsonify({"message": "Successfully logged out. Please delete the token on client side."}), 200
 
 
-@app.route("/save_search", methods=["POST"])
+@api.route("/save_search", methods=["POST"])
 @jwt_required()
 def save_search():
     user_id = get_jwt_identity()
@@ -85,11 +217,7 @@ def save_search():
     if not name or not query or not media_type:
         return jsonify({"error": "Name, query, and media_type are required"}), 400
     
-    existing_search = RecentSearch.query.filter_by(user_id=user_id, name=name).first()
-    if existing_search:
-        return jsonify({"error": "Name already exists. Please choose another name."}), 409
-
-    # Create new saved search
+    # Create new saved search; the unique (user_id, name) index rejects duplicates
     saved_search = RecentSearch(
         user_id=user_id,
         name=name,
@@ -99,33 +227,105 @@ def save_search():
         filters=data.get('filters', {})
     )
     db.session.add(saved_search)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "Name already exists. Please choose another name."}), 409
+    identity_cache.invalidate_searches(user_id)
 
     return jsonify({"message": "Search saved successfully", "search_id": saved_search.id}), 201
 
-@app.route("/recent_searches", methods=["GET"])
-@jwt_required()
-def get_recent_searches():
-    user_id = get_jwt_identity()
-    
+RECENT_SEARCHES_MAX_LIMIT = 100
+
+def _encode_cursor(search: RecentSearch) -> str:
+    raw = json.dumps([search.timestamp.isoformat(), search.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, search_id = json.loads(raw)
+        return datetime.datetime.fromisoformat(timestamp), int(search_id)
+    except (binascii.Error, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def _load_recent_searches(user_id, before_key, limit):
     thirty_days_ago = datetime.datetime.now() - datetime.timedelta(days=30)
     
-    recent_searches = RecentSearch.query.filter(
+    query = RecentSearch.query.filter(
         RecentSearch.user_id == user_id,
         RecentSearch.timestamp >= thirty_days_ago
-    ).order_by(RecentSearch.timestamp.desc()).all()
+    )
 
-    return jsonify([{
+    if before_key:
+        before_timestamp, before_id = before_key
+        query = query.filter(or_(
+            RecentSearch.timestamp < before_timestamp,
+            and_(RecentSearch.timestamp == before_timestamp, RecentSearch.id < before_id)
+        ))
+
+    query = query.order_by(RecentSearch.timestamp.desc(), RecentSearch.id.desc())
+
+    next_cursor = None
+    if limit is not None:
+        recent_searches = query.limit(limit + 1).all()
+        if len(recent_searches) > limit:
+            recent_searches = recent_searches[:limit]
+            next_cursor = _encode_cursor(recent_searches[-1])
+    else:
+        recent_searches = query.all()
+
+    return [{
         'id': s.id,
         'media_type': s.media_type,
         'search_query': s.search_query,
-        'timestamp': s.timestamp.isoformat(),
+        'timestamp': s.timestamp,
         'total_results': s.total_results,
+        'refreshed_at': s.refreshed_at,
         'filters': s.filters
-    } for s in recent_searches]), 200
+    } for s in recent_searches], next_cursor
+
+def _encode_recent_searches(user_id, before_key, limit):
+    """Load a page and encode it once, so cache hits skip both the query and the JSON encode."""
+    payload, next_cursor = _load_recent_searches(user_id, before_key, limit)
+    body = current_app.json.response(payload).get_data()
+    return body, next_cursor, derive_etag(hashlib.sha1(body).hexdigest(), next_cursor)
+
+@api.route("/recent_searches", methods=["GET"])
+@jwt_required()
+def get_recent_searches():
+    user_id = get_jwt_identity()
+
+    before = request.args.get("before")
+    before_key = None
+    if before:
+        try:
+            before_key = _decode_cursor(before)
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+    limit = request.args.get("limit", type=int)
+    if limit is not None:
+        limit = min(max(limit, 1), RECENT_SEARCHES_MAX_LIMIT)
+
+    load = partial(_encode_recent_searches, user_id, before_key, limit)
+    if before_key is None:
+        # The first page is what the recent-searches panel reloads
+        body, next_cursor, etag = identity_cache.recent_searches(user_id, limit, load)
+    else:
+        body, next_cursor, etag = load()
 
+    if if_none_match(etag):
+        return not_modified(etag, RECENT_SEARCHES_CACHE_CONTROL, RECENT_SEARCHES_VARY)
 
-@app.route("/recent_searches/<int:search_id>", methods=["DELETE"])
+    response = current_app.response_class(body, mimetype="application/json")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return set_validators(response, etag, RECENT_SEARCHES_CACHE_CONTROL, RECENT_SEARCHES_VARY), 200
+
+
+@api.route("/recent_searches/<int:search_id>", methods=["DELETE"])
 @jwt_required()
 def delete_recent_search(search_id):
     user_id = get_jwt_identity()
@@ -138,65 +338,528 @@ def delete_recent_search(search_id):
     try:
         db.session.delete(search)
         db.session.commit()
+        identity_cache.invalidate_searches(user_id)
         return jsonify({"message": "Search deleted successfully"}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Database error", "details": str(e)}), 500
 
+BATCH_MAX_ITEMS = 100
 
+def _batch_items(data, key):
+    items = data.get(key) if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return None, (jsonify({"error": f"{key} must be a non-empty list"}), 400)
+    if len(items) > BATCH_MAX_ITEMS:
+        return None, (jsonify({"error": f"At most {BATCH_MAX_ITEMS} items per batch"}), 413)
+    return items, None
 
-@app.route("/search_images", methods=["GET"])
+@api.route("/save_search/batch", methods=["POST"])
+@jwt_required()
+def save_search_batch():
+    user_id = get_jwt_identity()
+    items, error = _batch_items(request.get_json(silent=True), "searches")
+    if error:
+        return error
+
+    names = [item.get("name") for item in items if isinstance(item, dict)]
+    taken = {
+        name for (name,) in db.session.query(RecentSearch.name).filter(
+            RecentSearch.user_id == user_id,
+            RecentSearch.name.in_([n for n in names if n])
+        )
+    }
+
+    statuses, new_searches, seen = [], [], set()
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get("name") or not item.get("query") or not item.get("media_type"):
+            statuses.append({"index": index, "status": "error", "error": "Name, query, and media_type are required"})
+            continue
+        if item["name"] in taken or item["name"] in seen:
+            statuses.append({"index": index, "status": "error", "error": "Name already exists. Please choose another name."})
+            continue
+        seen.add(item["name"])
+        search = RecentSearch(
+            user_id=user_id,
+            name=item["name"],
+            search_query=item["query"],
+            media_type=item["media_type"],
+            total_results=item.get("total_results", 0),
+            filters=item.get("filters", {})
+        )
+        new_searches.append(search)
+        statuses.append({"index": index, "status": "created", "search": search})
+
+    if new_searches:
+        db.session.add_all(new_searches)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent request took one of the names; nothing was written
+            db.session.rollback()
+            return jsonify({"error": "Name already exists. Please choose another name."}), 409
+        identity_cache.invalidate_searches(user_id)
+
+    for status in statuses:
+        if "search" in status:
+            status["search_id"] = status.pop("search").id
+
+    created = len(new_searches)
+    code = 201 if created == len(items) else 207 if created else 400
+    return jsonify({"created": created, "failed": len(items) - created, "items": statuses}), code
+
+@api.route("/recent_searches/batch_delete", methods=["POST"])
+@jwt_required()
+def delete_recent_searches_batch():
+    user_id = get_jwt_identity()
+    ids, error = _batch_items(request.get_json(silent=True), "ids")
+    if error:
+        return error
+    if not all(isinstance(search_id, int) for search_id in ids):
+        return jsonify({"error": "ids must be integers"}), 400
+
+    owned = {
+        search_id for (search_id,) in db.session.query(RecentSearch.id).filter(
+            RecentSearch.user_id == user_id,
+            RecentSearch.id.in_(ids)
+        )
+    }
+    try:
+        if owned:
+            RecentSearch.query.filter(
+                RecentSearch.user_id == user_id,
+                RecentSearch.id.in_(owned)
+            ).delete(synchronize_session=False)
+        db.session.commit()
+        identity_cache.invalidate_searches(user_id)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Database error", "details": str(e)}), 500
+
+    return jsonify({
+        "deleted": len(owned),
+        "items": [
+            {"id": search_id, "status": "deleted" if search_id in owned else "not_found"}
+            for search_id in ids
+        ]
+    }), 200
+
+EXPORT_COLUMNS = ["id", "name", "media_type", "search_query", "timestamp", "total_results", "filters", "refreshed_at"]
+EXPORT_BATCH_SIZE = 500
+
+@api.route("/recent_searches/export", methods=["GET"])
+@jwt_required()
+def export_recent_searches():
+    user_id = get_jwt_identity()
+    export_format = request.args.get("format", "ndjson")
+    if export_format not in ("ndjson", "csv"):
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+
+    # yield_per streams rows from the cursor in batches instead of loading them all
+    rows = db.session.scalars(
+        db.select(RecentSearch)
+        .filter(RecentSearch.user_id == user_id)
+        .order_by(RecentSearch.timestamp.desc(), RecentSearch.id.desc())
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+    def generate_ndjson():
+        for s in rows:
+            yield current_app.json.dumps({column: getattr(s, column) for column in EXPORT_COLUMNS}) + "\n"
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        for s in rows:
+            writer.writerow([
+                s.id, s.name, s.media_type, s.search_query, s.timestamp.isoformat(),
+                s.total_results, current_app.json.dumps(s.filters),
+                s.refreshed_at.isoformat() if s.refreshed_at else ""
+            ])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+    if export_format == "csv":
+        response = Response(stream_with_context(generate_csv()), mimetype="text/csv")
+    else:
+        response = Response(stream_with_context(generate_ndjson()), mimetype="application/x-ndjson")
+    response.headers["Content-Disposition"] = f"attachment; filename=recent_searches.{export_format}"
+    return response
+
+
+
+def _search_error_response(e: Exception, message: str):
+    if isinstance(e, CircuitOpenError):
+        response = jsonify({"error": str(e), "code": "upstream_unavailable"})
+        response.headers["Retry-After"] = str(int(e.retry_after + 0.999))
+        return response, 503
+    if "Rate limit exceeded" in str(e):
+        return jsonify({
+            "error": str(e),
+            "code": "rate_limit_exceeded"
+        }), 429
+    print(f"Error calling Openverse API: {e}")
+    return jsonify({"error": message}), 500
+
+def _use_cache() -> bool:
+    return not (request.cache_control.no_cache or request.headers.get("Pragma") == "no-cache")
+
+def _search_options(media_type: str) -> dict:
+    options = {
+        "page": request.args.get('page', 1, type=int),
+        "page_size": request.args.get('page_size', 20, type=int),
+        "license_type": request.args.get("license"),
+        "source": request.args.get("source"),
+        "filetype": request.args.get("filetype")
+    }
+    if media_type == "audio":
+        options["category"] = request.args.get("category")
+    return options
+
+def _search_etag(payload_etag, media_type: str):
+    if not payload_etag:
+        return None
+    # The projection is part of the representation, so it is part of the validator
+    return derive_etag(payload_etag, media_type, request.args.get("fields"))
+
+def _search_not_modified(media_type: str, query: str, options: dict):
+    """A 304 when the client already holds the fresh cached results, before any search or encode."""
+    if not request.if_none_match or not _use_cache():
+        return None
+    etag = _search_etag(ov_client.cached_etag(media_type, query, **options), media_type)
+    if not if_none_match(etag):
+        return None
+    return not_modified(etag, SEARCH_CACHE_CONTROL, SEARCH_VARY)
+
+def _local_first() -> bool:
+    value = request.args.get("local_first")
+    return LOCAL_FIRST if value is None else value in ("1", "true")
+
+def _local_results(media_type: str, query: str, options: dict, min_results: int):
+    """Results from the local index when it has at least ``min_results`` for the page, else None."""
+    if media_index is None:
+        return None
+    results = media_index.search(media_type, query, **options)
+    return results if len(results["results"]) >= min_results else None
+
+def _upstream_unavailable(e: Exception) -> bool:
+    """Whether a search failed because Openverse could not answer, not because of the request or a bug."""
+    if isinstance(e, (CircuitOpenError, TimeoutError)) or "Rate limit exceeded" in str(e):
+        return True
+    return OpenverseClient._is_upstream_failure(e) or AsyncOpenverseClient._is_upstream_failure(e)
+
+def _local_fallback(e: Exception, media_type: str, query: str, options: dict):
+    """Media seen before when Openverse is unavailable and nothing is cached, else None."""
+    if not _upstream_unavailable(e):
+        return None
+    local = _local_results(media_type, query, options, 1)
+    return _local_response(local, media_type) if local is not None else None
+
+def _local_response(results, media_type: str):
+    response = jsonify(ov_client.project(results, media_type, request.args.get("fields")))
+    response.headers["X-Results-Source"] = "local"
+    # The index only grows, so a later request may well find more
+    return set_validators(response, None, "public, max-age=0", SEARCH_VARY)
+
+def _search_response(results, media_type: str):
+    if results.get("stale"):
+        response = jsonify(ov_client.project(results, media_type, request.args.get("fields")))
+        # Served from the last good copy while Openverse is slow, failing or being refreshed
+        response.headers["Age"] = str(results["age"])
+        response.headers["Warning"] = '110 - "Response is Stale"'
+        return set_validators(response, None, "public, max-age=0", SEARCH_VARY)
+
+    etag = _search_etag(getattr(results, "etag", None), media_type)
+    if if_none_match(etag):
+        return not_modified(etag, SEARCH_CACHE_CONTROL, SEARCH_VARY)
+    response = jsonify(ov_client.project(results, media_type, request.args.get("fields")))
+    return set_validators(response, etag, SEARCH_CACHE_CONTROL, SEARCH_VARY)
+
+@api.route("/search_images", methods=["GET"])
 def search_images():
     query = request.args.get("q")
     if not query:
         return jsonify({"error": "Search query is required"}), 400
-    
+
+    options = _search_options("images")
+    cached = _search_not_modified("images", query, options)
+    if cached is not None:
+        return cached
+    if _local_first():
+        local = _local_results("images", query, options, options["page_size"])
+        if local is not None:
+            return _local_response(local, "images")
+
     try:
         results = ov_client.search_images(
             query=query,
-            page=request.args.get('page', 1, type=int),
-            page_size=request.args.get('page_size', 20, type=int),
-            license_type=request.args.get("license"),
-            source=request.args.get("source"),
-            filetype=request.args.get("filetype")
+            **options,
+            use_cache=_use_cache(),
+            timeout=SEARCH_TIMEOUT
         )
-        return jsonify(results)
+        return _search_response(results, "images")
     except Exception as e:
-        if "Rate limit exceeded" in str(e):
-            return jsonify({
-                "error": str(e),
-                "code": "rate_limit_exceeded"
-            }), 429
-        print(f"Error calling Openverse API: {e}")
-        return jsonify({"error": "Failed to fetch results"}), 500
-
-@app.route("/search_audio", methods=["GET"])
+        fallback = _local_fallback(e, "images", query, options)
+        if fallback is not None:
+            return fallback
+        return _search_error_response(e, "Failed to fetch results")
+
+@api.route("/search_audio", methods=["GET"])
 def search_audio():
     query = request.args.get("q")
     if not query:
         return jsonify({"error": "Search query is required"}), 400
-    
+
+    options = _search_options("audio")
+    cached = _search_not_modified("audio", query, options)
+    if cached is not None:
+        return cached
+    if _local_first():
+        local = _local_results("audio", query, options, options["page_size"])
+        if local is not None:
+            return _local_response(local, "audio")
+
     try:
         results = ov_client.search_audio(
             query=query,
-            page=request.args.get('page', 1, type=int),
-            page_size=request.args.get('page_size', 20, type=int),
-            license_type=request.args.get("license"),
-            source=request.args.get("source"),
-            filetype=request.args.get("filetype"),
-            category=request.args.get("category")
+            **options,
+            use_cache=_use_cache(),
+            timeout=SEARCH_TIMEOUT
         )
-        return jsonify(results)
+        return _search_response(results, "audio")
     except Exception as e:
-        if "Rate limit exceeded" in str(e):
-            return jsonify({
-                "error": str(e),
-                "code": "rate_limit_exceeded"
-            }), 429
-        print(f"Error calling Openverse API: {e}")
-        return jsonify({"error": "Failed to fetch audio results"}), 500
-
-@app.route("/rate_limit", methods=["GET"])
+        fallback = _local_fallback(e, "audio", query, options)
+        if fallback is not None:
+            return fallback
+        return _search_error_response(e, "Failed to fetch audio results")
+
+@api.route("/async/search_images", methods=["GET"])
+async def async_search_images():
+    query = request.args.get("q")
+    if not query:
+        return jsonify({"error": "Search query is required"}), 400
+
+    options = _search_options("images")
+    cached = _search_not_modified("images", query, options)
+    if cached is not None:
+        return cached
+    if _local_first():
+        local = _local_results("images", query, options, options["page_size"])
+        if local is not None:
+            return _local_response(local, "images")
+
+    try:
+        results = await async_loop.run(ov_async_client.search_images(
+            query=query,
+            **options,
+            use_cache=_use_cache(),
+            timeout=SEARCH_TIMEOUT
+        ))
+        return _search_response(results, "images")
+    except Exception as e:
+        fallback = _local_fallback(e, "images", query, options)
+        if fallback is not None:
+            return fallback
+        return _search_error_response(e, "Failed to fetch results")
+
+@api.route("/async/search_audio", methods=["GET"])
+async def async_search_audio():
+    query = request.args.get("q")
+    if not query:
+        return jsonify({"error": "Search query is required"}), 400
+
+    options = _search_options("audio")
+    cached = _search_not_modified("audio", query, options)
+    if cached is not None:
+        return cached
+    if _local_first():
+        local = _local_results("audio", query, options, options["page_size"])
+        if local is not None:
+            return _local_response(local, "audio")
+
+    try:
+        results = await async_loop.run(ov_async_client.search_audio(
+            query=query,
+            **options,
+            use_cache=_use_cache(),
+            timeout=SEARCH_TIMEOUT
+        ))
+        return _search_response(results, "audio")
+    except Exception as e:
+        fallback = _local_fallback(e, "audio", query, options)
+        if fallback is not None:
+            return fallback
+        return _search_error_response(e, "Failed to fetch audio results")
+
+def _leg_error(media_type: str, e: Exception) -> dict:
+    if isinstance(e, CircuitOpenError):
+        return {"error": str(e), "code": "upstream_unavailable"}
+    if isinstance(e, TimeoutError):
+        return {"error": str(e), "code": "timeout"}
+    if "Rate limit exceeded" in str(e):
+        return {"error": str(e), "code": "rate_limit_exceeded"}
+    print(f"Error calling Openverse API ({media_type}): {e}")
+    return {"error": f"Failed to fetch {media_type} results", "code": "upstream_error"}
+
+@api.route("/search", methods=["GET"])
+def search_all():
+    query = request.args.get("q")
+    if not query:
+        return jsonify({"error": "Search query is required"}), 400
+
+    media_types = [m.strip() for m in request.args.get("media", "images,audio").split(",") if m.strip()]
+    if not media_types or any(m not in SEARCH_MEDIA_TYPES for m in media_types):
+        return jsonify({"error": "media must be a comma-separated list of: images, audio"}), 400
+
+    first_page = request.args.get('page', 1, type=int)
+    pages = min(max(request.args.get('pages', 1, type=int), 1), SEARCH_MAX_PAGES)
+    deadline = request.args.get('deadline', SEARCH_DEADLINE, type=float)
+    if not deadline > 0:
+        return jsonify({"error": "deadline must be a positive number of seconds"}), 400
+    deadline = min(deadline, SEARCH_DEADLINE)
+    common = {
+        "page_size": request.args.get('page_size', 20, type=int),
+        "license_type": request.args.get("license"),
+        "source": request.args.get("source"),
+        "use_cache": _use_cache(),
+        "timeout": deadline
+    }
+
+    local_first = _local_first()
+    tasks, local, local_options = {}, {}, {}
+    for media_type in media_types:
+        filters = {"page_size": common["page_size"], "license_type": common["license_type"], "source": common["source"]}
+        if media_type == "images":
+            search = partial(ov_client.search_images, query=query, **common)
+        else:
+            filters["category"] = request.args.get("category")
+            search = partial(ov_client.search_audio, query=query, category=filters["category"], **common)
+        local_options[media_type] = filters
+        for page in range(first_page, first_page + pages):
+            found = _local_results(media_type, query, {**filters, "page": page}, common["page_size"]) if local_first else None
+            if found is not None:
+                local[(media_type, page)] = found
+            else:
+                tasks[(media_type, page)] = partial(search, page=page)
+
+    results, errors = fan_out(search_executor, tasks, deadline) if tasks else ({}, {})
+    for (media_type, page), e in list(errors.items()):
+        # Same rule as the single-media routes: only an unavailable Openverse falls back
+        if _upstream_unavailable(e):
+            found = _local_results(media_type, query, {**local_options[media_type], "page": page}, 1)
+            if found is not None:
+                local[(media_type, page)] = found
+                del errors[(media_type, page)]
+    results.update(local)
+
+    merged, leg_errors = {}, {}
+    for media_type in media_types:
+        ok_pages = sorted(page for (media, page) in results if media == media_type)
+        if ok_pages:
+            first = results[(media_type, ok_pages[0])]
+            merged[media_type] = ov_client.project({
+                "result_count": first.get("result_count"),
+                "page_count": first.get("page_count"),
+                "pages": ok_pages,
+                "stale": any(results[(media_type, page)].get("stale", False) for page in ok_pages),
+                "local": any((media_type, page) in local for page in ok_pages),
+                "results": [r for page in ok_pages for r in results[(media_type, page)].get("results", [])]
+            }, media_type, request.args.get("fields"))
+        failed = sorted((page, e) for (media, page), e in errors.items() if media == media_type)
+        if failed:
+            leg_errors[media_type] = {**_leg_error(media_type, failed[0][1]), "pages": [page for page, _ in failed]}
+
+    etags = [getattr(results[key], "etag", None) for key in sorted(results)]
+    etag = None
+    if not leg_errors and all(etags) and not any(m.get("stale") for m in merged.values()):
+        etag = derive_etag(*etags, request.args.get("fields"))
+        if if_none_match(etag):
+            return not_modified(etag, SEARCH_CACHE_CONTROL, SEARCH_VARY)
+
+    body = {"query": query, "results": merged, "errors": leg_errors, "partial": bool(leg_errors)}
+    if merged:
+        cache_control = SEARCH_CACHE_CONTROL if etag else "public, max-age=0"
+        response = set_validators(jsonify(body), etag, cache_control, SEARCH_VARY)
+        if local and len(local) == len(results):
+            response.headers["X-Results-Source"] = "local"
+        return response, 200
+
+    codes = {error["code"] for error in leg_errors.values()}
+    if "rate_limit_exceeded" in codes:
+        return jsonify(body), 429
+    if codes == {"timeout"}:
+        return jsonify(body), 504
+    if codes == {"upstream_unavailable"}:
+        return jsonify(body), 503
+    return jsonify(body), 500
+
+@api.route("/search_local", methods=["GET"])
+def search_local():
+    query = request.args.get("q")
+    if not query:
+        return jsonify({"error": "Search query is required"}), 400
+
+    media_type = request.args.get("media", "images")
+    if media_type not in SEARCH_MEDIA_TYPES:
+        return jsonify({"error": "media must be one of: images, audio"}), 400
+    if media_index is None:
+        return jsonify({"error": "Local index is disabled"}), 503
+
+    return _local_response(media_index.search(media_type, query, **_search_options(media_type)), media_type)
+
+@api.route("/search_stream", methods=["GET"])
+def search_stream():
+    query = request.args.get("q")
+    if not query:
+        return jsonify({"error": "Search query is required"}), 400
+
+    media_type = request.args.get("media", "images")
+    if media_type not in SEARCH_MEDIA_TYPES:
+        return jsonify({"error": "media must be one of: images, audio"}), 400
+
+    filters = {
+        "license_type": request.args.get("license"),
+        "source": request.args.get("source"),
+        "filetype": request.args.get("filetype"),
+        "use_cache": _use_cache()
+    }
+    if media_type == "audio":
+        filters["category"] = request.args.get("category")
+
+    page_size = request.args.get('page_size', 20, type=int)
+    if not 1 <= page_size <= SEARCH_MAX_PAGE_SIZE:
+        return jsonify({"error": f"page_size must be between 1 and {SEARCH_MAX_PAGE_SIZE}"}), 400
+
+    pages = ov_client.iter_pages(
+        query,
+        media_type,
+        max_items=min(max(request.args.get('max_items', 100, type=int), 1), SEARCH_STREAM_MAX_ITEMS),
+        page_size=page_size,
+        prefetch=min(max(request.args.get('prefetch', 1, type=int), 0), 3),
+        **filters
+    )
+
+    fields = request.args.get("fields")
+    # The generator runs after the request context is gone
+    json_provider = current_app.json
+
+    def generate():
+        count = 0
+        try:
+            for page in pages:
+                count += len(page.get("results", []))
+                yield json_provider.dumps(ov_client.project(page, media_type, fields)) + "\n"
+        except Exception as e:
+            yield json_provider.dumps(_leg_error(media_type, e)) + "\n"
+            return
+        yield json_provider.dumps({"done": True, "count": count}) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+@api.route("/rate_limit", methods=["GET"])
 def get_rate_limit():
     try:
         limits = ov_client.check_rate_limit()
@@ -208,10 +871,140 @@ def get_rate_limit():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@api.route("/pool_stats", methods=["GET"])
+def get_pool_stats():
+    return jsonify(ov_client.pool_stats())
+
+@api.route("/cache_stats", methods=["GET"])
+def get_cache_stats():
+    if ov_client.cache is None:
+        return jsonify({
+            "enabled": False,
+            "inflight": ov_client.inflight.stats(),
+            "circuit": ov_client.breaker.stats(),
+            "identity": identity_cache.stats()
+        })
+    return jsonify({
+        "enabled": True,
+        **ov_client.cache.stats(),
+        "inflight": ov_client.inflight.stats(),
+        "circuit": ov_client.breaker.stats(),
+        "identity": identity_cache.stats(),
+        "prewarm": prewarm_last_run,
+        "result_refresh": result_refresh_last_run,
+        "local_index": media_index.stats() if media_index is not None else None
+    })
+
+@api.route("/revocation_stats", methods=["GET"])
+def get_revocation_stats():
+    return jsonify(revocations.stats())
+
+
+@api.route("/healthz", methods=["GET"])
+def healthz():
+    return jsonify({"status": "ok"})
+
+
+def _rename_duplicate_search_names(connection) -> int:
+    """Suffix all but the newest of each user's same-named searches with their id; returns how many."""
+    table = RecentSearch.__table__
+    duplicated = (
+        db.select(table.c.user_id, table.c.name)
+        .group_by(table.c.user_id, table.c.name)
+        .having(db.func.count() > 1)
+        .subquery()
+    )
+    rows = connection.execute(
+        db.select(table.c.id, table.c.user_id, table.c.name)
+        .join(duplicated, and_(table.c.user_id == duplicated.c.user_id, table.c.name == duplicated.c.name))
+        .order_by(table.c.user_id, table.c.name, table.c.timestamp.desc(), table.c.id.desc())
+    ).all()
+    newest, renamed = set(), 0
+    for search_id, user_id, name in rows:
+        if (user_id, name) not in newest:
+            newest.add((user_id, name))
+            continue
+        suffix = f" ({search_id})"
+        connection.execute(
+            table.update()
+            .where(table.c.id == search_id)
+            .values(name=name[:table.c.name.type.length - len(suffix)] + suffix)
+        )
+        renamed += 1
+    return renamed
+
+
+def init_db() -> None:
+    """Create missing tables, nullable columns and indexes."""
+    db.create_all()
+    # create_all() skips tables that already exist, so add any new columns and indexes
+    inspector = db.inspect(db.engine)
+    existing = {column["name"] for column in inspector.get_columns(RecentSearch.__tablename__)}
+    indexes = {index["name"] for index in inspector.get_indexes(RecentSearch.__tablename__)}
+    with db.engine.begin() as connection:
+        for column in RecentSearch.__table__.columns:
+            if column.name not in existing and column.nullable:
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                connection.exec_driver_sql(
+                    f"ALTER TABLE {RecentSearch.__tablename__} ADD COLUMN {column.name} {column_type}"
+                )
+        if "uq_recent_search_user_name" not in indexes:
+            # Names were not unique before this index; older copies would block building it
+            renamed = _rename_duplicate_search_names(connection)
+            if renamed:
+                print(f"Renamed {renamed} recent searches that duplicated a newer search's name")
+    for index in RecentSearch.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+
+@click.command("init-db")
+@with_appcontext
+def init_db_command():
+    """Create missing tables and indexes."""
+    init_db()
+    click.echo("Database schema is up to date")
+
+
+def create_app(config=None) -> Flask:
+    """Build the API app.
+
+    ``config`` is a config object or a mapping applied on top of ``Config``.
+    Nothing here touches the database or Openverse; run ``flask --app main
+    init-db`` once per deploy to create the schema.
+    """
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    if isinstance(config, dict):
+        app.config.update(config)
+    elif config is not None:
+        app.config.from_object(config)
+
+    init_json_provider(app)
+    CORS(
+        app,
+        resources={r"/*": {"origins": "http://localhost:5173"}},
+        supports_credentials=True,
+        expose_headers=["X-Next-Cursor", "ETag", "X-Results-Source"]
+    )
+    db.init_app(app)
+    jwt.init_app(app)
+    init_revocation(app, jwt)
+
+    # Registered before compression so request timings include it
+    init_metrics(app)
+    init_compression(app)
+    init_retention(app)
+    init_prewarm(app, ov_client)
+    init_result_refresh(app, ov_client)
+
+    app.register_blueprint(api)
+    app.cli.add_command(init_db_command)
+    return app
 
 
 if __name__ == "__main__":
+    # Development server only; production runs gunicorn against wsgi:app
+    app = create_app()
     with app.app_context():
-        db.create_all()
-
+        init_db()
     app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,230 @@
+import json
+import os
+import queue
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from local_store import ThreadLocalConnection
+
+# Columns the full-text match runs over; the rest are stored for filtering only
+TEXT_COLUMNS = ("title", "creator", "tags", "source")
+FILTER_COLUMNS = ("media_type", "license", "filetype", "category")
+_WORD = re.compile(r"\w+", re.UNICODE)
+# Broad queries stop counting here; Openverse caps its own result_count too
+COUNT_LIMIT = 1000
+
+
+def _tag_names(result: Dict[str, Any]) -> str:
+    return " ".join(tag.get("name", "") for tag in result.get("tags") or [] if isinstance(tag, dict))
+
+
+def match_expression(query: str) -> Optional[str]:
+    """An FTS5 query matching every word of ``query``; the last word also matches as a prefix."""
+    words = _WORD.findall(query.lower())
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+class MediaIndex:
+    """Full-text index (SQLite FTS5) of every image and audio record fetched from Openverse.
+
+    Results are written by a background thread, so indexing never adds to the
+    latency of the search that fetched them. Searches return payloads shaped
+    like Openverse's, so projection and the search routes treat them alike.
+    """
+
+    def __init__(self, path: str, max_rows: int = 200000, queue_size: int = 256):
+        self.path = path
+        self.max_rows = max_rows
+        # Opened on first use, so importing the app never touches the index file
+        self._conn = ThreadLocalConnection(path, synchronous="NORMAL", on_connect=self._create_schema)
+        self._queue: "queue.Queue[Tuple[str, List[Dict[str, Any]]]]" = queue.Queue(queue_size)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self._counters = {'indexed': 0, 'dropped': 0, 'evicted': 0, 'searches': 0}
+
+    @classmethod
+    def from_env(cls) -> Optional["MediaIndex"]:
+        if os.getenv("MEDIA_INDEX_ENABLED", "1") != "1":
+            return None
+        return cls(
+            # Shared by every worker on the host, and never inside the checkout
+            os.getenv("MEDIA_INDEX_PATH") or os.path.join(tempfile.gettempdir(), "openverse_media_index.db"),
+            max_rows=int(os.getenv("MEDIA_INDEX_MAX_ROWS", 200000)),
+            queue_size=int(os.getenv("MEDIA_INDEX_QUEUE", 256))
+        )
+
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection) -> None:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS media ("
+            " rowid INTEGER PRIMARY KEY,"
+            " id TEXT NOT NULL UNIQUE,"
+            " data TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_media_updated_at ON media (updated_at)")
+        # Needs an SQLite built with FTS5 (the default in CPython's bundled builds)
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS media_fts USING fts5("
+            + ", ".join([*TEXT_COLUMNS, *(f"{c} UNINDEXED" for c in FILTER_COLUMNS)])
+            + ", tokenize='unicode61 remove_diacritics 2')"
+        )
+
+    def submit(self, media_type: str, payload: Dict[str, Any]) -> None:
+        """Queue the results of a search payload for indexing; dropped when the writer is behind."""
+        results = payload.get("results") or []
+        if not results:
+            return
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait((media_type, results))
+        except queue.Full:
+            self._counters['dropped'] += len(results)
+
+    def _ensure_writer(self) -> None:
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="media-index", daemon=True)
+                    self._writer.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            # Drain whatever else is waiting so one transaction covers it all
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.add_many(batch)
+            except Exception as e:
+                print(f"Error writing local media index: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self) -> None:
+        """Block until every queued payload has been written."""
+        self._queue.join()
+
+    def add(self, media_type: str, results: Iterable[Dict[str, Any]]) -> int:
+        return self.add_many([(media_type, list(results))])
+
+    def add_many(self, batch: Iterable[Tuple[str, List[Dict[str, Any]]]]) -> int:
+        """Insert or replace records in one transaction; returns how many were written."""
+        conn = self._conn()
+        now = time.time()
+        written = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for media_type, results in batch:
+                for result in results:
+                    if not result.get("id"):
+                        continue
+                    row = conn.execute("SELECT rowid FROM media WHERE id = ?", (result["id"],)).fetchone()
+                    data = json.dumps(result, separators=(",", ":"))
+                    if row is None:
+                        rowid = conn.execute(
+                            "INSERT INTO media (id, data, updated_at) VALUES (?, ?, ?)",
+                            (result["id"], data, now)
+                        ).lastrowid
+                    else:
+                        rowid = row[0]
+                        conn.execute("UPDATE media SET data = ?, updated_at = ? WHERE rowid = ?", (data, now, rowid))
+                        conn.execute("DELETE FROM media_fts WHERE rowid = ?", (rowid,))
+                    conn.execute(
+                        "INSERT INTO media_fts (rowid, title, creator, tags, source, media_type, license, filetype, category)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            rowid, result.get("title") or "", result.get("creator") or "", _tag_names(result),
+                            result.get("source") or "", media_type, result.get("license") or "",
+                            result.get("filetype") or "", result.get("category") or ""
+                        )
+                    )
+                    written += 1
+            self._evict(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._counters['indexed'] += written
+        return written
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        overflow = conn.execute("SELECT COUNT(*) FROM media").fetchone()[0] - self.max_rows
+        if overflow <= 0:
+            return
+        # Records not seen in any recent search go first
+        rowids = [r[0] for r in conn.execute("SELECT rowid FROM media ORDER BY updated_at LIMIT ?", (overflow,))]
+        marks = ",".join("?" * len(rowids))
+        conn.execute(f"DELETE FROM media_fts WHERE rowid IN ({marks})", rowids)
+        conn.execute(f"DELETE FROM media WHERE rowid IN ({marks})", rowids)
+        self._counters['evicted'] += len(rowids)
+
+    def search(
+        self,
+        media_type: str,
+        query: str,
+        page: int = 1,
+        page_size: int = 20,
+        license_type: Optional[str] = None,
+        source: Optional[str] = None,
+        filetype: Optional[str] = None,
+        category: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Best-matching indexed records for ``query``, as an Openverse-shaped payload."""
+        self._counters['searches'] += 1
+        page, page_size = max(page, 1), max(page_size, 1)
+        empty = {"result_count": 0, "page_count": 0, "page_size": page_size, "page": page, "results": []}
+        expression = match_expression(query)
+        if expression is None:
+            return empty
+
+        where, args = ["media_fts MATCH ?", "media_fts.media_type = ?"], [expression, media_type]
+        for column, value in (("license", license_type), ("source", source),
+                              ("filetype", filetype), ("category", category)):
+            values = [v.strip().lower() for v in (value or "").split(",") if v.strip()]
+            if values:
+                where.append(f"lower(media_fts.{column}) IN ({','.join('?' * len(values))})")
+                args.extend(values)
+        clause = " AND ".join(where)
+
+        conn = self._conn()
+        try:
+            total = conn.execute(
+                f"SELECT COUNT(*) FROM (SELECT 1 FROM media_fts WHERE {clause} LIMIT ?)",
+                [*args, max(COUNT_LIMIT, page * page_size)]
+            ).fetchone()[0]
+            # Ranking inside the subquery uses FTS5's sorter, much faster than ORDER BY bm25() on broad matches
+            rows = conn.execute(
+                f"SELECT media.data FROM (SELECT rowid, rank FROM media_fts WHERE {clause}"
+                f" ORDER BY rank LIMIT ? OFFSET ?) AS hit JOIN media ON media.rowid = hit.rowid ORDER BY hit.rank",
+                [*args, page_size, (page - 1) * page_size]
+            ).fetchall()
+        except sqlite3.OperationalError as e:
+            print(f"Error searching local media index: {e}")
+            return empty
+        return {
+            "result_count": total,
+            "page_count": (total + page_size - 1) // page_size,
+            "page_size": page_size,
+            "page": page,
+            "results": [json.loads(data) for (data,) in rows],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        rows = self._conn().execute("SELECT COUNT(*) FROM media").fetchone()[0]
+        return {**self._counters, 'rows': rows, 'queued': self._queue.qsize()}
+
+
+media_index = MediaIndex.from_env()
@@ -0,0 +1,404 @@
+import atexit
+import cProfile
+import hmac
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from flask import Flask, Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from local_store import ThreadLocalConnection, database_key, host_path
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self, states: Optional[Dict[LabelValues, Any]] = None) -> Iterable[Tuple[str, Sequence[str], Sequence[str], float]]:
+        """Samples for ``states`` (see ``state``), or for this process's own values."""
+        raise NotImplementedError
+
+    def state(self) -> Dict[LabelValues, Any]:
+        """This process's values by label values, for metrics that can be summed across processes."""
+        raise NotImplementedError
+
+    def merge(self, states: List[Any]) -> Any:
+        raise NotImplementedError
+
+    def render(self, states: Optional[Dict[LabelValues, Any]] = None) -> List[str]:
+        # A counter's samples end in _total, and the family must be named like them
+        family = f"{self.name}_total" if self.type == "counter" else self.name
+        lines = [f"# HELP {family} {self.documentation}", f"# TYPE {family} {self.type}"]
+        for suffix, names, values, value in self.samples(states):
+            lines.append(f"{self.name}{suffix}{_format_labels(names, values)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def state(self):
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, states):
+        return sum(states)
+
+    def samples(self, states=None):
+        items = (states if states is not None else self.state()).items()
+        return [("_total", self.labelnames, key, value) for key, value in items]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # one slot per bucket, then sum and count
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def count(self, **labels: Any) -> float:
+        state = self._values.get(self._key(labels))
+        return state[-1] if state else 0
+
+    def state(self):
+        with self._lock:
+            return {key: list(state) for key, state in self._values.items()}
+
+    def merge(self, states):
+        # A process running different buckets cannot be added slot by slot
+        states = [state for state in states if len(state) == len(self.buckets) + 2]
+        return [sum(slot) for slot in zip(*states)]
+
+    def samples(self, states=None):
+        items = (states if states is not None else self.state()).items()
+        names = self.labelnames + ("le",)
+        for key, state in items:
+            if not state:
+                continue
+            for i, bound in enumerate(self.buckets):
+                yield "_bucket", names, key + (_format_value(bound),), state[i]
+            yield "_sum", self.labelnames, key, state[-2]
+            yield "_count", self.labelnames, key, state[-1]
+
+
+class CallbackMetric(_Metric):
+    """A gauge or counter whose samples are read from ``fn`` at scrape time.
+
+    ``fn`` returns a number, or a mapping of label-value tuples to numbers.
+    """
+
+    def __init__(self, name: str, documentation: str, fn: Callable[[], Any],
+                 labelnames: Sequence[str] = (), type: str = "gauge"):
+        super().__init__(name, documentation, labelnames)
+        self.type = type
+        self.fn = fn
+
+    def samples(self, states=None):
+        try:
+            values = self.fn()
+        except Exception as e:
+            print(f"Error collecting metric {self.name}: {e}")
+            return []
+        if values is None:
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        suffix = "_total" if self.type == "counter" else ""
+        return [(suffix, self.labelnames, key, value) for key, value in values.items()]
+
+
+class SQLiteMetricsStore:
+    """Counter and histogram values of every worker on the host, summed at scrape time.
+
+    Each process writes its own values under an id of its own, so whichever
+    worker answers a scrape reports the whole server. Rows of workers that
+    have exited are kept so totals never go backwards; ``clear`` them when
+    the server starts.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = ThreadLocalConnection(path)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS metric_state ("
+            " process TEXT NOT NULL,"
+            " metric TEXT NOT NULL,"
+            " labels TEXT NOT NULL,"
+            " state TEXT NOT NULL,"
+            " PRIMARY KEY (process, metric, labels))"
+        )
+
+    @classmethod
+    def from_env(cls) -> Optional["SQLiteMetricsStore"]:
+        location = os.getenv("METRICS_STORE")
+        if location == "memory":
+            return None
+        return cls(location or host_path("metrics", database_key()))
+
+    def write(self, process: str, rows: List[Tuple[str, LabelValues, Any]]) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO metric_state (process, metric, labels, state) VALUES (?, ?, ?, ?)",
+                [(process, name, json.dumps(key), json.dumps(state)) for name, key, state in rows]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def read(self) -> Dict[str, Dict[LabelValues, List[Any]]]:
+        """Every process's states, by metric name and label values."""
+        found: Dict[str, Dict[LabelValues, List[Any]]] = {}
+        for name, labels, state in self._conn().execute(
+            "SELECT metric, labels, state FROM metric_state ORDER BY rowid"
+        ):
+            found.setdefault(name, {}).setdefault(tuple(json.loads(labels)), []).append(json.loads(state))
+        return found
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM metric_state")
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        # Set by init_metrics when values are summed across worker processes
+        self.shared: Optional[SQLiteMetricsStore] = None
+        self._process: Optional[Tuple[int, str]] = None
+        self._flushed_at = 0.0
+        self._flush_lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, fn: Callable[[], Any],
+                 labelnames: Sequence[str] = (), type: str = "gauge") -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, fn, labelnames, type))
+
+    def _process_id(self) -> str:
+        # A fresh id after a fork, and never a reused pid's, so no process overwrites another's totals
+        if self._process is None or self._process[0] != os.getpid():
+            self._process = (os.getpid(), f"{os.getpid()}-{uuid.uuid4().hex[:8]}")
+        return self._process[1]
+
+    def flush(self) -> None:
+        """Write this process's counter and histogram values to the shared store."""
+        if self.shared is None:
+            return
+        with self._lock:
+            metrics = [m for m in self._metrics.values() if isinstance(m, (Counter, Histogram))]
+        rows = [(metric.name, key, state) for metric in metrics for key, state in metric.state().items()]
+        with self._flush_lock:
+            self.shared.write(self._process_id(), rows)
+            self._flushed_at = time.monotonic()
+
+    def maybe_flush(self, interval: float) -> None:
+        if self.shared is None or time.monotonic() - self._flushed_at < interval:
+            return
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Error writing shared metrics: {e}")
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        shared = None
+        if self.shared is not None:
+            try:
+                self.flush()
+                shared = self.shared.read()
+            except Exception as e:
+                print(f"Error reading shared metrics: {e}")
+        lines: List[str] = []
+        for metric in metrics:
+            if shared is not None and isinstance(metric, (Counter, Histogram)):
+                states = {key: metric.merge(found) for key, found in shared.get(metric.name, {}).items()}
+                lines.extend(metric.render(states))
+            else:
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Latency of HTTP requests by route.", ("method", "route", "status")
+)
+upstream_request_duration = registry.histogram(
+    "openverse_request_duration_seconds", "Latency of Openverse API calls.", ("endpoint", "status")
+)
+db_query_duration = registry.histogram(
+    "db_query_duration_seconds", "Latency of individual SQL statements."
+)
+db_queries_per_request = registry.histogram(
+    "db_queries_per_request", "SQL statements issued per HTTP request.", ("route",), COUNT_BUCKETS
+)
+db_time_per_request = registry.histogram(
+    "db_time_per_request_seconds", "Time spent in SQL per HTTP request.", ("route",)
+)
+
+
+def observe_upstream(endpoint: str, started: float, status: Any) -> None:
+    upstream_request_duration.observe(time.perf_counter() - started, endpoint=endpoint, status=status)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    db_query_duration.observe(elapsed)
+    if has_request_context():
+        g._db_queries = g.get("_db_queries", 0) + 1
+        g._db_time = g.get("_db_time", 0.0) + elapsed
+
+
+def _route() -> str:
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def init_metrics(app: Flask) -> None:
+    """Time every request and its SQL, and expose the registry at ``/metrics``.
+
+    Counters and histograms are summed over all workers through
+    ``METRICS_STORE`` (a SQLite path, or ``memory`` for this process only);
+    each worker writes its values at most every ``METRICS_FLUSH_INTERVAL``
+    seconds and on every scrape it answers. ``METRICS_ENABLED=0`` removes
+    the endpoint and ``METRICS_TOKEN`` requires ``Authorization: Bearer <token>``.
+
+    Setting ``PROFILE_TOKEN`` lets a request carrying ``X-Profile: <token>``
+    be run under cProfile; the stats are written to ``PROFILE_DIR`` and a
+    ``Server-Timing`` header reports total and SQL time.
+    """
+    profile_token = os.getenv("PROFILE_TOKEN")
+    profile_dir = os.getenv("PROFILE_DIR", os.path.join(app.instance_path, "profiles"))
+    metrics_token = os.getenv("METRICS_TOKEN")
+    flush_interval = float(os.getenv("METRICS_FLUSH_INTERVAL", 5))
+    if registry.shared is None:
+        registry.shared = SQLiteMetricsStore.from_env()
+        if registry.shared is not None:
+            # Keeps what a recycled worker counted since its last flush
+            atexit.register(registry.maybe_flush, 0)
+
+    @app.before_request
+    def start_request_timer():
+        g._request_started = time.perf_counter()
+        if profile_token and request.headers.get("X-Profile") == profile_token:
+            g._profiler = cProfile.Profile()
+            g._profiler.enable()
+
+    @app.after_request
+    def record_request_metrics(response: Response) -> Response:
+        started = g.pop("_request_started", None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        route = _route()
+        http_request_duration.observe(elapsed, method=request.method, route=route, status=response.status_code)
+        queries, db_time = g.get("_db_queries", 0), g.get("_db_time", 0.0)
+        db_queries_per_request.observe(queries, route=route)
+        db_time_per_request.observe(db_time, route=route)
+        registry.maybe_flush(flush_interval)
+
+        profiler = g.pop("_profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            os.makedirs(profile_dir, exist_ok=True)
+            filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method}-{route.strip('/').replace('/', '_') or 'root'}-{os.getpid()}.prof"
+            profiler.dump_stats(os.path.join(profile_dir, filename))
+            response.headers["X-Profile-File"] = filename
+            response.headers["Server-Timing"] = (
+                f'app;dur={elapsed * 1000:.1f}, db;dur={db_time * 1000:.1f};desc="{queries} queries"'
+            )
+        return response
+
+    if os.getenv("METRICS_ENABLED", "1") != "1":
+        return
+
+    @app.route("/metrics", methods=["GET"])
+    def get_metrics():
+        if metrics_token and not hmac.compare_digest(
+            request.headers.get("Authorization", ""), f"Bearer {metrics_token}"
+        ):
+            return Response("Unauthorized\n", status=401, mimetype="text/plain")
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
@@ -1,5 +1,5 @@
 from config import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from passwords import hasher
 
 
 class User(db.Model):
@@ -8,10 +8,13 @@ class User(db.Model):
     _password_hash = db.Column(db.String(128), nullable=False)
 
     def set_password(self, password):
-        self._password_hash = generate_password_hash(password)
+        self._password_hash = hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self._password_hash, password)
+        return hasher.verify(self._password_hash, password)
+
+    def password_needs_rehash(self):
+        return hasher.needs_rehash(self._password_hash)
     
     recent_searches = db.relationship(
         'RecentSearch', 
@@ -27,6 +30,12 @@ class User(db.Model):
         }
     
 class RecentSearch(db.Model):
+    __table_args__ = (
+        # Serves the per-user "newest first" listing and its keyset pages
+        db.Index('ix_recent_search_user_timestamp', 'user_id', 'timestamp'),
+        db.Index('uq_recent_search_user_name', 'user_id', 'name', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     name = db.Column(db.String(120), nullable=False)  # Add this new field
@@ -35,6 +44,8 @@ class RecentSearch(db.Model):
     timestamp = db.Column(db.DateTime, default=db.func.current_timestamp())
     total_results = db.Column(db.Integer, nullable=False)
     filters = db.Column(db.JSON)
+    # When the background job last re-counted total_results; None until it has
+    refreshed_at = db.Column(db.DateTime)
 
     def to_json(self):
         return {
@@ -44,5 +55,27 @@ class RecentSearch(db.Model):
             "search_query": self.search_query,
             "timestamp": self.timestamp.isoformat(),
             "total_results": self.total_results,
+            "refreshed_at": self.refreshed_at.isoformat() if self.refreshed_at else None,
             "filters": self.filters
-        }
\ No newline at end of file
+        }
+
+
+class RecentSearchArchive(db.Model):
+    """Saved searches moved out of ``recent_search`` by the retention job."""
+    id = db.Column(db.Integer, primary_key=True)
+    search_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    name = db.Column(db.String(120), nullable=False)
+    search_query = db.Column(db.String(120), nullable=False)
+    media_type = db.Column(db.String(50), nullable=False)
+    timestamp = db.Column(db.DateTime)
+    total_results = db.Column(db.Integer, nullable=False)
+    filters = db.Column(db.JSON)
+    archived_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+
+class RevokedToken(db.Model):
+    """JWT ids invalidated by /logout, kept until the token would have expired anyway."""
+    jti = db.Column(db.String(36), primary_key=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, nullable=False, index=True)
\ No newline at end of file
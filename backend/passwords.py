@@ -0,0 +1,87 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+
+class HashingBusy(Exception):
+    """Raised instead of queueing when too much hashing work is already pending, or the pool cannot answer."""
+
+
+def normalize_method(method: str) -> str:
+    """Spell out werkzeug's implicit defaults so stored hashes can be compared."""
+    parts = method.split(":")
+    if parts[0] == "pbkdf2" and len(parts) == 2:
+        parts.append(str(DEFAULT_PBKDF2_ITERATIONS))
+    return ":".join(parts)
+
+
+class PasswordHasher:
+    """Runs password hashing on a bounded process pool, off the request thread.
+
+    At most ``workers + max_queue`` hashes may be pending; beyond that
+    ``HashingBusy`` is raised so a login burst cannot pile up behind the pool.
+    With ``workers=0`` hashing runs inline on the calling thread.
+    """
+
+    def __init__(self, method: Optional[str] = None, workers: Optional[int] = None,
+                 max_queue: Optional[int] = None, timeout: Optional[float] = None):
+        self.method = normalize_method(method or os.getenv("PASSWORD_HASH_METHOD", "pbkdf2:sha256"))
+        self.workers = int(os.getenv("PASSWORD_HASH_WORKERS", 2)) if workers is None else workers
+        self.max_queue = int(os.getenv("PASSWORD_HASH_QUEUE", 16)) if max_queue is None else max_queue
+        self.timeout = float(os.getenv("PASSWORD_HASH_TIMEOUT", 10)) if timeout is None else timeout
+        self._slots = threading.BoundedSemaphore(max(1, self.workers + self.max_queue))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    # spawn: forking a multi-threaded server process is unsafe
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+        return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy("Too many password operations in progress")
+        try:
+            if self.workers <= 0:
+                return fn(*args)
+            pool = self._pool()
+            try:
+                return pool.submit(fn, *args).result(timeout=self.timeout)
+            except TimeoutError:
+                raise HashingBusy("Password operation timed out")
+            except BrokenProcessPool:
+                # A worker died; start a fresh pool on the next call
+                with self._executor_lock:
+                    if self._executor is pool:
+                        self._executor = None
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise HashingBusy("Password hashing pool restarting")
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash: str, password: str) -> bool:
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash: str) -> bool:
+        return pwhash.split("$", 1)[0] != self.method
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hasher = PasswordHasher()
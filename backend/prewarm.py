@@ -0,0 +1,191 @@
+import datetime
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import click
+from flask import Flask
+from sqlalchemy import Text, cast, func, select
+
+from config import db
+from models import RecentSearch
+from circuit import CircuitOpenError
+from cache import ResponseCache
+from OpenverseAPIClient import OpenverseClient
+from scheduler import start_periodic
+
+# Saved searches store the frontend's media names and filter keys
+MEDIA_TYPES = {"image": "images", "images": "images", "audio": "audio"}
+# Spelling variants of a search merge after the query, so candidate queries over-fetch by this factor
+OVER_FETCH = 4
+
+# Outcome of the most recent run, for /cache_stats and the CLI
+last_run: Dict[str, Any] = {}
+
+
+def _settings() -> Dict[str, Any]:
+    return {
+        'top_n': int(os.getenv("PREWARM_TOP_N", 50)),
+        'days': int(os.getenv("PREWARM_DAYS", 7)),
+        'page_size': int(os.getenv("PREWARM_PAGE_SIZE", 20)),
+        # Fraction of the upstream rate limit never spent on prewarming
+        'reserve': float(os.getenv("PREWARM_RESERVE", 0.5)),
+        # Entries younger than this fraction of their TTL are left alone
+        'refresh_after': float(os.getenv("PREWARM_REFRESH_AFTER", 0.5)),
+    }
+
+
+def search_params(search_query: str, media_type: str, filters: Any, page_size: int) -> Optional[Tuple[str, Dict[str, Any]]]:
+    endpoint = MEDIA_TYPES.get(media_type)
+    if endpoint is None or not search_query.strip():
+        return None
+    filters = {
+        name: value for name, value in (filters if isinstance(filters, dict) else {}).items()
+        if value and value != "Any"
+    }
+    return endpoint, OpenverseClient._build_params(
+        " ".join(search_query.split()),
+        page=1,
+        page_size=page_size,
+        license_type=filters.get("license"),
+        source=filters.get("source"),
+        filetype=filters.get("filetype"),
+        category=filters.get("category") if endpoint == "audio" else None
+    )
+
+
+def popular_searches(top_n: int, days: int, page_size: int = 20) -> List[Dict[str, Any]]:
+    """The ``top_n`` most saved searches of the last ``days``, ranked by distinct users. Needs an app context."""
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=days)
+    users = func.count(func.distinct(RecentSearch.user_id))
+    rows = db.session.execute(
+        select(
+            func.lower(RecentSearch.search_query),
+            RecentSearch.media_type,
+            cast(RecentSearch.filters, Text),
+            users,
+            func.count()
+        )
+        .where(RecentSearch.timestamp >= cutoff)
+        .group_by(func.lower(RecentSearch.search_query), RecentSearch.media_type, cast(RecentSearch.filters, Text))
+        .order_by(users.desc(), func.count().desc())
+        .limit(top_n * OVER_FETCH)
+    )
+
+    merged: Dict[str, Dict[str, Any]] = {}
+    for search_query, media_type, filters, user_count, saves in rows:
+        try:
+            filters = json.loads(filters) if filters else {}
+        except ValueError:
+            filters = {}
+        found = search_params(search_query, media_type, filters, page_size)
+        if found is None:
+            continue
+        endpoint, params = found
+        entry = merged.setdefault(ResponseCache.make_key(endpoint, params), {
+            'media_type': endpoint, 'params': params, 'users': 0, 'saves': 0
+        })
+        entry['users'] += user_count
+        entry['saves'] += saves
+
+    ranked = sorted(merged.values(), key=lambda e: (e['users'], e['saves']), reverse=True)
+    return ranked[:top_n]
+
+
+def spare_budget(client: OpenverseClient, reserve: float) -> int:
+    """Upstream requests a background job may make now; none while the circuit is open."""
+    if client.breaker.state == client.breaker.OPEN:
+        return 0
+    # Only spend headroom above the reserve, so users never queue behind background jobs
+    snapshot = client.rate_limit
+    return max(int(snapshot['remaining'] - reserve * snapshot['limit']), 0)
+
+
+def stops_run(e: Exception) -> bool:
+    """Whether a failed refresh means the rest of the run would be refused too."""
+    return isinstance(e, CircuitOpenError) or "Rate limit exceeded" in str(e)
+
+
+def run_prewarm(
+    client: OpenverseClient,
+    top_n: Optional[int] = None,
+    days: Optional[int] = None
+) -> Dict[str, Any]:
+    """Refresh the most popular saved searches into ``client.cache`` within the spare rate budget. Needs an app context."""
+    settings = _settings()
+    top_n = settings['top_n'] if top_n is None else top_n
+    days = settings['days'] if days is None else days
+
+    start = time.perf_counter()
+    result = {'candidates': 0, 'refreshed': 0, 'fresh': 0, 'deferred': 0, 'failed': 0, 'budget': 0}
+    if client.cache is None:
+        return {**result, 'skipped': "cache disabled"}
+    if client.cache.shared is None:
+        # Other workers (and the app, for a CLI run) would never see this process's memory cache
+        print("Skipping prewarm: set CACHE_BACKEND to sqlite or redis so workers share the cache")
+        return {**result, 'skipped': "cache not shared"}
+
+    candidates = popular_searches(top_n, days, settings['page_size'])
+    result['candidates'] = len(candidates)
+
+    budget = result['budget'] = spare_budget(client, settings['reserve'])
+
+    for index, candidate in enumerate(candidates):
+        media_type, params = candidate['media_type'], candidate['params']
+        age = client.cache.entry_age(media_type, params)
+        if age is not None and age < client.cache.ttls.get(media_type, 300) * settings['refresh_after']:
+            result['fresh'] += 1
+            continue
+        if budget <= 0:
+            result['deferred'] += 1
+            continue
+        try:
+            client.refresh(media_type, params)
+            result['refreshed'] += 1
+            budget -= 1
+        except Exception as e:
+            result['failed'] += 1
+            print(f"Error prewarming {media_type} results: {e}")
+            if stops_run(e):
+                result['deferred'] += len(candidates) - index - 1
+                break
+
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    result['finished_at'] = time.time()
+    last_run.clear()
+    last_run.update(result)
+    return result
+
+
+def init_prewarm(app: Flask, client: OpenverseClient) -> None:
+    @app.cli.command("prewarm-cache")
+    @click.option("--top", "top_n", type=int, help="Number of popular searches to refresh.")
+    @click.option("--days", type=int, help="Only count searches saved in the last this many days.")
+    @click.option("--dry-run", is_flag=True, help="List the popular searches without calling Openverse.")
+    def prewarm_cache_command(top_n, days, dry_run):
+        """Refresh the most popular saved searches into the response cache."""
+        if dry_run:
+            settings = _settings()
+            for entry in popular_searches(top_n or settings['top_n'], days or settings['days'], settings['page_size']):
+                click.echo(f"{entry['users']:>5} users  {entry['media_type']:<7} {json.dumps(entry['params'])}")
+            return
+        result = run_prewarm(client, top_n, days)
+        if result.get('skipped'):
+            click.echo(f"Prewarm skipped: {result['skipped']}")
+            return
+        click.echo(
+            f"Refreshed {result['refreshed']} of {result['candidates']} popular searches "
+            f"({result['fresh']} already fresh, {result['deferred']} deferred) in {result.get('seconds', 0)}s"
+        )
+
+    interval = float(os.getenv("PREWARM_INTERVAL", 0))
+    if interval > 0:
+        start_periodic(app, "prewarm", interval, lambda: _scheduled_run(client))
+
+
+def _scheduled_run(client: OpenverseClient) -> Optional[str]:
+    result = run_prewarm(client)
+    if not result['refreshed']:
+        return None
+    return f"Prewarm refreshed {result['refreshed']} searches in {result['seconds']}s"
@@ -0,0 +1,44 @@
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# Fields the frontend needs to render and attribute a result.
+SLIM_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "images": (
+        "id", "title", "url", "thumbnail", "creator", "creator_url",
+        "license", "license_version", "license_url", "foreign_landing_url",
+        "source", "width", "height"
+    ),
+    "audio": (
+        "id", "title", "url", "thumbnail", "creator", "creator_url",
+        "license", "license_version", "license_url", "foreign_landing_url",
+        "source", "duration", "category"
+    ),
+}
+
+FULL = ("all", "*")
+
+
+def parse_fields(value: Optional[str], media_type: str) -> Optional[Tuple[str, ...]]:
+    """Turn a ``fields=`` query value into a field tuple; ``None`` means keep everything."""
+    if value is None or value.strip() == "":
+        return SLIM_FIELDS[media_type]
+    if value.strip() in FULL:
+        return None
+    return tuple(dict.fromkeys(f.strip() for f in value.split(",") if f.strip()))
+
+
+def project_result(result: Dict[str, Any], fields: Iterable[str]) -> Dict[str, Any]:
+    return {field: result[field] for field in fields if field in result}
+
+
+def project_results(payload: Dict[str, Any], fields: Optional[Tuple[str, ...]]) -> Dict[str, Any]:
+    """Return a copy of a search payload with every result projected onto ``fields``.
+
+    The input is never modified, since it may be shared through the response
+    cache or by coalesced callers.
+    """
+    if fields is None or "results" not in payload:
+        return payload
+    return {
+        **payload,
+        "results": [project_result(r, fields) for r in payload["results"]]
+    }
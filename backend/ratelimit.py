@@ -0,0 +1,177 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from local_store import ThreadLocalConnection, host_path
+
+State = Optional[Dict[str, Any]]
+
+
+class MemoryBucketStore:
+    """Bucket state private to this process."""
+
+    def __init__(self):
+        self._state: State = None
+        self._lock = threading.Lock()
+
+    def transact(self, fn: Callable[[State], Tuple[Dict[str, Any], Any]]) -> Any:
+        with self._lock:
+            self._state, result = fn(self._state)
+            return result
+
+    def read(self) -> State:
+        return self._state
+
+
+class SQLiteBucketStore:
+    """Bucket state in a SQLite file so every worker on the host draws from one budget."""
+
+    def __init__(self, path: str, name: str = "openverse"):
+        self.path = path
+        self.name = name
+        self._conn = ThreadLocalConnection(path)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS rate_bucket (name TEXT PRIMARY KEY, state TEXT NOT NULL)"
+        )
+
+    def transact(self, fn: Callable[[State], Tuple[Dict[str, Any], Any]]) -> Any:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT state FROM rate_bucket WHERE name = ?", (self.name,)).fetchone()
+            state, result = fn(json.loads(row[0]) if row else None)
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_bucket (name, state) VALUES (?, ?)",
+                (self.name, json.dumps(state))
+            )
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def read(self) -> State:
+        """The stored state as of the last commit, without taking the write lock."""
+        row = self._conn().execute("SELECT state FROM rate_bucket WHERE name = ?", (self.name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+class TokenBucket:
+    """Token bucket for the Openverse request budget.
+
+    Until any ``X-RateLimit-*`` headers are seen the bucket refills
+    continuously at ``limit / window``. Once headers have seeded it, it
+    follows upstream's fixed window instead: nothing comes back until the
+    reset time, when it is topped up. Headers only ever lower the local
+    count within the same window so that requests still in flight are not
+    counted twice.
+    """
+
+    def __init__(self, store: Optional[Any] = None, window: float = 3600, default_limit: int = 60):
+        self.store = store if store is not None else MemoryBucketStore()
+        self.window = window
+        self.default_limit = default_limit
+
+    @classmethod
+    def for_client(cls, base_url: str, client_id: Optional[str]) -> "TokenBucket":
+        window = float(os.getenv("OPENVERSE_RATE_WINDOW", 3600))
+        location = os.getenv("RATE_LIMIT_STORE")
+        if location == "memory":
+            return cls(MemoryBucketStore(), window)
+        if not location:
+            location = host_path("openverse_ratelimit", base_url, client_id)
+        return cls(SQLiteBucketStore(location), window)
+
+    def _refill(self, state: State, now: float) -> Dict[str, Any]:
+        if state is None:
+            return {
+                'tokens': float(self.default_limit),
+                'capacity': self.default_limit,
+                'reset': now + self.window,
+                'updated_at': now,
+                'last_checked': 0
+            }
+        state = dict(state)
+        if now >= state['reset']:
+            state['tokens'] = float(state['capacity'])
+            state['reset'] = now + self.window
+        elif state['capacity'] > 0 and not state['last_checked']:
+            refill = (now - state['updated_at']) * state['capacity'] / self.window
+            state['tokens'] = min(float(state['capacity']), state['tokens'] + refill)
+        state['updated_at'] = now
+        return state
+
+    def try_acquire(self) -> float:
+        """Take a token if one is available; otherwise return seconds until one is."""
+        def op(state):
+            now = time.time()
+            state = self._refill(state, now)
+            if state['tokens'] >= 1:
+                state['tokens'] -= 1
+                return state, 0.0
+            until_reset = max(0.0, state['reset'] - now)
+            if state['capacity'] > 0 and not state['last_checked']:
+                wait = min((1 - state['tokens']) * self.window / state['capacity'], until_reset)
+            else:
+                wait = until_reset
+            return state, max(wait, 0.001)
+
+        return self.store.transact(op)
+
+    def acquire(self, timeout: float = 0) -> float:
+        """Block up to ``timeout`` seconds for a token.
+
+        Returns 0 once a token is taken, or the estimated wait when it cannot
+        be had within ``timeout``.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return 0.0
+            if time.monotonic() + wait > deadline:
+                return wait
+            time.sleep(wait)
+
+    async def acquire_async(self, timeout: float = 0) -> float:
+        """``acquire`` for event loops; the store transaction runs on a worker thread."""
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = await asyncio.to_thread(self.try_acquire)
+            if wait == 0:
+                return 0.0
+            if time.monotonic() + wait > deadline:
+                return wait
+            await asyncio.sleep(wait)
+
+    def update(self, remaining: int, limit: int, reset: float) -> None:
+        def op(state):
+            now = time.time()
+            state = self._refill(state, now)
+            if reset > state['reset'] + 1 or state['last_checked'] == 0:
+                state['tokens'] = float(remaining)
+            else:
+                state['tokens'] = min(state['tokens'], float(remaining))
+            state['capacity'] = limit
+            state['reset'] = reset
+            state['last_checked'] = now
+            return state, None
+
+        self.store.transact(op)
+
+    def snapshot(self) -> Dict[str, Any]:
+        # Refilled for display only; the next write works it out again
+        state = self._refill(self.store.read(), time.time())
+        return {
+            'remaining': int(state['tokens']),
+            'limit': state['capacity'],
+            'reset': state['reset'],
+            'last_checked': state['last_checked']
+        }
+
+    def needs_poll(self) -> bool:
+        state = self.store.read()
+        return state is None or state['last_checked'] == 0
@@ -0,0 +1,192 @@
+import datetime
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import click
+from flask import Flask
+from sqlalchemy import Text, cast, func, or_, select, update
+
+from config import db
+from models import RecentSearch
+from cache import ResponseCache
+from identity_cache import identity_cache
+from OpenverseAPIClient import OpenverseClient
+from prewarm import OVER_FETCH, search_params, spare_budget, stops_run
+from scheduler import start_periodic
+
+# Outcome of the most recent run, for /cache_stats and the CLI
+last_run: Dict[str, Any] = {}
+
+
+def _settings() -> Dict[str, Any]:
+    return {
+        # Distinct searches looked at per run
+        'limit': int(os.getenv("RESULT_REFRESH_LIMIT", 200)),
+        # Rows refreshed more recently than this are left alone
+        'max_age_hours': float(os.getenv("RESULT_REFRESH_MAX_AGE_HOURS", 24)),
+        # Distinct searches whose rows are updated per transaction
+        'batch_size': int(os.getenv("RESULT_REFRESH_BATCH_SIZE", 50)),
+        # Fraction of the upstream rate limit never spent on refreshing
+        'reserve': float(os.getenv("RESULT_REFRESH_RESERVE", 0.5)),
+        'page_size': int(os.getenv("PREWARM_PAGE_SIZE", 20)),
+    }
+
+
+def stale_searches(max_age_hours: float, limit: int, page_size: int = 20) -> List[Dict[str, Any]]:
+    """Distinct saved searches with rows not refreshed in ``max_age_hours``, oldest first. Needs an app context.
+
+    Rows that differ only in case or spacing share one entry, so each distinct
+    Openverse query is fetched once however many users saved it.
+    """
+    cutoff = datetime.datetime.now() - datetime.timedelta(hours=max_age_hours)
+    filters_text = cast(RecentSearch.filters, Text)
+    last_refreshed = func.min(func.coalesce(RecentSearch.refreshed_at, RecentSearch.timestamp))
+    rows = db.session.execute(
+        select(RecentSearch.search_query, RecentSearch.media_type, filters_text, func.count())
+        .where(or_(RecentSearch.refreshed_at.is_(None), RecentSearch.refreshed_at < cutoff))
+        .group_by(RecentSearch.search_query, RecentSearch.media_type, filters_text)
+        .order_by(last_refreshed)
+        .limit(limit * OVER_FETCH)
+    )
+
+    merged: Dict[str, Dict[str, Any]] = {}
+    for search_query, media_type, filters, saves in rows:
+        try:
+            decoded = json.loads(filters) if filters else {}
+        except ValueError:
+            decoded = {}
+        # Openverse matching ignores case, so neither does the grouping
+        found = search_params(search_query.lower(), media_type, decoded, page_size)
+        group = (search_query, media_type, filters)
+        if found is None:
+            key, endpoint, params = f"invalid:{group}", None, None
+        else:
+            endpoint, params = found
+            key = ResponseCache.make_key(endpoint, params)
+        entry = merged.setdefault(key, {'media_type': endpoint, 'params': params, 'groups': [], 'rows': 0})
+        entry['groups'].append(group)
+        entry['rows'] += saves
+        if len(merged) > limit:
+            del merged[key]
+            break
+    return list(merged.values())
+
+
+def _apply(updates: List[Dict[str, Any]], now: datetime.datetime) -> int:
+    """Write one batch of counts in a single transaction; returns rows touched."""
+    touched = 0
+    for entry in updates:
+        values = {'refreshed_at': now}
+        if entry.get('count') is not None:
+            values['total_results'] = entry['count']
+        for search_query, media_type, filters in entry['groups']:
+            touched += db.session.execute(
+                update(RecentSearch)
+                .where(
+                    RecentSearch.search_query == search_query,
+                    RecentSearch.media_type == media_type,
+                    cast(RecentSearch.filters, Text).is_(None) if filters is None
+                    else cast(RecentSearch.filters, Text) == filters
+                )
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+    db.session.commit()
+    return touched
+
+
+def run_result_refresh(
+    client: OpenverseClient,
+    limit: Optional[int] = None,
+    max_age_hours: Optional[float] = None
+) -> Dict[str, Any]:
+    """Re-run stale saved searches and store their current result counts. Needs an app context."""
+    settings = _settings()
+    limit = settings['limit'] if limit is None else limit
+    max_age_hours = settings['max_age_hours'] if max_age_hours is None else max_age_hours
+
+    start = time.perf_counter()
+    result = {'candidates': 0, 'fetched': 0, 'cached': 0, 'deferred': 0, 'failed': 0, 'rows': 0, 'budget': 0}
+    candidates = stale_searches(max_age_hours, limit, settings['page_size'])
+    result['candidates'] = len(candidates)
+
+    budget = result['budget'] = spare_budget(client, settings['reserve'])
+
+    now = datetime.datetime.now()
+    pending: List[Dict[str, Any]] = []
+    for index, candidate in enumerate(candidates):
+        media_type, params = candidate['media_type'], candidate['params']
+        if media_type is None:
+            # Nothing to search for; stamp the rows so they stop coming back
+            pending.append({**candidate, 'count': None})
+            continue
+        cached = client.cache.get(media_type, params) if client.cache is not None else None
+        if cached is not None:
+            pending.append({**candidate, 'count': int(cached.get("result_count") or 0)})
+            result['cached'] += 1
+        elif budget <= 0:
+            result['deferred'] += 1
+        else:
+            try:
+                # Fetches the page users would see, so the refresh also warms the cache
+                results = client.refresh(media_type, params)
+                pending.append({**candidate, 'count': int(results.get("result_count") or 0)})
+                result['fetched'] += 1
+                budget -= 1
+            except Exception as e:
+                result['failed'] += 1
+                print(f"Error refreshing result count for {media_type} search: {e}")
+                if stops_run(e):
+                    result['deferred'] += len(candidates) - index - 1
+                    break
+
+        if len(pending) >= settings['batch_size']:
+            result['rows'] += _apply(pending, now)
+            pending = []
+    if pending:
+        result['rows'] += _apply(pending, now)
+    if result['rows']:
+        identity_cache.clear_searches()
+
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    result['finished_at'] = time.time()
+    last_run.clear()
+    last_run.update(result)
+    return result
+
+
+def init_result_refresh(app: Flask, client: OpenverseClient) -> None:
+    @app.cli.command("refresh-counts")
+    @click.option("--limit", type=int, help="Distinct searches to refresh.")
+    @click.option("--max-age-hours", type=float, help="Refresh rows not refreshed in this many hours.")
+    @click.option("--dry-run", is_flag=True, help="List the searches due without calling Openverse.")
+    def refresh_counts_command(limit, max_age_hours, dry_run):
+        """Update total_results of saved searches from Openverse."""
+        if dry_run:
+            settings = _settings()
+            due = stale_searches(
+                max_age_hours if max_age_hours is not None else settings['max_age_hours'],
+                limit or settings['limit'],
+                settings['page_size']
+            )
+            for entry in due:
+                click.echo(f"{entry['rows']:>5} rows  {entry['media_type'] or '-':<7} {json.dumps(entry['params'])}")
+            return
+        result = run_result_refresh(client, limit, max_age_hours)
+        click.echo(
+            f"Updated {result['rows']} rows from {result['fetched']} fetched and {result['cached']} cached "
+            f"searches ({result['deferred']} deferred, {result['failed']} failed) in {result['seconds']}s"
+        )
+
+    interval = float(os.getenv("RESULT_REFRESH_INTERVAL", 0))
+    if interval > 0:
+        start_periodic(app, "result-refresh", interval, lambda: _scheduled_run(client))
+
+
+def _scheduled_run(client: OpenverseClient) -> Optional[str]:
+    result = run_result_refresh(client)
+    if not result['rows']:
+        return None
+    return f"Result refresh updated {result['rows']} rows in {result['seconds']}s"
@@ -0,0 +1,152 @@
+import datetime
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import click
+from flask import Flask
+from sqlalchemy import func, insert, select
+
+from config import db
+from models import RecentSearch, RecentSearchArchive
+from identity_cache import identity_cache
+from scheduler import start_periodic
+
+ARCHIVE_COLUMNS = ("user_id", "name", "search_query", "media_type", "timestamp", "total_results", "filters")
+
+# Outcome of the most recent run, for the /metrics endpoint and the CLI
+last_run: Dict[str, Any] = {}
+
+
+def _settings() -> Dict[str, Any]:
+    return {
+        'days': int(os.getenv("RETENTION_DAYS", 30)),
+        'per_user_cap': int(os.getenv("RETENTION_PER_USER_CAP", 1000)),
+        'batch_size': int(os.getenv("RETENTION_BATCH_SIZE", 500)),
+        'archive': os.getenv("RETENTION_MODE", "delete") == "archive",
+    }
+
+
+def _remove_batch(ids: List[int], archive: bool) -> None:
+    if archive:
+        db.session.execute(insert(RecentSearchArchive).from_select(
+            ["search_id", *ARCHIVE_COLUMNS],
+            select(RecentSearch.id, *(getattr(RecentSearch, c) for c in ARCHIVE_COLUMNS))
+            .where(RecentSearch.id.in_(ids))
+        ))
+    RecentSearch.query.filter(RecentSearch.id.in_(ids)).delete(synchronize_session=False)
+    # Commit per batch so the write lock is only ever held briefly
+    db.session.commit()
+
+
+def _prune_expired(cutoff: datetime.datetime, batch_size: int, archive: bool) -> Dict[str, int]:
+    pruned = batches = 0
+    while True:
+        ids = db.session.scalars(
+            select(RecentSearch.id).where(RecentSearch.timestamp < cutoff).order_by(RecentSearch.id).limit(batch_size)
+        ).all()
+        if not ids:
+            return {'rows': pruned, 'batches': batches}
+        _remove_batch(ids, archive)
+        pruned += len(ids)
+        batches += 1
+
+
+def _prune_over_cap(cap: int, batch_size: int, archive: bool) -> Dict[str, int]:
+    pruned = batches = 0
+    users = db.session.execute(
+        select(RecentSearch.user_id).group_by(RecentSearch.user_id).having(func.count() > cap)
+    ).scalars().all()
+    for user_id in users:
+        while True:
+            # The newest `cap` rows are kept; everything after them goes
+            ids = db.session.scalars(
+                select(RecentSearch.id)
+                .where(RecentSearch.user_id == user_id)
+                .order_by(RecentSearch.timestamp.desc(), RecentSearch.id.desc())
+                .offset(cap)
+                .limit(batch_size)
+            ).all()
+            if not ids:
+                break
+            _remove_batch(ids, archive)
+            pruned += len(ids)
+            batches += 1
+    return {'rows': pruned, 'batches': batches}
+
+
+def _maintain(vacuum: bool) -> None:
+    dialect = db.engine.dialect.name
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        if dialect == "sqlite":
+            connection.exec_driver_sql("ANALYZE recent_search")
+            if vacuum:
+                connection.exec_driver_sql("VACUUM")
+        elif dialect == "postgresql":
+            connection.exec_driver_sql("VACUUM (ANALYZE) recent_search" if vacuum else "ANALYZE recent_search")
+
+
+def run_retention(
+    days: Optional[int] = None,
+    per_user_cap: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    archive: Optional[bool] = None,
+    vacuum: bool = False
+) -> Dict[str, Any]:
+    """Remove (or archive) expired and over-cap saved searches. Needs an app context."""
+    settings = _settings()
+    days = settings['days'] if days is None else days
+    per_user_cap = settings['per_user_cap'] if per_user_cap is None else per_user_cap
+    batch_size = settings['batch_size'] if batch_size is None else batch_size
+    archive = settings['archive'] if archive is None else archive
+
+    start = time.perf_counter()
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=days)
+    expired = _prune_expired(cutoff, batch_size, archive)
+    capped = _prune_over_cap(per_user_cap, batch_size, archive) if per_user_cap > 0 else {'rows': 0, 'batches': 0}
+    _maintain(vacuum)
+    if expired['rows'] or capped['rows']:
+        identity_cache.clear_searches()
+
+    result = {
+        'expired_rows': expired['rows'],
+        'capped_rows': capped['rows'],
+        'batches': expired['batches'] + capped['batches'],
+        'archived': archive,
+        'seconds': round(time.perf_counter() - start, 3),
+        'finished_at': time.time(),
+    }
+    last_run.clear()
+    last_run.update(result)
+    return result
+
+
+def _scheduled_run() -> str:
+    result = run_retention()
+    return f"Retention pruned {result['expired_rows'] + result['capped_rows']} rows in {result['seconds']}s"
+
+
+def start_scheduler(app: Flask, interval: float) -> threading.Thread:
+    return start_periodic(app, "retention", interval, _scheduled_run, os.getenv("RETENTION_LOCK_FILE"))
+
+
+def init_retention(app: Flask) -> None:
+    @app.cli.command("prune-searches")
+    @click.option("--days", type=int, help="Keep searches newer than this many days.")
+    @click.option("--per-user-cap", type=int, help="Keep at most this many searches per user (0 = no cap).")
+    @click.option("--batch-size", type=int, help="Rows removed per transaction.")
+    @click.option("--archive/--delete", default=None, help="Move rows to recent_search_archive instead of deleting.")
+    @click.option("--vacuum", is_flag=True, help="Also VACUUM the database afterwards.")
+    def prune_searches_command(days, per_user_cap, batch_size, archive, vacuum):
+        """Prune expired and over-cap saved searches."""
+        result = run_retention(days, per_user_cap, batch_size, archive, vacuum)
+        click.echo(
+            f"Pruned {result['expired_rows']} expired and {result['capped_rows']} over-cap searches "
+            f"in {result['batches']} batches ({result['seconds']}s)"
+            + (", archived" if result['archived'] else "")
+        )
+
+    interval = float(os.getenv("RETENTION_INTERVAL", 0))
+    if interval > 0:
+        start_scheduler(app, interval)
@@ -0,0 +1,166 @@
+import datetime
+import hashlib
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from flask import Flask
+from flask_jwt_extended import JWTManager
+
+from config import db
+from models import RevokedToken
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings; no false negatives, tunable false positives."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class RevocationStore:
+    """Revoked JWT ids kept in the database and screened in memory.
+
+    Every check first consults a bloom filter of revoked ids, so the common
+    case of a valid token costs no I/O. Filter hits are confirmed against an
+    LRU of recent answers and then the ``revoked_token`` table. Revocations
+    made by other workers are pulled in every ``sync_interval`` seconds, and
+    rows past their token's expiry are pruned (and the filter rebuilt) every
+    ``prune_interval`` seconds.
+    """
+
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.001, cache_size: int = 4096,
+                 sync_interval: float = 5.0, prune_interval: float = 3600.0, commit_delay: float = 5.0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.cache_size = cache_size
+        self.sync_interval = sync_interval
+        self.prune_interval = prune_interval
+        # revoked_at is stamped before the commit, which may wait out a busy
+        # lock; each sync re-reads this far behind the newest row it has seen
+        # so a revocation committed late is not skipped.
+        self.sync_margin = datetime.timedelta(seconds=sync_interval + commit_delay)
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._cache: "OrderedDict[str, bool]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._synced_at = 0.0
+        self._pruned_at = 0.0
+        self._watermark: Optional[datetime.datetime] = None
+        self._counters = {'checks': 0, 'bloom_hits': 0, 'cache_hits': 0, 'db_lookups': 0, 'syncs': 0}
+
+    @classmethod
+    def from_env(cls) -> "RevocationStore":
+        return cls(
+            capacity=int(os.getenv("REVOCATION_BLOOM_CAPACITY", 100000)),
+            error_rate=float(os.getenv("REVOCATION_BLOOM_ERROR_RATE", 0.001)),
+            cache_size=int(os.getenv("REVOCATION_CACHE_SIZE", 4096)),
+            sync_interval=float(os.getenv("REVOCATION_SYNC_INTERVAL", 5)),
+            prune_interval=float(os.getenv("REVOCATION_PRUNE_INTERVAL", 3600)),
+            commit_delay=float(os.getenv("SQLITE_BUSY_TIMEOUT", 5000)) / 1000
+        )
+
+    def _remember(self, jti: str, revoked: bool) -> None:
+        self._cache[jti] = revoked
+        self._cache.move_to_end(jti)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _sync(self) -> None:
+        now = time.time()
+        if now - self._pruned_at >= self.prune_interval:
+            self.prune()
+            return
+        query = db.select(RevokedToken.jti, RevokedToken.revoked_at)
+        if self._watermark is not None:
+            query = query.where(RevokedToken.revoked_at >= self._watermark - self.sync_margin)
+        with self._lock:
+            for jti, revoked_at in db.session.execute(query):
+                self._bloom.add(jti)
+                # A bloom false positive may have cached "not revoked" earlier
+                self._cache.pop(jti, None)
+                if self._watermark is None or revoked_at > self._watermark:
+                    self._watermark = revoked_at
+            self._synced_at = now
+            self._counters['syncs'] += 1
+
+    def is_revoked(self, jti: str) -> bool:
+        if time.time() - self._synced_at >= self.sync_interval:
+            self._sync()
+        with self._lock:
+            self._counters['checks'] += 1
+            if jti not in self._bloom:
+                return False
+            self._counters['bloom_hits'] += 1
+            cached = self._cache.get(jti)
+            if cached is not None:
+                self._counters['cache_hits'] += 1
+                self._cache.move_to_end(jti)
+                return cached
+            self._counters['db_lookups'] += 1
+        revoked = db.session.get(RevokedToken, jti) is not None
+        with self._lock:
+            self._remember(jti, revoked)
+        return revoked
+
+    def revoke(self, jti: str, expires_at: float) -> None:
+        if db.session.get(RevokedToken, jti) is None:
+            db.session.add(RevokedToken(
+                jti=jti,
+                expires_at=datetime.datetime.utcfromtimestamp(expires_at),
+                revoked_at=datetime.datetime.utcnow()
+            ))
+            db.session.commit()
+        with self._lock:
+            self._bloom.add(jti)
+            self._remember(jti, True)
+
+    def prune(self) -> int:
+        """Drop revocations whose tokens have expired and rebuild the filter."""
+        result = db.session.execute(
+            db.delete(RevokedToken).where(RevokedToken.expires_at < datetime.datetime.utcnow())
+        )
+        db.session.commit()
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        watermark = None
+        for jti, revoked_at in db.session.execute(db.select(RevokedToken.jti, RevokedToken.revoked_at)):
+            bloom.add(jti)
+            if watermark is None or revoked_at > watermark:
+                watermark = revoked_at
+        now = time.time()
+        with self._lock:
+            self._bloom = bloom
+            self._watermark = watermark
+            self._cache.clear()
+            self._synced_at = self._pruned_at = now
+        return result.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._counters, 'cached': len(self._cache)}
+
+
+revocations = RevocationStore.from_env()
+
+
+def init_revocation(app: Flask, jwt: JWTManager) -> None:
+    @jwt.token_in_blocklist_loader
+    def _token_revoked(jwt_header, jwt_payload):
+        return revocations.is_revoked(jwt_payload["jti"])
@@ -0,0 +1,75 @@
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from flask import Flask
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; every worker may then run the job
+    fcntl = None
+
+
+def _due(lock_file, interval: float) -> bool:
+    """Record a run in ``lock_file`` unless some worker started one less than ``interval`` ago."""
+    lock_file.seek(0)
+    try:
+        last_run = float(lock_file.read().strip() or 0)
+    except ValueError:
+        last_run = 0.0
+    now = time.time()
+    if now - last_run < interval:
+        return False
+    lock_file.seek(0)
+    lock_file.truncate()
+    lock_file.write(repr(now))
+    lock_file.flush()
+    return True
+
+
+def _loop(app: Flask, name: str, interval: float, lock_path: str, job: Callable[[], Optional[str]]) -> None:
+    lock_file = open(lock_path, "a+")
+    while True:
+        time.sleep(interval)
+        try:
+            if fcntl is not None:
+                # Never two runs at once on the host
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            continue
+        try:
+            # Every worker has its own timer; the start time kept in the lock
+            # file lets only the first of them run each interval.
+            if not _due(lock_file, interval):
+                continue
+            with app.app_context():
+                message = job()
+            if message:
+                print(message)
+        except Exception as e:
+            print(f"Error running {name} job: {e}")
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def start_periodic(
+    app: Flask,
+    name: str,
+    interval: float,
+    job: Callable[[], Optional[str]],
+    lock_path: Optional[str] = None
+) -> threading.Thread:
+    """Run ``job`` in an app context every ``interval`` seconds on a daemon thread.
+
+    Every worker process starts its own loop. A lock file in the instance
+    folder keeps runs from overlapping and holds the start time of the last
+    run, so across all workers on the host the job runs about once per
+    ``interval``. ``job`` may return a line to log.
+    """
+    lock_path = lock_path or os.path.join(app.instance_path, f"{name}.lock")
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    thread = threading.Thread(target=_loop, args=(app, name, interval, lock_path, job), name=name, daemon=True)
+    thread.start()
+    return thread
@@ -1,7 +1,9 @@
 from config import db
-from main import app
+from main import create_app
 from models import User
 
+app = create_app()
+
 with app.app_context():
     users = User.query.all()
 
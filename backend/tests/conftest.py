@@ -1,10 +1,32 @@
+import os
 import pytest
-from main import app
+
+# Keep the Openverse request budget per test process instead of in a shared file
+os.environ.setdefault("RATE_LIMIT_STORE", "memory")
+os.environ.setdefault("IDENTITY_CACHE_STORE", "memory")
+os.environ.setdefault("LOGIN_THROTTLE_STORE", "memory")
+os.environ.setdefault("METRICS_STORE", "memory")
+# Hash inline; a process pool per test session only adds spawn time
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+# Tests that need the local media index build their own
+os.environ.setdefault("MEDIA_INDEX_ENABLED", "0")
+
+from main import create_app
 from config import db
 from models import User, RecentSearch
+from identity_cache import identity_cache
+from OpenverseAPIClient import OpenverseClient
+from benchmarks.fake_openverse import FakeOpenverse
 from werkzeug.security import generate_password_hash
 import json
 
+app = create_app({
+    'TESTING': True,
+    'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+    'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+    'JWT_SECRET_KEY': 'test-secret-key',
+})
+
 @pytest.fixture(scope='session')
 def app_ctx():
     with app.app_context():
@@ -12,12 +34,6 @@ def app_ctx():
 
 @pytest.fixture(scope='function')
 def test_client(app_ctx):
-    # Configure test app
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['JWT_SECRET_KEY'] = 'test-secret-key'
-    
     # Create all tables
     with app.app_context():
         db.create_all()
@@ -35,6 +51,7 @@ def test_client(app_ctx):
     with app.app_context():
         db.session.remove()
         db.drop_all()
+    identity_cache.clear()
     ctx.pop()
 
 @pytest.fixture
@@ -51,4 +68,28 @@ def init_database(test_client):
     with app.app_context():
         User.query.delete()
         RecentSearch.query.delete()
-        db.session.commit()
\ No newline at end of file
+        db.session.commit()
+
+@pytest.fixture
+def upstream_latency():
+    """Seconds ``fake_openverse`` waits before answering; override in a module to slow it down."""
+    return 0.0
+
+@pytest.fixture
+def fake_openverse(upstream_latency):
+    with FakeOpenverse(latency=upstream_latency) as server:
+        yield server
+
+@pytest.fixture
+def openverse_client(fake_openverse):
+    """Build ``OpenverseClient``s against ``fake_openverse``; keyword options are passed through."""
+    clients = []
+
+    def make(**options):
+        client = OpenverseClient(base_url=fake_openverse.url, **options)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
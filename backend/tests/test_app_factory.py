@@ -0,0 +1,26 @@
+import subprocess
+import sys
+from sqlalchemy import inspect
+from config import db
+from main import create_app
+
+
+def test_create_app_builds_no_openverse_client():
+    probe = "import main; main.create_app(); assert not main._clients, main._clients"
+    subprocess.run([sys.executable, "-c", probe], check=True)
+
+
+def test_create_app_applies_overrides_and_serves_health():
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'CUSTOM': 1})
+    assert app.config['CUSTOM'] == 1
+    assert app.test_client().get('/healthz').json == {"status": "ok"}
+
+
+def test_init_db_creates_schema(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'app.db'}"})
+    # Push this app's context; the CLI would otherwise reuse the test app's
+    with app.app_context():
+        result = app.test_cli_runner().invoke(args=["init-db"])
+        assert result.exit_code == 0, result.output
+        tables = inspect(db.engine).get_table_names()
+    assert {"user", "recent_search", "revoked_token"} <= set(tables)
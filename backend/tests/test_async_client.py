@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import time
+import pytest
+from AsyncOpenverseAPIClient import AsyncOpenverseClient, BackgroundLoop
+from cache import ResponseCache
+from ratelimit import MemoryBucketStore, TokenBucket
+
+
+@pytest.fixture
+def upstream_latency():
+    return 0.05
+
+
+def test_async_client_searches_concurrently(fake_openverse):
+    async def scenario():
+        client = AsyncOpenverseClient(base_url=fake_openverse.url, cache=ResponseCache())
+        try:
+            images, audio = await asyncio.gather(
+                client.search_images("cats", page_size=5),
+                client.search_audio("jazz", category=["music"])
+            )
+            # Identical concurrent searches share one upstream request
+            upstream = fake_openverse.requests
+            pages = await asyncio.gather(*[client.search_images("dogs", use_cache=False) for _ in range(5)])
+            return images, audio, pages, fake_openverse.requests - upstream, client
+        finally:
+            await client.aclose()
+
+    images, audio, pages, extra_requests, client = asyncio.run(scenario())
+    assert len(images['results']) == 5
+    assert audio['results'][0]['id'].startswith("audio-jazz")
+    assert all(p == pages[0] for p in pages)
+    assert extra_requests == 1
+    assert client.access_token == "fake-token"
+    assert client.rate_limit['limit'] == 10000
+
+
+def test_async_client_raises_when_rate_limited():
+    client = AsyncOpenverseClient(cache=ResponseCache())
+    client.rate_limiter.update(0, 60, time.time() + 60)
+
+    with pytest.raises(Exception, match="Rate limit exceeded"):
+        asyncio.run(client.search_images("cats"))
+
+
+def test_bucket_store_is_used_off_the_event_loop(fake_openverse):
+    threads = []
+
+    class RecordingStore(MemoryBucketStore):
+        def transact(self, fn):
+            threads.append(threading.get_ident())
+            return super().transact(fn)
+
+        def read(self):
+            threads.append(threading.get_ident())
+            return super().read()
+
+    async def scenario():
+        client = AsyncOpenverseClient(base_url=fake_openverse.url, rate_limiter=TokenBucket(RecordingStore()))
+        try:
+            await client.search_images("cats")
+        finally:
+            await client.aclose()
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(scenario())
+    assert threads and loop_thread not in threads
+
+
+def test_background_loop_runs_coroutines():
+    loop = BackgroundLoop()
+
+    async def add(a, b):
+        await asyncio.sleep(0)
+        return a + b
+
+    assert loop.run_sync(add(1, 2), timeout=1) == 3
+    assert asyncio.run(loop.run(add(2, 3))) == 5
+
+
+def test_async_search_routes(test_client, mocker):
+    from main import ov_async_client
+
+    mock_images = mocker.patch.object(ov_async_client, 'search_images', return_value={"results": [{"id": "img", "tags": []}]})
+    response = test_client.get('/async/search_images', query_string={"q": "nature", "page": "2"})
+    assert response.status_code == 200
+    assert response.json == {"results": [{"id": "img"}]}
+    assert mock_images.call_args.kwargs['page'] == 2
+
+    mocker.patch.object(ov_async_client, 'search_audio', side_effect=Exception("Rate limit exceeded"))
+    response = test_client.get('/async/search_audio?q=jazz')
+    assert response.status_code == 429
+
+    response = test_client.get('/async/search_audio')
+    assert response.status_code == 400
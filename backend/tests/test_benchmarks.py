@@ -0,0 +1,52 @@
+import requests
+from benchmarks.fake_openverse import FakeOpenverse, payload_key, save_recording
+from benchmarks.load_test import compare, percentile, summarize
+
+
+def test_percentile_is_nearest_rank():
+    samples = list(range(1, 101))
+    assert percentile(samples, 50) == 50
+    assert percentile(samples, 95) == 95
+    assert percentile(samples, 99) == 99
+    assert percentile([7], 99) == 7
+    assert percentile([], 50) == 0.0
+
+
+def test_summary_and_baseline_comparison():
+    report = summarize({'/a': [(0.010, 200)] * 9 + [(0.100, 500)]}, elapsed=2)
+    assert report['/a']['count'] == 10
+    assert report['/a']['rps'] == 5.0
+    assert report['/a']['p50'] == 10.0
+    assert report['/a']['errors'] == 1
+    assert report['total'] == report['/a']
+
+    assert compare(report, {'/a': {**report['/a'], 'p95': 50.0}}, 0.2) == ['/a: p95 50.0ms -> 100.0ms']
+    assert compare(report, {'/a': {**report['/a'], 'rps': 10.0}}, 0.2) == ['/a: 10.0 -> 5.0 req/s']
+    assert compare(report, {'/b': report['/a']}, 0.2) == []
+
+
+def test_fake_rate_limit_headers_and_errors():
+    with FakeOpenverse(rate_limit=2, error_rate=0.0) as server:
+        first = requests.get(f"{server.url}/images/", params={'q': 'cats'})
+        assert first.headers['X-RateLimit-Remaining'] == '1'
+        requests.get(f"{server.url}/images/", params={'q': 'cats'})
+        throttled = requests.get(f"{server.url}/images/", params={'q': 'cats'})
+        assert throttled.status_code == 429
+        assert throttled.headers['X-RateLimit-Remaining'] == '0'
+
+        server.error_rate = 1.0
+        assert requests.get(f"{server.url}/audio/", params={'q': 'cats'}).status_code == 503
+        assert server.injected_errors == 1
+
+
+def test_fake_replays_recorded_payloads(tmp_path):
+    path = str(tmp_path / 'payloads.json')
+    params = {'q': 'cats', 'page': 1, 'page_size': 20}
+    save_recording(path, {payload_key('images', params): {'result_count': 1, 'results': [{'id': 'recorded'}]}})
+
+    with FakeOpenverse(replay=path) as server:
+        replayed = requests.get(f"{server.url}/images/", params=params).json()
+        generated = requests.get(f"{server.url}/images/", params={**params, 'q': 'dogs'}).json()
+    assert replayed['results'] == [{'id': 'recorded'}]
+    assert len(generated['results']) == 20
+    assert server.replay_misses == 1
@@ -0,0 +1,76 @@
+import time
+from cache import MemoryBackend, SQLiteBackend, ResponseCache
+from OpenverseAPIClient import OpenverseClient
+from benchmarks.fake_openverse import FakeOpenverse
+
+
+def test_cache_key_normalization():
+    a = ResponseCache.make_key("images", {"q": "  Red  Cats ", "page": 1, "license": None})
+    b = ResponseCache.make_key("images", {"page": "1", "q": "red cats"})
+    assert a == b
+    assert a != ResponseCache.make_key("audio", {"q": "red cats", "page": 1})
+
+
+def test_memory_backend_lru_and_byte_bounds():
+    backend = MemoryBackend(max_entries=2, max_bytes=10)
+    backend.set("a", b"1234", 60)
+    backend.set("b", b"1234", 60)
+    assert backend.get("a") == b"1234"  # "a" is now most recently used
+
+    backend.set("c", b"1234", 60)
+    assert backend.get("b") is None
+    assert backend.get("a") is not None
+    assert backend.evictions == 1
+
+    backend.set("d", b"123456789", 60)  # exceeds byte budget with anything else
+    assert backend.stats()['bytes'] <= 10
+
+    backend.set("e", b"1", 0.01)
+    time.sleep(0.02)
+    assert backend.get("e") is None
+
+
+def test_sqlite_backend_is_shared_between_caches(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first = ResponseCache(shared=SQLiteBackend(path))
+    second = ResponseCache(shared=SQLiteBackend(path))
+
+    first.set("images", {"q": "cats"}, {"results": [1, 2, 3]})
+    assert second.get("images", {"q": "cats"}) == {"results": [1, 2, 3]}
+    assert second.stats()['shared_hits'] == 1
+
+    backend = SQLiteBackend(str(tmp_path / "small.db"), max_entries=2)
+    for key in ("a", "b", "c"):
+        backend.set(key, b"x", 60)
+    assert backend.stats()['entries'] == 2
+    assert backend.get("a") is None
+
+
+def test_client_serves_repeat_searches_from_cache():
+    with FakeOpenverse() as server:
+        client = OpenverseClient(base_url=server.url, cache=ResponseCache())
+        first = client.search_images("cats")
+        upstream = server.requests
+
+        assert client.search_images("Cats ") == first
+        assert server.requests == upstream
+
+        client.search_images("cats", use_cache=False)
+        assert server.requests == upstream + 1
+
+        stats = client.cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['bypasses'] == 1
+
+
+def test_no_cache_header_bypasses_cache(test_client, mocker):
+    from main import ov_client
+
+    mock_search = mocker.patch.object(ov_client, 'search_images', return_value={"results": []})
+    test_client.get('/search_images?q=cats', headers={"Cache-Control": "no-cache"})
+    assert mock_search.call_args.kwargs['use_cache'] is False
+
+    response = test_client.get('/cache_stats')
+    assert response.status_code == 200
+    assert response.json['enabled'] is True
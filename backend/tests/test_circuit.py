@@ -0,0 +1,157 @@
+import time
+import pytest
+from cache import ResponseCache
+from circuit import CircuitBreaker, CircuitOpenError
+
+
+@pytest.fixture
+def client_factory(openverse_client):
+    """Clients without adapter retries and with a breaker that trips after two failures."""
+    def make(**kwargs):
+        options = {'max_retries': 0, 'breaker': CircuitBreaker(failure_threshold=2, reset_timeout=0.2)}
+        options.update(kwargs)
+        return openverse_client(**options)
+    return make
+
+
+def test_breaker_opens_probes_and_closes():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.before_call()
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    breaker.before_call()  # the single half-open probe
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats()['opened'] == 2
+
+
+def test_open_circuit_fails_fast_without_calling_upstream(fake_openverse, client_factory):
+    client = client_factory(cache=ResponseCache())
+    client.search_images("warmup")  # authenticates and seeds the rate limit
+    fake_openverse.fail_status = 503
+
+    for _ in range(2):
+        with pytest.raises(Exception):
+            client.search_images("cats", use_cache=False)
+    calls = fake_openverse.requests
+
+    start = time.monotonic()
+    with pytest.raises(CircuitOpenError):
+        client.search_images("cats", use_cache=False)
+    assert time.monotonic() - start < 0.05
+    assert fake_openverse.requests == calls
+
+    fake_openverse.fail_status = 0
+    time.sleep(0.25)
+    assert client.search_images("cats", use_cache=False)['results']
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_unexpected_error_releases_the_half_open_probe(fake_openverse, client_factory, mocker):
+    import sqlite3
+
+    client = client_factory(cache=None)
+    client.search_images("warmup")
+    client.breaker.record_failure()
+    client.breaker.record_failure()
+    time.sleep(0.25)
+    assert client.breaker.state == CircuitBreaker.HALF_OPEN
+
+    acquire = mocker.patch.object(client.rate_limiter, 'acquire', side_effect=sqlite3.OperationalError("locked"))
+    with pytest.raises(sqlite3.OperationalError):
+        client.search_images("cats")
+
+    acquire.side_effect = None
+    acquire.return_value = 0
+    assert client.search_images("cats")['results']
+    assert client.breaker.state == CircuitBreaker.CLOSED
+def test_client_errors_do_not_trip_the_breaker(fake_openverse, client_factory):
+    client = client_factory(cache=None)
+    fake_openverse.fail_status = 400
+    for _ in range(3):
+        with pytest.raises(Exception):
+            client.search_images("cats")
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_serves_stale_copy_when_upstream_fails(fake_openverse, client_factory):
+    cache = ResponseCache(ttls={'images': 0.05}, stale_ttl=60, swr_window=0)
+    client = client_factory(cache=cache)
+    fresh = client.search_images("cats")
+    time.sleep(0.06)
+    fake_openverse.fail_status = 503
+
+    stale = client.search_images("cats")
+    assert stale['stale'] is True
+    assert stale['results'] == fresh['results']
+    assert 'stale' not in fresh
+
+
+def test_recently_expired_entry_is_revalidated_in_background(fake_openverse, client_factory):
+    cache = ResponseCache(ttls={'images': 0.2}, stale_ttl=60, swr_window=30)
+    client = client_factory(cache=cache)
+    client.search_images("cats")
+    time.sleep(0.25)
+    calls = fake_openverse.requests
+
+    assert client.search_images("cats")['stale'] is True
+    deadline = time.monotonic() + 2
+    while cache.stats()['sets'] < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert fake_openverse.requests == calls + 1
+    assert 'stale' not in client.search_images("cats")
+
+
+def test_per_call_timeout(fake_openverse, client_factory):
+    client = client_factory(cache=None)
+    client.search_images("warmup")
+    fake_openverse.latency = 0.5
+
+    start = time.monotonic()
+    with pytest.raises(Exception):
+        client.search_images("cats", timeout=0.1)
+    assert time.monotonic() - start < 0.4
+
+
+def test_retry_after_does_not_outlast_per_call_timeout(fake_openverse, client_factory):
+    # The default client, retries and all
+    client = client_factory(cache=None, max_retries=None)
+    client.search_images("warmup")
+    fake_openverse.fail_status = 503
+    fake_openverse.retry_after = 4
+
+    start = time.monotonic()
+    with pytest.raises(Exception):
+        client.search_images("cats", timeout=1.0)
+    assert time.monotonic() - start < 1.0
+    assert client.breaker.stats()['failures'] == 1
+
+def test_endpoint_reports_open_circuit_and_stale_results(test_client, mocker):
+    from main import ov_client
+
+    mocker.patch.object(ov_client, 'search_images', side_effect=CircuitOpenError(12))
+    response = test_client.get('/search_images?q=cats')
+    assert response.status_code == 503
+    assert response.json['code'] == "upstream_unavailable"
+    assert response.headers['Retry-After'] == "12"
+
+    mocker.patch.object(ov_client, 'search_images', return_value={"results": [], "stale": True, "age": 42})
+    response = test_client.get('/search_images?q=cats')
+    assert response.status_code == 200
+    assert response.json['stale'] is True
+    assert response.headers['Age'] == "42"
+    assert "Stale" in response.headers['Warning']
@@ -0,0 +1,93 @@
+from flask import g
+from flask_jwt_extended import create_access_token
+from cache import ResponseCache
+from identity_cache import identity_cache
+
+
+def _headers(user, **extra):
+    return {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}', **extra}
+
+
+def test_cache_set_returns_content_hash():
+    cache = ResponseCache()
+    params = {'q': 'cats', 'page': 1, 'page_size': 20}
+    etag = cache.set('images', params, {'results': [1]})
+
+    assert cache.etag('images', params) == etag
+    assert cache.get('images', params).etag == etag
+    assert cache.set('images', params, {'results': [1]}) == etag
+    assert cache.set('images', params, {'results': [2]}) != etag
+
+
+def test_search_revalidates_without_searching(test_client, mocker):
+    from main import ov_client
+
+    cache = ResponseCache()
+    mocker.patch.object(ov_client, 'cache', cache)
+    cache.set('images', {'q': 'cats', 'page': 1, 'page_size': 20}, {'result_count': 1, 'results': [{'id': 'a'}]})
+
+    first = test_client.get('/search_images?q=cats')
+    etag = first.headers['ETag']
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'].startswith('public, max-age=')
+    # A different projection is a different representation
+    projected = test_client.get('/search_images?q=cats&fields=id', headers={'If-None-Match': etag})
+    assert projected.status_code == 200
+
+    search = mocker.patch.object(ov_client, 'search_images')
+    second = test_client.get('/search_images?q=cats', headers={'If-None-Match': etag})
+    assert second.status_code == 304
+    assert second.data == b''
+    assert second.headers['ETag'] == etag
+    search.assert_not_called()
+
+
+def test_stale_search_results_have_no_etag(test_client, mocker):
+    from main import ov_client
+
+    mocker.patch.object(ov_client, 'search_images', return_value={"results": [], "stale": True, "age": 42})
+    response = test_client.get('/search_images?q=cats')
+    assert 'ETag' not in response.headers
+    assert response.headers['Cache-Control'] == 'public, max-age=0'
+
+
+def test_compressed_etag_still_revalidates(test_client, mocker):
+    from main import ov_client
+
+    cache = ResponseCache()
+    mocker.patch.object(ov_client, 'cache', cache)
+    results = [{'id': str(i), 'title': 'a cat picture ' * 10} for i in range(20)]
+    cache.set('images', {'q': 'cats', 'page': 1, 'page_size': 20}, {'result_count': 20, 'results': results})
+
+    first = test_client.get('/search_images?q=cats', headers={'Accept-Encoding': 'gzip'})
+    assert first.headers['Content-Encoding'] == 'gzip'
+    assert first.headers['ETag'].endswith('-gzip"')
+
+    second = test_client.get(
+        '/search_images?q=cats',
+        headers={'Accept-Encoding': 'gzip', 'If-None-Match': first.headers['ETag']}
+    )
+    assert second.status_code == 304
+
+
+def test_recent_searches_not_modified_skips_the_database(test_client, init_database):
+    headers = _headers(init_database)
+    test_client.post('/save_search', json={'name': 'a', 'query': 'a', 'media_type': 'images'}, headers=headers)
+
+    first = test_client.get('/recent_searches', headers=headers)
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+    assert 'Authorization' in first.headers['Vary']
+
+    g.pop('_db_queries', None)
+    before = identity_cache.stats()['recent_searches']['hits']
+    second = test_client.get('/recent_searches', headers=_headers(init_database, **{'If-None-Match': etag}))
+    assert second.status_code == 304
+    assert identity_cache.stats()['recent_searches']['hits'] == before + 1
+    assert g.get('_db_queries', 0) == 0
+
+    test_client.post('/save_search', json={'name': 'b', 'query': 'b', 'media_type': 'images'}, headers=headers)
+    third = test_client.get('/recent_searches', headers=_headers(init_database, **{'If-None-Match': etag}))
+    assert third.status_code == 200
+    assert third.headers['ETag'] != etag
+    assert len(third.json) == 2
@@ -0,0 +1,30 @@
+from sqlalchemy import create_engine
+from config import database_uri, engine_options
+
+
+def test_database_url_from_environment(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", "postgres://user:pw@db:5432/seapp")
+    assert database_uri() == "postgresql://user:pw@db:5432/seapp"
+
+    monkeypatch.delenv("DATABASE_URL")
+    assert database_uri() == "sqlite:///app.db"
+
+
+def test_engine_options_per_backend(monkeypatch):
+    assert engine_options("sqlite:///app.db") == {}
+
+    monkeypatch.setenv("DB_POOL_SIZE", "3")
+    options = engine_options("postgresql://db/seapp")
+    assert options["pool_size"] == 3
+    assert options["pool_pre_ping"] is True
+    assert options["pool_recycle"] == 1800
+
+
+def test_sqlite_connections_use_wal(tmp_path):
+    # The test app runs on :memory:, which has no journal; check a file database
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert connection.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        assert connection.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+    engine.dispose()
@@ -1,5 +1,5 @@
 import pytest
-from main import app, ov_client
+from main import ov_client, SEARCH_TIMEOUT
 from models import User, RecentSearch
 from werkzeug.security import generate_password_hash
 import json
@@ -163,7 +163,9 @@ def test_search_images(test_client, mocker):
         page_size=30, 
         license_type="cc0",
         source="flickr",
-        filetype="jpg"
+        filetype="jpg",
+        use_cache=True,
+        timeout=SEARCH_TIMEOUT
     )
 
     # Test missing query
@@ -203,7 +205,9 @@ def test_search_audio(test_client, mocker):
         license_type="by",
         source="jamendo",
         filetype="mp3",
-        category="music"
+        category="music",
+        use_cache=True,
+        timeout=SEARCH_TIMEOUT
     )
 
     # Test rate limit error handling
@@ -214,4 +218,112 @@ def test_search_audio(test_client, mocker):
     )
     response = test_client.get('/search_audio?q=test')
     assert response.status_code == 429
-    assert "Rate limit exceeded" in response.json['error']
\ No newline at end of file
+    assert "Rate limit exceeded" in response.json['error']
+
+def test_get_recent_searches_keyset_pagination(test_client, init_database):
+    user = init_database
+    token = create_access_token(identity=str(user.id))
+    headers = {'Authorization': f'Bearer {token}'}
+
+    now = datetime.now()
+    db.session.add_all([
+        RecentSearch(
+            user_id=user.id,
+            name=f"search {i}",
+            search_query=f"query{i}",
+            media_type="image",
+            total_results=i,
+            # two rows share a timestamp to exercise the id tie-breaker
+            timestamp=now - timedelta(minutes=i // 2)
+        )
+        for i in range(5)
+    ])
+    db.session.commit()
+
+    seen = []
+    cursor = None
+    while True:
+        params = {'limit': 2}
+        if cursor:
+            params['before'] = cursor
+        response = test_client.get('/recent_searches', query_string=params, headers=headers)
+        assert response.status_code == 200
+        assert len(response.json) <= 2
+        seen.extend(s['id'] for s in response.json)
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+
+    full = test_client.get('/recent_searches', headers=headers).json
+    assert seen == [s['id'] for s in full]
+    assert len(seen) == 5
+
+    response = test_client.get('/recent_searches?before=not-a-cursor', headers=headers)
+    assert response.status_code == 400
+
+def test_save_search_batch(test_client, init_database):
+    user = init_database
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+    test_client.post('/save_search', json={"name": "taken", "query": "q", "media_type": "image"}, headers=headers)
+
+    response = test_client.post('/save_search/batch', headers=headers, json={"searches": [
+        {"name": "one", "query": "cats", "media_type": "image", "total_results": 3},
+        {"name": "taken", "query": "dogs", "media_type": "image"},
+        {"name": "two", "query": "jazz", "media_type": "audio", "filters": {"category": "music"}},
+        {"name": "one", "query": "again", "media_type": "image"},
+        {"query": "no name", "media_type": "image"},
+    ]})
+    assert response.status_code == 207
+    assert response.json['created'] == 2
+    assert [item['status'] for item in response.json['items']] == ["created", "error", "created", "error", "error"]
+    assert RecentSearch.query.filter_by(user_id=user.id).count() == 3
+
+    response = test_client.post('/save_search/batch', headers=headers, json={"searches": []})
+    assert response.status_code == 400
+    response = test_client.post('/save_search/batch', headers=headers, json={"searches": [{}] * 101})
+    assert response.status_code == 413
+
+def test_delete_recent_searches_batch(test_client, init_database):
+    user = init_database
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+    searches = [
+        RecentSearch(user_id=user.id, name=f"s{i}", search_query="q", media_type="image", total_results=0)
+        for i in range(3)
+    ]
+    db.session.add_all(searches)
+    db.session.commit()
+    ids = [s.id for s in searches]
+
+    response = test_client.post('/recent_searches/batch_delete', headers=headers, json={"ids": ids[:2] + [999]})
+    assert response.status_code == 200
+    assert response.json['deleted'] == 2
+    assert response.json['items'][-1] == {"id": 999, "status": "not_found"}
+    assert [s.id for s in RecentSearch.query.filter_by(user_id=user.id)] == [ids[2]]
+
+    response = test_client.post('/recent_searches/batch_delete', headers=headers, json={"ids": ["x"]})
+    assert response.status_code == 400
+
+def test_export_recent_searches(test_client, init_database):
+    user = init_database
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+    db.session.add_all([
+        RecentSearch(user_id=user.id, name="old", search_query="cats", media_type="image",
+                     total_results=1, timestamp=datetime.now() - timedelta(days=90), filters={"license": "by"}),
+        RecentSearch(user_id=user.id, name="new", search_query="jazz", media_type="audio", total_results=2),
+    ])
+    db.session.commit()
+
+    response = test_client.get('/recent_searches/export', headers=headers)
+    assert response.status_code == 200
+    assert response.is_streamed
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [r['name'] for r in rows] == ["new", "old"]  # whole history, not just 30 days
+    assert rows[1]['filters'] == {"license": "by"}
+
+    response = test_client.get('/recent_searches/export?format=csv', headers=headers)
+    lines = response.get_data(as_text=True).splitlines()
+    assert lines[0] == "id,name,media_type,search_query,timestamp,total_results,filters,refreshed_at"
+    assert len(lines) == 3
+    assert 'attachment' in response.headers['Content-Disposition']
+
+    assert test_client.get('/recent_searches/export?format=xml', headers=headers).status_code == 400
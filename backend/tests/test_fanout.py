@@ -0,0 +1,74 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fanout import fan_out
+
+
+def test_fan_out_runs_legs_in_parallel_and_isolates_errors():
+    def slow(value):
+        def fn():
+            time.sleep(0.1)
+            return value
+        return fn
+
+    def broken():
+        raise Exception("boom")
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        start = time.monotonic()
+        results, errors = fan_out(executor, {"a": slow(1), "b": slow(2), "c": broken}, deadline=1)
+        elapsed = time.monotonic() - start
+
+    assert results == {"a": 1, "b": 2}
+    assert str(errors["c"]) == "boom"
+    assert elapsed < 0.19  # max(legs), not sum(legs)
+
+
+def test_fan_out_returns_partial_results_at_deadline():
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results, errors = fan_out(
+            executor,
+            {"fast": lambda: "ok", "slow": lambda: time.sleep(0.5)},
+            deadline=0.1
+        )
+
+    assert results == {"fast": "ok"}
+    assert isinstance(errors["slow"], TimeoutError)
+
+
+def test_combined_search_endpoint(test_client, mocker):
+    from main import ov_client
+
+    mocker.patch.object(ov_client, 'search_images', return_value={
+        "result_count": 2, "page_count": 1, "results": [{"id": "i1"}]
+    })
+    mocker.patch.object(ov_client, 'search_audio', side_effect=Exception("Rate limit exceeded"))
+
+    response = test_client.get('/search?q=cats')
+    assert response.status_code == 200
+    assert response.json['partial'] is True
+    assert response.json['results']['images']['results'] == [{"id": "i1"}]
+    assert response.json['errors']['audio']['code'] == "rate_limit_exceeded"
+
+    mocker.patch.object(ov_client, 'search_images', side_effect=Exception("Rate limit exceeded"))
+    response = test_client.get('/search?q=cats')
+    assert response.status_code == 429
+
+    response = test_client.get('/search?q=cats&media=video')
+    assert response.status_code == 400
+    for deadline in ("0", "-1", "nan"):
+        assert test_client.get(f'/search?q=cats&deadline={deadline}').status_code == 400
+
+
+def test_combined_search_merges_pages(test_client, mocker):
+    from main import ov_client
+
+    mock_images = mocker.patch.object(
+        ov_client, 'search_images',
+        side_effect=lambda **kw: {"result_count": 40, "page_count": 2, "results": [{"id": kw["page"]}]}
+    )
+    response = test_client.get('/search?q=cats&media=images&pages=2')
+    assert response.status_code == 200
+    assert mock_images.call_count == 2
+    assert response.json['results']['images']['pages'] == [1, 2]
+    assert response.json['results']['images']['results'] == [{"id": 1}, {"id": 2}]
+    assert response.json['partial'] is False
@@ -0,0 +1,91 @@
+from flask import g
+from flask_jwt_extended import create_access_token
+from identity_cache import IdentityCache, SQLiteGenerations, identity_cache
+
+
+def _headers(user):
+    return {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+
+
+def _save(test_client, headers, name):
+    data = {'name': name, 'query': name, 'media_type': 'images'}
+    return test_client.post('/save_search', json=data, headers=headers)
+
+
+def test_recent_searches_served_from_cache(test_client, init_database):
+    headers = _headers(init_database)
+    _save(test_client, headers, 'first')
+
+    first = test_client.get('/recent_searches', headers=headers)
+    before = identity_cache.stats()['recent_searches']
+    second = test_client.get('/recent_searches', headers=headers)
+    after = identity_cache.stats()['recent_searches']
+
+    assert second.json == first.json
+    assert after['hits'] == before['hits'] + 1
+
+
+def test_writes_invalidate_recent_searches(test_client, init_database):
+    headers = _headers(init_database)
+    _save(test_client, headers, 'first')
+    assert len(test_client.get('/recent_searches', headers=headers).json) == 1
+
+    search_id = _save(test_client, headers, 'second').json['search_id']
+    assert len(test_client.get('/recent_searches', headers=headers).json) == 2
+
+    test_client.delete(f'/recent_searches/{search_id}', headers=headers)
+    assert len(test_client.get('/recent_searches', headers=headers).json) == 1
+
+    test_client.post('/recent_searches/batch_delete', json={'ids': [1]}, headers=headers)
+    assert test_client.get('/recent_searches', headers=headers).json == []
+
+
+def test_pages_cached_per_limit(test_client, init_database):
+    headers = _headers(init_database)
+    for name in ('a', 'b', 'c'):
+        _save(test_client, headers, name)
+
+    everything = test_client.get('/recent_searches', headers=headers)
+    page = test_client.get('/recent_searches?limit=2', headers=headers)
+    assert len(everything.json) == 3
+    assert len(page.json) == 2
+    assert page.headers['X-Next-Cursor']
+
+
+def test_login_reuses_cached_user(test_client, init_database):
+    data = {'email': 'test@example.com', 'password': 'testpassword'}
+    assert test_client.post('/login', json=data).status_code == 200
+    # The fixture's app context outlives requests; drop the per-request memo
+    g.pop('_users_by_email', None)
+    before = identity_cache.stats()['users']
+    assert test_client.post('/login', json=data).status_code == 200
+    assert identity_cache.stats()['users']['hits'] == before['hits'] + 1
+
+    response = test_client.post('/register', json=data)
+    assert response.status_code == 409
+
+
+def test_load_racing_an_invalidation_is_not_stored(app_ctx):
+    cache = IdentityCache()
+
+    def load():
+        cache.invalidate_searches(1)
+        return ['stale'], None
+
+    assert cache.recent_searches(1, None, load) == (['stale'], None)
+    assert cache.recent_searches(1, None, lambda: (['fresh'], None)) == (['fresh'], None)
+    assert cache.recent_searches(1, None, lambda: (['unused'], None)) == (['fresh'], None)
+
+
+def test_writes_in_one_worker_invalidate_the_others(tmp_path):
+    path = str(tmp_path / 'generations.db')
+    worker_a = IdentityCache(generations=SQLiteGenerations(path))
+    worker_b = IdentityCache(generations=SQLiteGenerations(path))
+
+    assert worker_b.recent_searches(1, None, lambda: ['old']) == ['old']
+    worker_a.invalidate_searches(1)
+    assert worker_b.recent_searches(1, None, lambda: ['new']) == ['new']
+    assert worker_b.recent_searches(1, None, lambda: ['unused']) == ['new']
+
+    worker_a.clear_searches()
+    assert worker_b.recent_searches(1, None, lambda: ['newer']) == ['newer']
@@ -0,0 +1,57 @@
+import datetime
+import decimal
+import json
+import pytest
+from flask import Flask
+from json_provider import OrjsonProvider, StdlibJSONProvider, init_json_provider, orjson
+
+PAYLOAD = {
+    "when": datetime.datetime(2024, 5, 1, 12, 30, 15, 250000),
+    "day": datetime.date(2024, 5, 1),
+    "price": decimal.Decimal("1.50"),
+    "results": [{"id": 1, "title": "Café"}],
+}
+
+
+@pytest.mark.parametrize("name", ["stdlib", "orjson"])
+def test_providers_encode_dates_as_iso_8601(name):
+    if name == "orjson" and orjson is None:
+        pytest.skip("orjson is not installed")
+
+    app = Flask(__name__)
+    init_json_provider(app, name)
+    encoded = json.loads(app.json.dumps(PAYLOAD))
+
+    assert encoded["when"] == "2024-05-01T12:30:15.250000"
+    assert encoded["day"] == "2024-05-01"
+    assert encoded["price"] == "1.50"
+    assert encoded["results"][0]["title"] == "Café"
+
+    with app.app_context():
+        response = app.json.response(PAYLOAD)
+    assert response.mimetype == "application/json"
+    assert json.loads(response.get_data()) == encoded
+
+
+def test_auto_provider_prefers_orjson():
+    app = Flask(__name__)
+    init_json_provider(app, "auto")
+    expected = OrjsonProvider if orjson is not None else StdlibJSONProvider
+    assert type(app.json) is expected
+
+
+def test_recent_searches_timestamps_are_iso(test_client, init_database):
+    from flask_jwt_extended import create_access_token
+    from config import db
+    from models import RecentSearch
+
+    user = init_database
+    when = datetime.datetime.now().replace(microsecond=123456)
+    db.session.add(RecentSearch(
+        user_id=user.id, name="n", search_query="q", media_type="image", total_results=1, timestamp=when
+    ))
+    db.session.commit()
+
+    token = create_access_token(identity=str(user.id))
+    response = test_client.get('/recent_searches', headers={'Authorization': f'Bearer {token}'})
+    assert response.json[0]['timestamp'] == when.isoformat()
@@ -0,0 +1,106 @@
+import pytest
+from circuit import CircuitOpenError
+from media_index import MediaIndex, match_expression
+from OpenverseAPIClient import OpenverseClient
+from benchmarks.fake_openverse import FakeOpenverse, make_result
+
+
+@pytest.fixture
+def index(tmp_path):
+    return MediaIndex(str(tmp_path / 'media.db'))
+
+
+def _results(media_type, query, count):
+    return [make_result(media_type, query, i) for i in range(count)]
+
+
+def test_match_expression_quotes_words_and_prefixes_the_last():
+    assert match_expression('Red "fox') == '"red" "fox"*'
+    assert match_expression('  ') is None
+
+
+def test_search_matches_text_and_filters(index):
+    index.add("images", _results("images", "cats", 5))
+    index.add("images", [{**make_result("images", "dogs", 0), "license": "cc0", "source": "wikimedia"}])
+    index.add("audio", _results("audio", "jazz", 3))
+
+    found = index.search("images", "cats", page_size=2)
+    assert found['result_count'] == 5
+    assert found['page_count'] == 3
+    assert [r['id'] for r in found['results']][0].startswith("images-cats")
+    assert index.search("images", "ca")['result_count'] == 5  # prefix of the last word
+    assert index.search("audio", "cats")['result_count'] == 0
+    assert index.search("images", "dogs", license_type="by,cc0")['result_count'] == 1
+    assert index.search("images", "dogs", source="flickr")['result_count'] == 0
+    assert index.search("images", "outdoor")['result_count'] == 6  # tags are searchable
+
+
+def test_reindexing_replaces_records_and_eviction_caps_rows(tmp_path):
+    index = MediaIndex(str(tmp_path / 'media.db'), max_rows=4)
+    index.add("images", _results("images", "cats", 3))
+    index.add("images", [{**make_result("images", "cats", 0), "title": "renamed"}])
+    assert index.search("images", "renamed")['result_count'] == 1
+    assert index.stats()['rows'] == 3
+
+    index.add("images", _results("images", "dogs", 3))
+    assert index.stats()['rows'] == 4
+    assert index.stats()['evicted'] == 2
+
+
+def test_client_indexes_fetched_results_in_background(index):
+    with FakeOpenverse() as server:
+        client = OpenverseClient(base_url=server.url, cache=None, index=index)
+        client.search_images("sunset", page_size=5)
+    index.flush()
+    assert index.search("images", "sunset")['result_count'] == 5
+
+
+def test_local_first_and_fallback_routes(test_client, mocker, index):
+    import main
+
+    index.add("images", _results("images", "cats", 20))
+    mocker.patch.object(main, 'media_index', index)
+    search = mocker.patch.object(main.ov_client, 'search_images', side_effect=CircuitOpenError(5))
+
+    local = test_client.get('/search_local?q=cats&media=images&page_size=10')
+    assert local.status_code == 200
+    assert len(local.json['results']) == 10
+    assert local.headers['X-Results-Source'] == "local"
+
+    first = test_client.get('/search_images?q=cats&local_first=1')
+    assert first.status_code == 200
+    assert first.headers['X-Results-Source'] == "local"
+    search.assert_not_called()
+
+    # Upstream failing: whatever the index has is better than an error
+    fallback = test_client.get('/search_images?q=cats&page_size=50')
+    assert fallback.status_code == 200
+    assert len(fallback.json['results']) == 20
+    assert test_client.get('/search_images?q=zebras').status_code == 503
+
+    # A rejected request or a bug of ours is not an outage
+    search.side_effect = ValueError("bad page")
+    assert test_client.get('/search_images?q=cats').status_code == 500
+
+    assert test_client.get('/search_local?q=cats&media=video').status_code == 400
+    mocker.patch.object(main, 'media_index', None)
+    assert test_client.get('/search_local?q=cats').status_code == 503
+
+
+def test_combined_search_uses_the_index(test_client, mocker, index):
+    import main
+
+    index.add("images", _results("images", "cats", 20))
+    mocker.patch.object(main, 'media_index', index)
+    search = mocker.patch.object(main.ov_client, 'search_images', side_effect=CircuitOpenError(5))
+
+    first = test_client.get('/search?q=cats&media=images&local_first=1')
+    assert first.status_code == 200
+    assert first.headers['X-Results-Source'] == "local"
+    assert first.json['results']['images']['local'] is True
+    search.assert_not_called()
+
+    fallback = test_client.get('/search?q=cats&media=images&page_size=50')
+    assert fallback.status_code == 200
+    assert len(fallback.json['results']['images']['results']) == 20
+    assert fallback.json['errors'] == {}
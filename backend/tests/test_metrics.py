@@ -0,0 +1,122 @@
+import os
+from flask import Flask
+from flask_jwt_extended import create_access_token
+from metrics import Counter, Histogram, Registry, SQLiteMetricsStore, init_metrics
+from OpenverseAPIClient import OpenverseClient
+from benchmarks.fake_openverse import FakeOpenverse
+
+
+def test_text_exposition_format():
+    registry = Registry()
+    counter = registry.register(Counter("jobs", "Jobs run.", ("kind",)))
+    histogram = registry.register(Histogram("latency_seconds", "Latency.", buckets=(0.1, 1)))
+    registry.callback("queue_depth", "Queued items.", lambda: 3)
+    counter.inc(kind='a "quoted" kind')
+    histogram.observe(0.5)
+    histogram.observe(2)
+
+    text = registry.render()
+    assert '# HELP jobs_total Jobs run.' in text
+    assert '# TYPE jobs_total counter' in text
+    assert 'jobs_total{kind="a \\"quoted\\" kind"} 1' in text
+    assert 'latency_seconds_bucket{le="0.1"} 0' in text
+    assert 'latency_seconds_bucket{le="1"} 1' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in text
+    assert 'latency_seconds_sum 2.5' in text
+    assert 'latency_seconds_count 2' in text
+    assert 'queue_depth 3' in text
+
+
+def test_totals_are_summed_across_workers(tmp_path):
+    store = SQLiteMetricsStore(str(tmp_path / "metrics.db"))
+    workers = []
+    for _ in range(2):
+        registry = Registry()
+        registry.shared = store
+        counter = registry.register(Counter("jobs", "Jobs run.", ("kind",)))
+        histogram = registry.register(Histogram("latency_seconds", "Latency.", buckets=(1,)))
+        registry.callback("queue_depth", "Queued items.", lambda: 3)
+        workers.append((registry, counter, histogram))
+
+    workers[0][1].inc(kind="a")
+    workers[0][2].observe(0.5)
+    workers[1][1].inc(2, kind="a")
+    workers[1][2].observe(2)
+    workers[1][0].flush()
+
+    text = workers[0][0].render()
+    assert 'jobs_total{kind="a"} 3' in text
+    assert 'latency_seconds_bucket{le="1"} 1' in text
+    assert 'latency_seconds_count 2' in text
+    assert text.count('queue_depth 3') == 1
+
+    # A worker that exits keeps its share, so the total never drops
+    del workers[1]
+    assert 'jobs_total{kind="a"} 3' in workers[0][0].render()
+    store.clear()
+    assert 'jobs_total{kind="a"} 1' in workers[0][0].render()
+
+
+def test_metrics_token_and_flag(monkeypatch):
+    monkeypatch.setenv("METRICS_TOKEN", "secret")
+    app = Flask(__name__)
+    init_metrics(app)
+    client = app.test_client()
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer secret"}).status_code == 200
+
+    monkeypatch.setenv("METRICS_ENABLED", "0")
+    app = Flask(__name__)
+    init_metrics(app)
+    assert app.test_client().get("/metrics").status_code == 404
+
+
+def test_metrics_endpoint_reports_routes_and_queries(test_client, init_database):
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(init_database.id))}'}
+    test_client.get('/api/test')
+    test_client.get('/recent_searches', headers=headers)
+
+    response = test_client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    text = response.get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/test",status="200"}' in text
+    assert 'db_queries_per_request_bucket{route="/api/test",le="0"}' in text
+    queries = [line for line in text.splitlines() if line.startswith('db_queries_per_request_sum{route="/recent_searches"}')]
+    assert queries and float(queries[0].split()[-1]) > 0
+    assert 'openverse_rate_limit_remaining' in text
+    assert 'response_cache_lookups_total{outcome="hit"}' in text
+
+
+def test_upstream_calls_are_timed():
+    from metrics import upstream_request_duration
+
+    with FakeOpenverse() as server:
+        client = OpenverseClient(base_url=server.url, cache=None, max_retries=0)
+        before = upstream_request_duration.count(endpoint="images", status=200)
+        client.search_images("cats")
+        assert upstream_request_duration.count(endpoint="images", status=200) == before + 1
+
+        server.fail_status = 503
+        before = upstream_request_duration.count(endpoint="images", status=503)
+        try:
+            client.search_images("dogs")
+        except Exception:
+            pass
+        assert upstream_request_duration.count(endpoint="images", status=503) == before + 1
+
+
+def test_profiling_needs_the_token(monkeypatch, tmp_path):
+    monkeypatch.setenv("PROFILE_TOKEN", "secret")
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    app = Flask(__name__)
+    init_metrics(app)
+    app.add_url_rule("/work", "work", lambda: "done")
+    client = app.test_client()
+
+    assert "X-Profile-File" not in client.get("/work", headers={"X-Profile": "wrong"}).headers
+
+    response = client.get("/work", headers={"X-Profile": "secret"})
+    assert response.headers["Server-Timing"].startswith("app;dur=")
+    assert os.path.exists(tmp_path / response.headers["X-Profile-File"])
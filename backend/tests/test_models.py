@@ -101,4 +101,22 @@ def test_user_recent_search_relationship(init_database):
     db.session.delete(user)
     db.session.commit()
     assert RecentSearch.query.filter_by(user_id=user.id).count() == 0
-    assert user.id is not None, "User was not created successfully"
\ No newline at end of file
+    assert user.id is not None, "User was not created successfully"
+
+def test_recent_search_name_unique_per_user(init_database):
+    user = init_database
+    db.session.add(RecentSearch(user_id=user.id, name="dup", search_query="a", media_type="image", total_results=0))
+    db.session.commit()
+
+    db.session.add(RecentSearch(user_id=user.id, name="dup", search_query="b", media_type="image", total_results=0))
+    with pytest.raises(Exception) as exc_info:
+        db.session.commit()
+    assert "UNIQUE constraint failed" in str(exc_info.value)
+    db.session.rollback()
+
+def test_recent_search_listing_uses_composite_index(init_database):
+    plan = db.session.execute(db.text(
+        "EXPLAIN QUERY PLAN SELECT * FROM recent_search "
+        "WHERE user_id = 1 AND timestamp >= '2024-01-01' ORDER BY timestamp DESC, id DESC"
+    )).fetchall()
+    assert any("ix_recent_search_user_timestamp" in str(row) for row in plan)
@@ -0,0 +1,74 @@
+from OpenverseAPIClient import OpenverseClient
+
+
+def test_client_reuses_pooled_connections(openverse_client):
+    client = openverse_client()
+
+    for page in range(1, 6):
+        results = client.search_images("cats", page=page)
+        assert results['page'] == page
+
+    stats = client.pool_stats()
+    assert stats['connections_opened'] == 1
+    assert stats['requests'] >= 5
+    assert stats['reuse_rate'] > 0.5
+    # Rate limit headers from the search responses are picked up
+    assert client.rate_limit['limit'] == 10000
+
+
+def test_client_sessions_are_per_thread_but_share_pool(fake_openverse, openverse_client):
+    import threading
+
+    client = openverse_client()
+    sessions = []
+
+    def worker():
+        sessions.append(client.session)
+        client.search_audio("jazz")
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len({id(s) for s in sessions}) == 3
+    assert all(s.get_adapter(fake_openverse.url) is client._adapter for s in sessions)
+
+
+def test_search_retries_a_failed_connect_once(openverse_client, mocker):
+    from urllib3.connection import HTTPConnection
+    from urllib3.exceptions import NewConnectionError
+
+    client = openverse_client()
+    client.search_images("warmup")  # the token and rate-limit calls use their own pool
+    client.close()
+    connect = HTTPConnection.connect
+    attempts = []
+
+    def flaky_connect(conn):
+        attempts.append(conn)
+        if len(attempts) == 1:
+            raise NewConnectionError(conn, "connection refused")
+        return connect(conn)
+
+    mocker.patch.object(HTTPConnection, "connect", flaky_connect)
+    assert client.search_images("cats", use_cache=False)['results']
+    assert len(attempts) == 2
+
+    # Both connect attempts fit in the call's timeout
+    assert client._call_timeout(1) == (0.5, 1)
+    assert openverse_client(max_retries=0)._call_timeout(1) == (1, 1)
+
+
+def test_client_configuration_from_env(monkeypatch):
+    monkeypatch.setenv("OPENVERSE_BASE_URL", "http://localhost:1234/v1/")
+    monkeypatch.setenv("OPENVERSE_POOL_MAXSIZE", "7")
+    monkeypatch.setenv("OPENVERSE_READ_TIMEOUT", "2.5")
+    monkeypatch.setenv("OPENVERSE_KEEP_ALIVE", "0")
+
+    client = OpenverseClient()
+    assert client.base_url == "http://localhost:1234/v1"
+    assert client.pool_maxsize == 7
+    assert client.timeout[1] == 2.5
+    assert client.session.headers["Connection"] == "close"
@@ -0,0 +1,136 @@
+import threading
+import pytest
+import main
+from config import db
+from models import User
+from passwords import HashingBusy, PasswordHasher
+from throttle import LoginThrottle
+
+
+def test_inline_hash_round_trip_and_rehash():
+    hasher = PasswordHasher(method="pbkdf2:sha256:1000", workers=0)
+    pwhash = hasher.hash("secret")
+
+    assert pwhash.startswith("pbkdf2:sha256:1000$")
+    assert hasher.verify(pwhash, "secret")
+    assert not hasher.verify(pwhash, "wrong")
+    assert not hasher.needs_rehash(pwhash)
+    assert PasswordHasher(method="pbkdf2:sha256:2000", workers=0).needs_rehash(pwhash)
+
+
+def test_default_method_matches_werkzeug_hashes():
+    from werkzeug.security import generate_password_hash
+
+    hasher = PasswordHasher(method="pbkdf2:sha256", workers=0)
+    assert not hasher.needs_rehash(generate_password_hash("secret"))
+
+
+def test_process_pool_hashing():
+    hasher = PasswordHasher(method="pbkdf2:sha256:1000", workers=1)
+    try:
+        pwhash = hasher.hash("secret")
+        assert hasher.verify(pwhash, "secret")
+    finally:
+        hasher.shutdown()
+
+
+def test_pool_timeout_is_reported_as_busy():
+    # Spawning the worker alone takes longer than this
+    hasher = PasswordHasher(method="pbkdf2:sha256:1000", workers=1, timeout=0.001)
+    try:
+        with pytest.raises(HashingBusy):
+            hasher.hash("secret")
+    finally:
+        hasher.shutdown()
+def test_rejects_when_queue_is_full():
+    release = threading.Event()
+    entered = threading.Event()
+
+    def slow(_):
+        entered.set()
+        release.wait(5)
+        return "done"
+
+    hasher = PasswordHasher(workers=0, max_queue=1)
+    worker = threading.Thread(target=hasher._run, args=(slow, None))
+    worker.start()
+    entered.wait(5)
+    try:
+        with pytest.raises(HashingBusy):
+            hasher.hash("secret")
+    finally:
+        release.set()
+        worker.join()
+    assert hasher.verify(hasher.hash("secret"), "secret")
+
+
+def test_throttle_blocks_account_and_resets_on_success():
+    throttle = LoginThrottle(account_limit=2, ip_limit=100, window=60)
+    throttle.record_failure("a@example.com", "1.1.1.1")
+    assert throttle.check("a@example.com", "1.1.1.1") == 0
+    throttle.record_failure("A@example.com", "2.2.2.2")
+
+    assert 0 < throttle.check("a@example.com", "3.3.3.3") <= 60
+    assert throttle.check("b@example.com", "1.1.1.1") == 0
+    throttle.record_success("a@example.com")
+    assert throttle.check("a@example.com", "1.1.1.1") == 0
+
+
+def test_throttle_blocks_ip_across_accounts():
+    throttle = LoginThrottle(account_limit=100, ip_limit=3, window=60)
+    for i in range(3):
+        throttle.record_failure(f"user{i}@example.com", "1.1.1.1")
+
+    assert throttle.check("new@example.com", "1.1.1.1") > 0
+    assert throttle.check("new@example.com", "2.2.2.2") == 0
+
+
+def test_throttle_counts_failures_across_workers(tmp_path, monkeypatch):
+    monkeypatch.setenv("LOGIN_THROTTLE_STORE", str(tmp_path / "throttle.db"))
+    worker_a = LoginThrottle(account_limit=2, ip_limit=100, window=60)
+    worker_b = LoginThrottle(account_limit=2, ip_limit=100, window=60)
+
+    worker_a.record_failure("a@example.com", "1.1.1.1")
+    assert worker_b.check("a@example.com", "1.1.1.1") == 0
+    worker_b.record_failure("a@example.com", "1.1.1.1")
+    assert 0 < worker_a.check("a@example.com", "1.1.1.1") <= 60
+
+    worker_b.record_success("a@example.com")
+    assert worker_a.check("a@example.com", "1.1.1.1") == 0
+
+
+def test_login_throttled_before_hashing(test_client, init_database, monkeypatch):
+    monkeypatch.setattr(main, "login_throttle", LoginThrottle(account_limit=2, ip_limit=100, window=60))
+    for _ in range(2):
+        response = test_client.post('/login', json={'email': 'test@example.com', 'password': 'wrong'})
+        assert response.status_code == 401
+
+    def fail(*args):
+        raise AssertionError("hashed a throttled login")
+
+    monkeypatch.setattr(User, "check_password", fail)
+    response = test_client.post('/login', json={'email': 'test@example.com', 'password': 'testpassword'})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+
+
+def test_login_rehashes_outdated_hash(test_client, init_database, monkeypatch):
+    import models
+
+    monkeypatch.setattr(models, "hasher", PasswordHasher(method="pbkdf2:sha256:1000", workers=0))
+    response = test_client.post('/login', json={'email': 'test@example.com', 'password': 'testpassword'})
+    assert response.status_code == 200
+
+    user = db.session.get(User, init_database.id)
+    assert user._password_hash.startswith("pbkdf2:sha256:1000$")
+    assert user.check_password("testpassword")
+
+
+def test_register_returns_503_when_hasher_busy(test_client, monkeypatch):
+    def busy(self, password):
+        raise HashingBusy()
+
+    monkeypatch.setattr(User, "set_password", busy)
+    response = test_client.post('/register', json={'email': 'new@example.com', 'password': 'pw'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == "1"
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+import pytest
+from config import db
+from models import User, RecentSearch
+from cache import ResponseCache, SQLiteBackend
+import prewarm
+
+
+def _save(user_id, query, media_type="image", filters=None, days_ago=0):
+    db.session.add(RecentSearch(
+        user_id=user_id,
+        name=f"{query}-{media_type}-{user_id}-{days_ago}-{len(str(filters))}",
+        search_query=query,
+        media_type=media_type,
+        total_results=0,
+        filters=filters or {},
+        timestamp=datetime.now() - timedelta(days=days_ago)
+    ))
+
+
+@pytest.fixture
+def history(test_client):
+    users = [User(email=f"user{i}@example.com", _password_hash="x") for i in range(3)]
+    db.session.add_all(users)
+    db.session.commit()
+    for user in users:
+        _save(user.id, "cats")
+    _save(users[0].id, "Cats ", filters={"license": "", "source": "Any"})
+    _save(users[1].id, "dogs")
+    _save(users[1].id, "jazz", media_type="audio", filters={"category": "music"})
+    _save(users[2].id, "jazz", media_type="audio", filters={"category": "music"})
+    _save(users[2].id, "old", days_ago=60)
+    db.session.commit()
+    return users
+
+
+@pytest.fixture
+def shared_cache(tmp_path):
+    return ResponseCache(shared=SQLiteBackend(str(tmp_path / "cache.db")))
+
+
+def test_popular_searches_rank_and_normalize(history):
+    ranked = prewarm.popular_searches(top_n=10, days=7)
+
+    assert [(e['media_type'], e['params']['q']) for e in ranked] == [
+        ("images", "cats"), ("audio", "jazz"), ("images", "dogs")
+    ]
+    assert ranked[0]['saves'] == 4
+    assert ranked[1]['params']['category'] == "music"
+    assert prewarm.popular_searches(top_n=1, days=7)[0]['params']['q'] == "cats"
+
+
+def test_prewarmed_searches_are_served_without_upstream_calls(history, fake_openverse, openverse_client, shared_cache):
+    client = openverse_client(cache=shared_cache)
+    result = prewarm.run_prewarm(client, top_n=10, days=7)
+    assert result['refreshed'] == 3
+    assert prewarm.last_run['refreshed'] == 3
+
+    calls = fake_openverse.requests
+    assert client.search_images("cats")['results']
+    assert client.search_audio("jazz", category="music")['results']
+    assert fake_openverse.requests == calls
+
+    # A second cycle leaves entries that are still fresh alone
+    assert prewarm.run_prewarm(client, top_n=10, days=7)['fresh'] == 3
+    assert fake_openverse.requests == calls
+
+
+def test_prewarm_stays_within_rate_limit_headroom(history, openverse_client, shared_cache):
+    import time
+
+    client = openverse_client(cache=shared_cache)
+    client.rate_limit = {'remaining': 51, 'limit': 100, 'reset': time.time() + 3600}
+
+    result = prewarm.run_prewarm(client, top_n=10, days=7)
+    assert result['budget'] == 1
+    assert result['refreshed'] == 1
+    assert result['deferred'] == 2
+
+
+def test_prewarm_skips_a_cache_private_to_this_process(history, fake_openverse, openverse_client):
+    client = openverse_client(cache=ResponseCache())
+    result = prewarm.run_prewarm(client, top_n=10, days=7)
+    assert result['skipped'] == "cache not shared"
+    assert result['refreshed'] == 0
+    assert fake_openverse.requests == 0
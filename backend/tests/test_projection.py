@@ -0,0 +1,62 @@
+import gzip
+import pytest
+from projection import SLIM_FIELDS, parse_fields, project_results
+from benchmarks.fake_openverse import make_result
+
+
+def _payload(media_type="images", n=20):
+    return {
+        "result_count": 1000,
+        "page_count": 50,
+        "results": [make_result(media_type, "cats", i) for i in range(n)]
+    }
+
+
+def test_default_projection_is_slim_and_does_not_mutate():
+    payload = _payload()
+    slim = project_results(payload, parse_fields(None, "images"))
+
+    assert slim['result_count'] == 1000
+    assert set(slim['results'][0]) == set(SLIM_FIELDS['images'])
+    assert "tags" in payload['results'][0]
+
+
+def test_explicit_and_full_field_selection():
+    payload = _payload("audio", 2)
+    assert parse_fields("all", "audio") is None
+    assert project_results(payload, parse_fields("all", "audio")) is payload
+
+    picked = project_results(payload, parse_fields("id, duration,missing", "audio"))
+    assert picked['results'][0] == {"id": "audio-cats-0", "duration": 183000}
+
+
+def test_search_route_projects_and_compresses(test_client, mocker):
+    from main import ov_client
+
+    mocker.patch.object(ov_client, 'search_images', return_value=_payload())
+
+    full = test_client.get('/search_images?q=cats&fields=all')
+    slim = test_client.get('/search_images?q=cats')
+    assert len(slim.data) < len(full.data) / 2
+    assert "attribution" not in slim.json['results'][0]
+
+    compressed = test_client.get('/search_images?q=cats', headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers['Content-Encoding'] == "gzip"
+    assert "Accept-Encoding" in compressed.headers['Vary']
+    assert gzip.decompress(compressed.data) == slim.data
+
+    picked = test_client.get('/search_images?q=cats&fields=id,title')
+    assert set(picked.json['results'][0]) == {"id", "title"}
+
+
+def test_brotli_is_preferred_when_available(test_client, mocker):
+    brotli = pytest.importorskip("brotli")
+    from main import ov_client
+
+    mocker.patch.object(ov_client, 'search_audio', return_value=_payload("audio"))
+    response = test_client.get('/search_audio?q=jazz', headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers['Content-Encoding'] == "br"
+    assert brotli.decompress(response.data).startswith(b"{")
+
+    small = test_client.get('/api/test', headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers
@@ -0,0 +1,114 @@
+import time
+import pytest
+from ratelimit import TokenBucket, MemoryBucketStore, SQLiteBucketStore
+from OpenverseAPIClient import OpenverseClient
+from benchmarks.fake_openverse import FakeOpenverse
+
+
+def test_bucket_consumes_and_reports_wait():
+    bucket = TokenBucket(MemoryBucketStore(), window=60)
+    bucket.update(remaining=2, limit=60, reset=time.time() + 60)
+
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+    wait = bucket.acquire()
+    assert 59 < wait <= 60  # nothing comes back before upstream's reset
+    assert bucket.snapshot()['remaining'] == 0
+
+
+def test_unseeded_bucket_refills_continuously():
+    bucket = TokenBucket(MemoryBucketStore(), window=60, default_limit=1)
+    assert bucket.acquire() == 0
+    assert 0 < bucket.acquire() <= 60
+
+
+def test_exhausted_window_stays_empty_until_reset(monkeypatch):
+    now = time.time()
+    bucket = TokenBucket(MemoryBucketStore(), window=3600)
+    bucket.update(remaining=0, limit=60, reset=now + 1800)
+
+    monkeypatch.setattr(time, "time", lambda: now + 120)
+    assert 1600 < bucket.try_acquire() <= 1680
+    monkeypatch.setattr(time, "time", lambda: now + 1801)
+    assert bucket.try_acquire() == 0
+    assert bucket.snapshot()['remaining'] == 59
+
+
+def test_bucket_waits_briefly_for_reset():
+    bucket = TokenBucket(MemoryBucketStore(), window=1)
+    bucket.update(remaining=0, limit=20, reset=time.time() + 0.2)
+
+    start = time.monotonic()
+    assert bucket.acquire(timeout=0.5) == 0
+    assert 0.1 < time.monotonic() - start < 0.5
+
+
+def test_headers_only_lower_tokens_within_a_window():
+    bucket = TokenBucket(MemoryBucketStore(), window=3600)
+    reset = time.time() + 600
+    bucket.update(remaining=10, limit=60, reset=reset)
+    bucket.update(remaining=30, limit=60, reset=reset)  # stale response from the same window
+    assert bucket.snapshot()['remaining'] == 10
+
+    bucket.update(remaining=50, limit=60, reset=reset + 3600)  # a new window started
+    assert bucket.snapshot()['remaining'] == 50
+
+
+def test_sqlite_store_shares_budget_between_workers(tmp_path):
+    path = str(tmp_path / "bucket.db")
+    worker_a = TokenBucket(SQLiteBucketStore(path), window=3600)
+    worker_b = TokenBucket(SQLiteBucketStore(path), window=3600)
+    worker_a.update(remaining=3, limit=60, reset=time.time() + 600)
+
+    granted = [worker.acquire() == 0 for worker in (worker_a, worker_b, worker_a, worker_b)]
+    assert granted == [True, True, True, False]
+    assert not worker_b.needs_poll()
+
+
+def test_sqlite_reads_do_not_write(tmp_path):
+    path = str(tmp_path / "bucket.db")
+    bucket = TokenBucket(SQLiteBucketStore(path), window=3600)
+    assert bucket.needs_poll()
+    assert bucket.snapshot()['remaining'] == 60
+    assert bucket.store.read() is None
+
+    bucket.update(remaining=5, limit=60, reset=time.time() + 600)
+    stored = bucket.store.read()
+    bucket.snapshot()
+    assert bucket.store.read() == stored
+
+
+def test_client_only_polls_rate_limit_without_headers():
+    with FakeOpenverse() as server:
+        client = OpenverseClient(base_url=server.url, rate_limiter=TokenBucket(MemoryBucketStore()))
+        client.cache = None
+
+        client.search_images("cats")
+        assert server.requests == 2  # /rate_limit/ once, then the search
+
+        client.search_images("dogs")
+        client.search_audio("jazz")
+        assert server.requests == 4
+        assert client.rate_limit['limit'] == 10000
+
+
+def test_client_raises_when_budget_cannot_be_had_quickly():
+    client = OpenverseClient(rate_limiter=TokenBucket(MemoryBucketStore()))
+    client.cache = None
+    client.rate_limiter.update(remaining=0, limit=60, reset=time.time() + 600)
+
+    with pytest.raises(Exception, match="Rate limit exceeded"):
+        client.search_images("cats")
+
+
+def test_upstream_429_is_a_rate_limit_error():
+    with FakeOpenverse(rate_limit=0) as server:
+        server.retry_after = 30
+        client = OpenverseClient(base_url=server.url, rate_limiter=TokenBucket(MemoryBucketStore()))
+        client.cache = None
+        client.rate_limiter.update(remaining=5, limit=60, reset=time.time() + 7200)
+
+        with pytest.raises(Exception, match="Rate limit exceeded. Try again in 30 seconds"):
+            client.search_images("cats")
+        assert client.rate_limit['remaining'] == 0
+        assert client.breaker.stats()['failures'] == 0
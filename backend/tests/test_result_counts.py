@@ -0,0 +1,128 @@
+from datetime import datetime
+import pytest
+import sqlalchemy as sa
+from flask_jwt_extended import create_access_token
+from config import db
+from models import User, RecentSearch
+from cache import ResponseCache
+from OpenverseAPIClient import OpenverseClient
+from main import create_app
+import result_counts
+
+
+@pytest.fixture
+def saved(test_client):
+    users = [User(email=f"user{i}@example.com", _password_hash="x") for i in range(3)]
+    db.session.add_all(users)
+    db.session.commit()
+    rows = [
+        (users[0], "cats", "image", {}),
+        (users[1], "cats", "image", {}),
+        (users[2], "Cats ", "image", {}),
+        (users[0], "jazz", "audio", {"category": "music"}),
+        (users[1], "dogs", "image", {"license": "by"}),
+        (users[2], "anything", "video", {}),
+    ]
+    db.session.add_all(
+        RecentSearch(user_id=user.id, name=f"{query}-{i}", search_query=query, media_type=media_type,
+                     total_results=1, filters=filters)
+        for i, (user, query, media_type, filters) in enumerate(rows)
+    )
+    db.session.commit()
+    return users
+
+
+def test_stale_searches_deduplicate_across_users(saved):
+    due = result_counts.stale_searches(max_age_hours=24, limit=10)
+    by_query = {(e['params'] or {}).get('q'): e for e in due}
+    assert by_query['cats']['rows'] == 3
+    assert len(by_query['cats']['groups']) == 2  # "cats" and "Cats "
+    assert by_query['jazz']['params']['category'] == "music"
+    assert by_query[None]['media_type'] is None  # unsupported media type
+    assert len(result_counts.stale_searches(max_age_hours=24, limit=2)) == 2
+
+
+def test_refresh_updates_counts_once_per_distinct_search(saved, fake_openverse, openverse_client):
+    result = result_counts.run_result_refresh(openverse_client(cache=ResponseCache()), limit=10)
+
+    assert result['fetched'] == 3
+    assert fake_openverse.requests - 1 == 3  # plus the rate-limit poll
+    assert result['rows'] == 6
+    rows = RecentSearch.query.all()
+    assert all(r.refreshed_at is not None for r in rows)
+    assert {r.total_results for r in rows if r.media_type != "video"} == {10000}
+    assert result_counts.last_run['rows'] == 6
+
+    # Nothing is due again until max_age_hours has passed
+    again = result_counts.run_result_refresh(openverse_client(cache=ResponseCache()), limit=10)
+    assert again['candidates'] == 0
+
+
+def test_refresh_reuses_cached_pages_and_respects_budget(saved, openverse_client):
+    client = openverse_client(cache=ResponseCache())
+    client.cache.set("images", OpenverseClient._build_params("cats"), {"result_count": 7, "results": []})
+    client.rate_limiter.update(remaining=1, limit=2, reset=datetime.now().timestamp() + 3600)
+
+    result = result_counts.run_result_refresh(client, limit=10)
+    assert result['cached'] == 1
+    assert result['fetched'] == 0
+    assert result['deferred'] == 2
+    cats = RecentSearch.query.filter(RecentSearch.search_query.in_(["cats", "Cats "])).all()
+    assert {r.total_results for r in cats} == {7}
+    dogs = RecentSearch.query.filter_by(search_query="dogs").one()
+    assert dogs.refreshed_at is None and dogs.total_results == 1
+
+
+def test_refreshed_at_is_exposed(test_client, saved, openverse_client):
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(saved[0].id))}'}
+    assert all(s['refreshed_at'] is None for s in test_client.get('/recent_searches', headers=headers).json)
+
+    result_counts.run_result_refresh(openverse_client(cache=ResponseCache()), limit=10)
+    searches = test_client.get('/recent_searches', headers=headers).json
+    assert searches and all(s['refreshed_at'] for s in searches)
+
+
+def test_init_db_adds_the_refreshed_at_column(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'old.db'}"
+    engine = sa.create_engine(uri)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE recent_search (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, name VARCHAR(120) NOT NULL,"
+            " search_query VARCHAR(120) NOT NULL, media_type VARCHAR(50) NOT NULL, timestamp DATETIME,"
+            " total_results INTEGER NOT NULL, filters JSON)"
+        )
+    app = create_app({'SQLALCHEMY_DATABASE_URI': uri})
+    # Push this app's context; the CLI would otherwise reuse the test app's
+    with app.app_context():
+        result = app.test_cli_runner().invoke(args=["init-db"])
+    assert result.exit_code == 0, result.output
+    assert "refreshed_at" in {c["name"] for c in sa.inspect(engine).get_columns("recent_search")}
+    engine.dispose()
+
+
+def test_init_db_renames_duplicate_search_names(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'old.db'}"
+    engine = sa.create_engine(uri)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE recent_search (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, name VARCHAR(120) NOT NULL,"
+            " search_query VARCHAR(120) NOT NULL, media_type VARCHAR(50) NOT NULL, timestamp DATETIME,"
+            " total_results INTEGER NOT NULL, filters JSON)"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO recent_search (id, user_id, name, search_query, media_type, timestamp, total_results) VALUES"
+            " (1, 1, 'cats', 'cats', 'images', '2024-01-01 00:00:00', 5),"
+            " (2, 1, 'cats', 'kittens', 'images', '2024-02-01 00:00:00', 5),"
+            " (3, 1, 'cats', 'tabby', 'images', '2023-12-01 00:00:00', 5),"
+            " (4, 2, 'cats', 'cats', 'audio', '2024-01-01 00:00:00', 5)"
+        )
+    app = create_app({'SQLALCHEMY_DATABASE_URI': uri})
+    with app.app_context():
+        result = app.test_cli_runner().invoke(args=["init-db"])
+    assert result.exit_code == 0, result.output
+
+    with engine.connect() as connection:
+        names = dict(connection.exec_driver_sql("SELECT id, name FROM recent_search").all())
+    assert names == {1: "cats (1)", 2: "cats", 3: "cats (3)", 4: "cats"}
+    assert "uq_recent_search_user_name" in {i["name"] for i in sa.inspect(engine).get_indexes("recent_search")}
+    engine.dispose()
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from config import db
+from models import RecentSearch, RecentSearchArchive
+import retention
+
+
+def _add_searches(user, ages_in_days):
+    now = datetime.now()
+    db.session.add_all([
+        RecentSearch(
+            user_id=user.id,
+            name=f"search {i}",
+            search_query=f"query {i}",
+            media_type="image",
+            total_results=i,
+            timestamp=now - timedelta(days=age, minutes=i)
+        )
+        for i, age in enumerate(ages_in_days)
+    ])
+    db.session.commit()
+
+
+def test_expired_rows_are_deleted_in_batches(init_database):
+    _add_searches(init_database, [0, 1, 40, 45, 60, 90, 100])
+
+    result = retention.run_retention(days=30, per_user_cap=0, batch_size=2, archive=False)
+
+    assert result['expired_rows'] == 5
+    assert result['batches'] == 3
+    assert RecentSearch.query.count() == 2
+    assert RecentSearchArchive.query.count() == 0
+    assert retention.last_run['expired_rows'] == 5
+
+
+def test_per_user_cap_keeps_newest_and_archives(init_database):
+    _add_searches(init_database, [0, 0, 1, 2, 3])
+
+    result = retention.run_retention(days=30, per_user_cap=2, batch_size=10, archive=True)
+
+    assert result['capped_rows'] == 3
+    assert sorted(s.name for s in RecentSearch.query) == ["search 0", "search 1"]
+    archived = RecentSearchArchive.query.order_by(RecentSearchArchive.search_id).all()
+    assert [a.name for a in archived] == ["search 2", "search 3", "search 4"]
+    assert archived[0].user_id == init_database.id
+    assert archived[0].archived_at is not None
+
+
+def test_prune_searches_cli(init_database):
+    _add_searches(init_database, [0, 45])
+
+    result = current_app.test_cli_runner().invoke(args=["prune-searches", "--days", "30", "--vacuum"])
+    assert result.exit_code == 0, result.output
+    assert "Pruned 1 expired and 0 over-cap searches" in result.output
+    assert RecentSearch.query.count() == 1
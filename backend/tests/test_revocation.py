@@ -0,0 +1,83 @@
+import datetime
+from config import db
+from models import RevokedToken
+from revocation import BloomFilter, RevocationStore, revocations
+
+
+def _login(test_client):
+    response = test_client.post('/login', json={'email': 'test@example.com', 'password': 'testpassword'})
+    return {'Authorization': f"Bearer {response.json['access_token']}"}
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"jti-{i}")
+
+    assert all(f"jti-{i}" in bloom for i in range(1000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_logout_revokes_token(test_client, init_database):
+    headers = _login(test_client)
+    assert test_client.get('/recent_searches', headers=headers).status_code == 200
+
+    response = test_client.post('/logout', headers=headers)
+    assert response.status_code == 200
+    assert RevokedToken.query.count() == 1
+
+    response = test_client.get('/recent_searches', headers=headers)
+    assert response.status_code == 401
+
+    # A fresh login is unaffected
+    assert test_client.get('/recent_searches', headers=_login(test_client)).status_code == 200
+
+
+def test_valid_tokens_skip_the_database(test_client, init_database):
+    headers = _login(test_client)
+    test_client.get('/recent_searches', headers=headers)
+    before = revocations.stats()
+    for _ in range(5):
+        test_client.get('/recent_searches', headers=headers)
+    after = revocations.stats()
+
+    assert after['checks'] - before['checks'] == 5
+    assert after['db_lookups'] == before['db_lookups']
+
+
+def test_picks_up_revocations_from_other_workers(test_client):
+    store = RevocationStore(capacity=100, sync_interval=0)
+    assert not store.is_revoked("abc")
+
+    # Written by another process: only the database knows about it
+    now = datetime.datetime.utcnow()
+    db.session.add(RevokedToken(jti="abc", expires_at=now + datetime.timedelta(hours=1), revoked_at=now))
+    db.session.commit()
+
+    assert store.is_revoked("abc")
+
+
+def test_sync_picks_up_revocations_committed_late(test_client):
+    store = RevocationStore(capacity=100, sync_interval=0)
+    now = datetime.datetime.utcnow()
+    expires = now + datetime.timedelta(hours=1)
+    db.session.add(RevokedToken(jti="newer", expires_at=expires, revoked_at=now))
+    db.session.commit()
+    assert store.is_revoked("newer")
+
+    # Stamped before "newer" but committed after it was synced
+    db.session.add(RevokedToken(jti="slow", expires_at=expires, revoked_at=now - datetime.timedelta(seconds=3)))
+    db.session.commit()
+    assert store.is_revoked("slow")
+def test_prune_drops_expired_revocations(test_client):
+    store = RevocationStore(capacity=100)
+    now = datetime.datetime.utcnow()
+    store.revoke("live", (now + datetime.timedelta(hours=1)).replace(tzinfo=datetime.timezone.utc).timestamp())
+    db.session.add(RevokedToken(jti="old", expires_at=now - datetime.timedelta(seconds=1), revoked_at=now))
+    db.session.commit()
+
+    assert store.prune() == 1
+    assert [t.jti for t in RevokedToken.query.all()] == ["live"]
+    assert store.is_revoked("live")
+    assert not store.is_revoked("old")
@@ -0,0 +1,17 @@
+import time
+from scheduler import _due
+
+
+def test_only_one_worker_runs_per_interval(tmp_path):
+    path = tmp_path / "job.lock"
+    worker_a, worker_b = open(path, "a+"), open(path, "a+")
+
+    assert _due(worker_a, 60)
+    assert not _due(worker_b, 60)
+    assert not _due(worker_a, 60)
+
+    path.write_text(repr(time.time() - 61))
+    assert _due(worker_b, 60)
+    assert not _due(worker_a, 60)
+    worker_a.close()
+    worker_b.close()
@@ -0,0 +1,96 @@
+import json
+import time
+from OpenverseAPIClient import OpenverseClient
+from ratelimit import TokenBucket, MemoryBucketStore
+from benchmarks.fake_openverse import FakeOpenverse
+
+
+def _client(url):
+    client = OpenverseClient(base_url=url, rate_limiter=TokenBucket(MemoryBucketStore()))
+    client.cache = None
+    client.rate_limiter.update(1000, 1000, time.time() + 600)
+    return client
+
+
+def test_iter_results_stops_at_max_items():
+    with FakeOpenverse() as server:
+        client = _client(server.url)
+        results = list(client.iter_results("cats", "images", max_items=45, page_size=20))
+
+    assert len(results) == 45
+    assert results[0]['id'] == "images-cats-0"
+    assert server.requests == 3
+
+
+def test_iter_pages_prefetches_next_page():
+    with FakeOpenverse(latency=0.1) as server:
+        client = _client(server.url)
+        pages = client.iter_pages("jazz", "audio", max_items=60, page_size=20, prefetch=1)
+
+        first = next(pages)
+        time.sleep(0.15)  # consumer works on page 1 while page 2 downloads
+        start = time.monotonic()
+        second = next(pages)
+        waited = time.monotonic() - start
+        pages.close()
+
+    assert [first['page'], second['page']] == [1, 2]
+    assert waited < 0.05  # page 2 was already there
+
+
+def test_iter_pages_requests_only_prefetch_pages_ahead(mocker):
+    client = _client("http://unused")
+    requested = []
+
+    def search(query, page, page_size, **kwargs):
+        requested.append(page)
+        return {"page_count": 10, "results": [{"id": page}]}
+
+    mocker.patch.object(client, 'search_images', side_effect=search)
+    for prefetch in (0, 1, 2):
+        requested.clear()
+        pages = client.iter_pages("cats", max_items=200, page_size=20, prefetch=prefetch)
+        for page in pages:
+            # While page N is being consumed, at most N + prefetch were asked for
+            time.sleep(0.02)
+            assert max(requested) == page['page'] + prefetch
+            if page['page'] == 3:
+                break
+        pages.close()
+        assert sorted(requested) == list(range(1, 4 + prefetch))
+def test_search_stream_emits_ndjson(test_client, mocker):
+    from main import ov_client
+
+    def fake_search(query, page, page_size, **kwargs):
+        return {"result_count": 50, "page_count": 3, "results": [{"id": f"{page}-{i}"} for i in range(page_size)]}
+
+    mocker.patch.object(ov_client, 'search_images', side_effect=fake_search)
+    response = test_client.get('/search_stream?q=cats&max_items=30&page_size=10')
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line['page'] for line in lines[:-1]] == [1, 2, 3]
+    assert lines[-1] == {"done": True, "count": 30}
+
+
+def test_search_stream_reports_errors_inline(test_client, mocker):
+    from main import ov_client
+
+    mocker.patch.object(ov_client, 'search_audio', side_effect=Exception("Rate limit exceeded"))
+    response = test_client.get('/search_stream?q=jazz&media=audio')
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines == [{"error": "Rate limit exceeded", "code": "rate_limit_exceeded"}]
+
+    assert test_client.get('/search_stream?q=jazz&media=video').status_code == 400
+
+
+def test_search_stream_rejects_bad_page_size(test_client, mocker):
+    from main import ov_client
+
+    search = mocker.patch.object(ov_client, 'search_images')
+    for page_size in (0, -5, 501):
+        response = test_client.get(f'/search_stream?q=cats&page_size={page_size}')
+        assert response.status_code == 400
+        assert "page_size" in response.get_json()["error"]
+    assert not search.called
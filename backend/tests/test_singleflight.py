@@ -0,0 +1,84 @@
+import threading
+import time
+from singleflight import SingleFlight
+from OpenverseAPIClient import OpenverseClient
+
+
+def _run_concurrently(n, target):
+    results, errors = [], []
+
+    def worker():
+        try:
+            results.append(target())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"results": ["shared"]}
+
+    results, errors = _run_concurrently(8, lambda: flight.do("key", slow))
+    assert not errors
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert flight.stats() == {'executed': 1, 'coalesced': 7, 'in_flight': 0}
+
+    # Once finished, the key is released and a new call executes again
+    flight.do("key", slow)
+    assert len(calls) == 2
+
+
+def test_errors_propagate_to_every_waiter():
+    flight = SingleFlight()
+
+    def failing():
+        time.sleep(0.05)
+        raise Exception("Rate limit exceeded. Try again in 30 seconds")
+
+    results, errors = _run_concurrently(5, lambda: flight.do("key", failing))
+    assert not results
+    assert len(errors) == 5
+    assert all("Rate limit exceeded" in str(e) for e in errors)
+
+
+def test_client_coalesces_identical_searches(mocker):
+    client = OpenverseClient()
+    client.cache = None
+
+    def slow_request(endpoint, params, timeout=None):
+        time.sleep(0.1)
+        return {"results": [params["q"]]}
+
+    mock_request = mocker.patch.object(client, '_make_request', side_effect=slow_request)
+    results, errors = _run_concurrently(6, lambda: client.search_images("viral"))
+
+    assert not errors
+    assert mock_request.call_count == 1
+    assert results == [{"results": ["viral"]}] * 6
+
+
+def test_coalesced_rate_limit_errors_map_to_429(test_client, mocker):
+    from main import ov_client
+
+    def limited(endpoint, params, timeout=None):
+        time.sleep(0.05)
+        raise Exception("Rate limit exceeded. Try again in 10 seconds")
+
+    mocker.patch.object(ov_client, '_make_request', side_effect=limited)
+    responses, _ = _run_concurrently(
+        4, lambda: test_client.get('/search_images?q=coalesce', headers={"Cache-Control": "no-cache"})
+    )
+    assert [r.status_code for r in responses] == [429] * 4
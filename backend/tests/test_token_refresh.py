@@ -0,0 +1,66 @@
+import threading
+import time
+import pytest
+from token_store import TokenStore
+
+
+@pytest.fixture
+def upstream_latency():
+    return 0.05
+
+
+@pytest.fixture(autouse=True)
+def token_cache(tmp_path, monkeypatch):
+    path = str(tmp_path / "token.json")
+    monkeypatch.setenv("OPENVERSE_TOKEN_CACHE", path)
+    return path
+
+
+def test_concurrent_requests_refresh_token_once(fake_openverse, openverse_client):
+    client = openverse_client()
+    tokens = []
+
+    threads = [threading.Thread(target=lambda: tokens.append(client._get_auth_token())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert tokens == ["fake-token"] * 8
+    assert fake_openverse.auth_requests == 1
+    assert client.token_refresh_at == pytest.approx(client.token_expiry - 360, abs=1)
+
+
+def test_token_is_refreshed_early_in_background(fake_openverse, openverse_client):
+    client = openverse_client()
+    client.access_token = "old-token"
+    client.token_expiry = time.time() + 60
+    client.token_refresh_at = time.time() - 1
+
+    start = time.perf_counter()
+    assert client._get_auth_token() == "old-token"
+    assert time.perf_counter() - start < 0.04  # did not wait for the auth round-trip
+
+    client._background_refresh.join(timeout=2)
+    assert client.access_token == "fake-token"
+    assert client.token_expiry > time.time() + 3000
+    assert fake_openverse.auth_requests == 1
+
+
+def test_token_is_persisted_across_clients(fake_openverse, openverse_client, token_cache):
+    first = openverse_client()
+    assert first._get_auth_token() == "fake-token"
+
+    second = openverse_client()
+    assert second._get_auth_token() == "fake-token"
+    assert fake_openverse.auth_requests == 1
+
+    stored = TokenStore(token_cache).load()
+    assert stored['access_token'] == "fake-token"
+
+
+def test_expired_persisted_token_is_ignored(tmp_path):
+    store = TokenStore(str(tmp_path / "expired.json"))
+    store.save("stale", time.time() - 1, time.time() - 10)
+    assert store.load() is None
+    assert TokenStore(None).load() is None
@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Optional
+
+from local_store import ThreadLocalConnection, database_key, host_path
+
+
+class SlidingWindowCounter:
+    """Failure timestamps per key over a sliding window, with a bounded key set."""
+
+    def __init__(self, limit: int, window: float, max_keys: int = 10000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._events: "OrderedDict[str, Deque[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _trim(self, key: str, now: float) -> Optional[Deque[float]]:
+        events = self._events.get(key)
+        if events is None:
+            return None
+        while events and events[0] <= now - self.window:
+            events.popleft()
+        if not events:
+            del self._events[key]
+            return None
+        return events
+
+    def retry_after(self, key: str) -> float:
+        now = time.time()
+        with self._lock:
+            events = self._trim(key, now)
+            if events is None or len(events) < self.limit:
+                return 0.0
+            return events[-self.limit] + self.window - now
+
+    def add(self, key: str) -> None:
+        now = time.time()
+        with self._lock:
+            events = self._trim(key, now)
+            if events is None:
+                events = self._events[key] = deque(maxlen=self.limit)
+            events.append(now)
+            self._events.move_to_end(key)
+            while len(self._events) > self.max_keys:
+                self._events.popitem(last=False)
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._events.pop(key, None)
+
+
+class SQLiteWindowCounter:
+    """``SlidingWindowCounter`` kept in a SQLite file so every worker on the host counts together."""
+
+    def __init__(self, path: str, scope: str, limit: int, window: float):
+        self.path = path
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+        self._conn = ThreadLocalConnection(path)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS login_failure (scope TEXT NOT NULL, key TEXT NOT NULL, at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_login_failure_key ON login_failure (scope, key, at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_login_failure_at ON login_failure (at)")
+
+    def retry_after(self, key: str) -> float:
+        now = time.time()
+        recent = [at for (at,) in self._conn().execute(
+            "SELECT at FROM login_failure WHERE scope = ? AND key = ? AND at > ? ORDER BY at DESC LIMIT ?",
+            (self.scope, key, now - self.window, self.limit)
+        )]
+        if len(recent) < self.limit:
+            return 0.0
+        return recent[-1] + self.window - now
+
+    def add(self, key: str) -> None:
+        now = time.time()
+        conn = self._conn()
+        conn.execute("INSERT INTO login_failure (scope, key, at) VALUES (?, ?, ?)", (self.scope, key, now))
+        # Keeps the table to one window of failures
+        conn.execute("DELETE FROM login_failure WHERE scope = ? AND at <= ?", (self.scope, now - self.window))
+
+    def reset(self, key: str) -> None:
+        self._conn().execute("DELETE FROM login_failure WHERE scope = ? AND key = ?", (self.scope, key))
+
+
+class LoginThrottle:
+    """Per-account and per-IP limits on failed logins, checked before any hashing.
+
+    Failures are counted in a SQLite file shared by the worker processes on
+    the host (``LOGIN_THROTTLE_STORE``), so the limits hold however many
+    workers serve logins; ``memory`` keeps them per process instead.
+    """
+
+    def __init__(self, account_limit: Optional[int] = None, ip_limit: Optional[int] = None,
+                 window: Optional[float] = None):
+        window = float(os.getenv("LOGIN_THROTTLE_WINDOW", 300)) if window is None else window
+        account_limit = int(os.getenv("LOGIN_THROTTLE_ACCOUNT_LIMIT", 5)) if account_limit is None else account_limit
+        ip_limit = int(os.getenv("LOGIN_THROTTLE_IP_LIMIT", 20)) if ip_limit is None else ip_limit
+        location = os.getenv("LOGIN_THROTTLE_STORE")
+        if location == "memory":
+            self.accounts = SlidingWindowCounter(account_limit, window)
+            self.ips = SlidingWindowCounter(ip_limit, window)
+            return
+        if not location:
+            location = host_path("login_throttle", database_key())
+        self.accounts = SQLiteWindowCounter(location, "account", account_limit, window)
+        self.ips = SQLiteWindowCounter(location, "ip", ip_limit, window)
+
+    def check(self, email: str, ip: Optional[str]) -> float:
+        """Seconds the caller must wait, or 0 if the attempt may proceed."""
+        return max(self.accounts.retry_after(email.lower()), self.ips.retry_after(ip or ""))
+
+    def record_failure(self, email: str, ip: Optional[str]) -> None:
+        self.accounts.add(email.lower())
+        self.ips.add(ip or "")
+
+    def record_success(self, email: str) -> None:
+        self.accounts.reset(email.lower())
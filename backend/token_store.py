@@ -0,0 +1,58 @@
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, Optional
+
+from local_store import host_path
+
+
+class TokenStore:
+    """Persists the Openverse access token so restarted workers can reuse it.
+
+    Tokens are stored per API base URL and client id, written atomically with
+    owner-only permissions. A path of ``None`` disables persistence.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+
+    @classmethod
+    def for_client(cls, base_url: str, client_id: Optional[str]) -> "TokenStore":
+        path = os.getenv("OPENVERSE_TOKEN_CACHE")
+        if path is None:
+            path = host_path("openverse_token", base_url, client_id, suffix=".json")
+        return cls(path or None)
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        if not self.path:
+            return None
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not data.get('access_token') or data.get('expires_at', 0) <= time.time():
+            return None
+        return data
+
+    def save(self, access_token: str, expires_at: float, refresh_at: float) -> None:
+        if not self.path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".openverse_token")
+            with os.fdopen(fd, "w") as f:
+                json.dump({
+                    'access_token': access_token,
+                    'expires_at': expires_at,
+                    'refresh_at': refresh_at
+                }, f)
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error persisting auth token: {e}")
+
+    def clear(self) -> None:
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)